@@ -1,17 +1,36 @@
-import ast
+import asyncio
+import hashlib
 import json
-from fastapi import FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
-from openai import OpenAI
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 import os
 import uvicorn
-from generatechart import chat 
 from fastapi.middleware.cors import CORSMiddleware
 
-from shotstackupload import upload_video
-from videocreationhelper import render_video_with_shotstack, check_render_status,loopThroughArray
+import httpclient
+from llmcache import llm_cache, normalize_text
+from llmexecutor import run_llm, stream_llm, record_token_usage
+from outbound import OPENAI_CHAT
+import llmguard
+from slidestream import SlideStreamParser, sse_event
+from slideparser import parse_slides, validate_slide, SLIDE_LIST_SCHEMA, SLIDE_OBJECT_MAX_CHARS
+from metrics import REGISTRY
+from tracing import Trace
+from singleflight import SingleFlight
+import providers
+from providers import LazyProvider, require_env
+from shotstackupload import upload_video, ingest_poller, resume_ingests
+from shotstackcallbacks import KIND_RENDER, KIND_INGEST, shotstack_callbacks, valid_callback_token
+from videocreationhelper import render_video_with_shotstack, check_render_status,loopThroughArray, add_slide, render_poller
+from timeline import Timeline
+from renderprofiles import render_profiles
+import chartimages
+from chartimages import attach_charts, with_chart
+from imageassets import attach_images
+from jobqueue import (JobQueue, Job, JobStatusResponse, status_response, BatchStatusResponse, batch_status_response,
+                      BATCH_MAX_ITEMS, STAGE_LLM, STAGE_TRACKS, STAGE_RENDER, STAGE_POLLING, STAGE_DONE, STAGE_FAILED)
 # Load environment variables
 
 
@@ -29,13 +48,26 @@ app.add_middleware(  CORSMiddleware,
     allow_methods=["*"],  
     allow_headers=["*"],  )
 
-# Initialize OpenAI client
-client = OpenAI(api_key='')
+def _init_openai():
+    """Builds the OpenAI client on first use; reads OPENAI_BASE_URL when pointing at a stand-in server."""
+    from openai import OpenAI
+    # Retries and Retry-After handling happen in the outbound scheduler, under the shared rate limit
+    return OpenAI(api_key=require_env('OPENAI_API_KEY'), max_retries=0, timeout=OPENAI_TIMEOUT)
+
+openai_client = LazyProvider("openai", _init_openai)
 
 # Request models
 class TextRequest(BaseModel):
     text: str
     video_url: Optional[HttpUrl] = None
+    callback_url: Optional[HttpUrl] = None
+    # Render profile from templates/render_profiles.json; None uses RENDER_PROFILE
+    profile: Optional[str] = None
+    # Also render the profile's fast preview, reported as preview_url before the final video
+    preview: bool = False
+
+class BatchRequest(BaseModel):
+    items: List[TextRequest]
 
 # Response models
 class ProcessedResponse(BaseModel):
@@ -43,24 +75,21 @@ class ProcessedResponse(BaseModel):
     chart_data: Optional[list] = None
     error: Optional[str] = None
 
-def process_text_with_openai(text: str) -> str:
-    try:
-        # Construct the prompt for chart conversion
-        # prompt = f"""
-        # Analyze the following text and convert it into a suitable chart format if possible.
-        # If the text contains numerical data or trends, suggest an appropriate chart type.
-        
-        # Text: {text}
-        
-        # Please provide:
-        # 1. Whether this text can be converted to a chart
-        # 2. If yes, what type of chart would be most suitable
-        # 3. The structured data format for the chart
-        # """
-        prompt="""
+OPENAI_MODEL = "gpt-4o-mini"
+OPENAI_TEMPERATURE = 0.2
+# Used while OPENAI_MODEL's circuit breaker is open or after it fails; empty fails fast instead
+OPENAI_FALLBACK_MODEL = os.getenv('OPENAI_FALLBACK_MODEL', '')
+# Per-call limit, so a degraded upstream fails a call instead of holding it for the SDK's 10 minutes
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+# 'schema' sends a compact prompt and the slide JSON schema as response_format,
+# 'prompt' sends the original prompt with its inline 5-slide example
+SLIDE_OUTPUT_MODE = os.getenv('SLIDE_OUTPUT_MODE', 'schema')
+
+SLIDE_PROMPT="""
 Act as a social media content creator specialised in analytics or understanding data 
 i will input a sentence that could be converted to charts.
 you give me a script of informative script story telling the data  .There must be 5 slides.
+Give every slide a "duration": how many seconds it stays on screen, about 3 for a short headline and up to 6 for a slide with more to read.
 Follow below Reference for the response structure:
 """+f"""{[
     {
@@ -68,14 +97,16 @@ Follow below Reference for the response structure:
       "purpose": "Heading of Topic",
       "main_text": "Android vs Apple",
       "sub_text": "Which smartphone OS dominates the market?",
-      "image_prompt": "An SVG illustration of two smartphones side-by-side, one with the Android logo and the other with the Apple logo."
+      "image_prompt": "An SVG illustration of two smartphones side-by-side, one with the Android logo and the other with the Apple logo.",
+      "duration": 3
     },
     {
       "slide_number": 2,
       "purpose": "Topic Setup",
       "main_text": "Ever wondered which operating system people prefer? Let’s break it down!",
       'sub_text':"Aret you ready?",
-      "image_prompt": "An SVG infographic of a globe surrounded by icons representing Android and Apple users."
+      "image_prompt": "An SVG infographic of a globe surrounded by icons representing Android and Apple users.",
+      "duration": 3
     },
     {
       "slide_number": 3,
@@ -85,73 +116,140 @@ Follow below Reference for the response structure:
       "pie_chart": {
         "Android": 90,
         "Apple": 10
-      }
+      },
+      "duration": 5
     },
     {
       "slide_number": 4,
       "purpose": "Short Insight from Data",
       "main_text": "What does this mean?",
       "sub_text": "Android dominates due to affordability and variety, while Apple retains a premium niche.",
-      "image_prompt": "A futuristic AI-generated scene of a busy street with people holding a variety of smartphones, showcasing diversity in Android devices and a smaller group holding sleek Apple phones."
+      "image_prompt": "A futuristic AI-generated scene of a busy street with people holding a variety of smartphones, showcasing diversity in Android devices and a smaller group holding sleek Apple phones.",
+      "duration": 3
     },
     {
       "slide_number": 5,
       "purpose": "Conclusion",
       "main_text": "The choice is yours!",
       "sub_text": "Whether it’s Android’s flexibility or Apple’s exclusivity, both have their strengths.",
-      "image_prompt": "A side-by-side comparison of a glowing Android logo and a polished Apple logo, glowing in a dark backdrop."
+      "image_prompt": "A side-by-side comparison of a glowing Android logo and a polished Apple logo, glowing in a dark backdrop.",
+      "duration": 3
     }
   ]   }"""+""".\nGIve response in JSON format like above totally,and dont make mistake .and dont use extra words in the response.i Just want structured response"""
-        userprompt=f"input={text}"
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", 
-            messages=[
-                {"role": "user", "content": prompt},
-                {"role": "user", "content":userprompt }
-            ],
-            temperature=0.2
+
+SLIDE_SCHEMA_PROMPT = """Act as a social media content creator specialised in analytics.
+Turn the input sentence into an informative 5-slide story about its data:
+1 heading of the topic, 2 topic setup, 3 data highlight with pie_chart, 4 short insight from the data, 5 conclusion.
+main_text is a short headline, sub_text one supporting sentence, image_prompt an illustration for the slide.
+Slide 3 has pie_chart and a null image_prompt; every other slide has a null pie_chart.
+chart_type is how slide 3's data is drawn: pie for shares of a whole, bar to compare amounts, line for a trend; null on other slides.
+duration is how many seconds the slide stays on screen, about 3 for a short headline and up to 6 for a slide with more to read."""
+
+def slide_messages(text: str) -> list:
+    prompt = SLIDE_SCHEMA_PROMPT if SLIDE_OUTPUT_MODE == 'schema' else SLIDE_PROMPT
+    return [
+        {"role": "user", "content": prompt},
+        {"role": "user", "content": f"input={text}"}
+    ]
+
+def slide_response_options() -> dict:
+    """Extra chat.completions arguments for the configured slide output mode."""
+    if SLIDE_OUTPUT_MODE != 'schema':
+        return {}
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "slide_list", "strict": True, "schema": SLIDE_LIST_SCHEMA}
+        }
+    }
+
+def slide_cache_key(text: str) -> str:
+    if SLIDE_OUTPUT_MODE == 'schema':
+        prompt = SLIDE_SCHEMA_PROMPT + json.dumps(SLIDE_LIST_SCHEMA, sort_keys=True)
+    else:
+        prompt = SLIDE_PROMPT
+    return llm_cache.key(text, OPENAI_MODEL, OPENAI_TEMPERATURE, prompt)
+
+def cache_slides(text: str, content: str) -> str:
+    # Only keep responses that parse, so a bad completion is retried next time
+    if convert_to_array(content) is not None:
+        llm_cache.put(slide_cache_key(text), content)
+    return content
+
+def slide_models() -> List[str]:
+    return [OPENAI_MODEL, OPENAI_FALLBACK_MODEL] if OPENAI_FALLBACK_MODEL else [OPENAI_MODEL]
+
+def request_slides_from_openai(text: str, model: str = OPENAI_MODEL) -> str:
+    """Calls OpenAI for the slide script. Blocking: run it through run_llm from async code."""
+    response = openai_client.get().chat.completions.create(
+        model=model, 
+        messages=slide_messages(text),
+        temperature=OPENAI_TEMPERATURE,
+        **slide_response_options()
+    )
+    record_token_usage(response.usage, SLIDE_OUTPUT_MODE)
+    return response.choices[0].message.content
+
+slide_flights = SingleFlight("slides")
+
+async def generate_slides(text: str) -> str:
+    """
+    The slide script for `text`: cache hits return on the loop, misses run on the LLM pool.
+
+    Concurrent misses for the same text share one OpenAI call.
+    """
+    key = slide_cache_key(text)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    return await slide_flights.do(key, request_slides, text)
+
+async def request_slides(text: str) -> str:
+    """Calls the LLM hedged and behind its circuit breaker, falling back to OPENAI_FALLBACK_MODEL."""
+    try:
+        content, model = await llmguard.call(
+            slide_models(), lambda model: OPENAI_CHAT.call(lambda: run_llm(request_slides_from_openai, text, model))
         )
-        
-        return response.choices[0].message.content
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # The cache key names the primary model, so fallback answers are not kept
+    return cache_slides(text, content) if model == OPENAI_MODEL else content
+
+def stream_slides_from_openai(text: str, model: str = OPENAI_MODEL) -> Iterator[str]:
+    """Streams the slide script from OpenAI as text deltas. Blocking: consume it through stream_llm."""
+    stream = openai_client.get().chat.completions.create(
+        model=model, 
+        messages=slide_messages(text),
+        temperature=OPENAI_TEMPERATURE,
+        stream=True,
+        stream_options={"include_usage": True},
+        **slide_response_options()
+    )
+    for chunk in stream:
+        # The last chunk carries usage and no choices
+        if chunk.usage is not None:
+            record_token_usage(chunk.usage, SLIDE_OUTPUT_MODE)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
 def convert_to_array(input_data):
     """
-    Convert any JSON-like string or Python object into a Python list of dictionaries.
+    Convert an LLM slide payload into a Python list of slide dictionaries.
 
     Args:
         input_data (str or object): The input data to be converted. It can be:
-            - A string (JSON or Python-style list)
-            - An already parsed Python object
+            - A string (JSON or Python-style list, possibly fenced, truncated or followed by prose)
+            - An already parsed Python list
 
     Returns:
-        list: A list of dictionaries if the input is valid; otherwise, None.
+        list: The slides that passed validation; otherwise, None.
     """
-    try:
-        # If input is already a Python object, return if it's a list
-        if isinstance(input_data, list):
-            return input_data
-
-        # If the input is a string, attempt to parse it
-        if isinstance(input_data, str):
-            # Try parsing as JSON
-            try:
-                return json.loads(input_data)
-            except json.JSONDecodeError:
-                pass  # Fall back to `ast.literal_eval` for Python-style strings
-            
-            # Try parsing as a Python literal (e.g., single quotes, etc.)
-            try:
-                return ast.literal_eval(input_data)
-            except (ValueError, SyntaxError):
-                pass
-
-        # If none of the above worked, return an error
-        raise ValueError("Input could not be parsed into a list of dictionaries.")
-    
-    except Exception as e:
-        print(f"Error during conversion: {e}")
-        return None
+    slides = parse_slides(input_data)
+    if slides is None:
+        print("Error during conversion: no valid slides in LLM response")
+    return slides
 class ChatRequest(BaseModel):
     message: str
 class UploadResponse(BaseModel):
@@ -184,50 +282,310 @@ def extract_id_from_response(api_response):
     except Exception as e:
         print(f"Error while extracting 'id': {e}")
         return None
+chart_flights = SingleFlight("chart")
+
+# Body, status code, media type and headers of a generated chart
+ChartPayload = Tuple[bytes, int, Optional[str], Tuple[Tuple[str, str], ...]]
+
+async def generate_chart_payload(request: ChatRequest) -> ChartPayload:
+    """Runs the chart router and reduces its answer (a Response or HTML text) to immutable parts callers can share."""
+    # The chart router is only loaded for chart traffic
+    from generatechart import chat
+    result = await chat(request=request)
+    if not isinstance(result, Response):
+        result = HTMLResponse(content=result)
+    # Content length and type are set again when each caller builds its own response
+    headers = tuple(
+        (name.decode("latin-1"), value.decode("latin-1"))
+        for name, value in result.raw_headers if name not in (b"content-length", b"content-type")
+    )
+    return bytes(result.body), result.status_code, result.media_type, headers
+
 @app.post("/generate_chart/",response_class=HTMLResponse)
 async def generate_chart(request:ChatRequest):
-    return await chat(request=request)
+    # Duplicate messages in flight (e.g. client retries) share one chart generation, and each gets its own response
+    key = hashlib.sha256(normalize_text(request.message).encode("utf-8")).hexdigest()
+    body, status_code, media_type, headers = await chart_flights.do(key, generate_chart_payload, request)
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=dict(headers))
 
 @app.post("/upload-video/", response_model=UploadResponse)
 async def upload_shotstack(file: UploadFile = File(...)):
     return await upload_video(file=file)
 
 
-# response_model=ProcessedResponse
-@app.post("/generate_video/", )
-async def process_text(request: TextRequest):
+async def run_video_job(job: Job):
+    """Runs one /generate_video/ job through the LLM, track-build, render and poll stages."""
+    trace = Trace("video", job.job_id)
     try:
-        # Process the text using OpenAI
-        processed_result = process_text_with_openai(request.text)
-        
-        # Create the response
-        response = ProcessedResponse(
-            processed_text=request.text,
-            chart_data=convert_to_array(processed_result)
+        await video_pipeline(job, trace)
+    finally:
+        trace.finish(STAGE_DONE if job.stage == STAGE_DONE else STAGE_FAILED)
+
+async def video_pipeline(job: Job, trace: Trace):
+    request = TextRequest(**job.request)
+    videourl = str(request.video_url) if request.video_url else None
+
+    if job.render_id is None:
+        renderedid, preview_id = await submit_job_render(job, request, videourl, trace)
+        if renderedid is None:
+            return
+        job_queue.set_stage(job, STAGE_POLLING, render_id=renderedid)
+    else:
+        # Resumed after a restart: Shotstack already has the render, only wait for it
+        renderedid, preview_id = job.render_id, None
+
+    preview_task = asyncio.create_task(publish_preview(job, preview_id, trace)) if preview_id else None
+    try:
+        with trace.span("polling"):
+            result = await check_render_status(render_id=renderedid)
+    finally:
+        # A preview still rendering when the final video is ready is of no use
+        if preview_task is not None:
+            preview_task.cancel()
+    if result["status"] == "done":
+        job_queue.set_stage(job, STAGE_DONE, video_url=result["video_url"])
+    else:
+        job_queue.set_stage(job, STAGE_FAILED, error="Shotstack render failed")
+
+async def submit_job_render(job: Job, request: TextRequest, videourl: Optional[str], trace: Trace):
+    """Runs the LLM, track-build and submit stages; returns (render id, preview id), render id None on failure."""
+    if job.slides is None:
+        job_queue.set_stage(job, STAGE_LLM)
+        with trace.span("llm"):
+            processed_result = await generate_slides(request.text)
+        with trace.span("parse"):
+            chart_data = convert_to_array(processed_result)
+        if chart_data is None:
+            job_queue.set_stage(job, STAGE_FAILED, error="Could not parse slides from LLM response")
+            return None, None
+        job_queue.set_stage(job, STAGE_TRACKS, slides=chart_data)
+    else:
+        # Resumed after a restart: the slides were stored when the LLM stage finished
+        chart_data = job.slides
+        job_queue.set_stage(job, STAGE_TRACKS)
+
+    with trace.span("charts"):
+        chart_data = await attach_charts(chart_data)
+    with trace.span("images"):
+        chart_data = await attach_images(chart_data)
+    with trace.span("tracks"):
+        clips_data = loopThroughArray(chart_data, videourl=videourl)
+
+    job_queue.set_stage(job, STAGE_RENDER)
+    with trace.span("render_submit"):
+        renderresponse, preview_id = await submit_renders(clips_data, videourl, request)
+    renderedid = extract_id_from_response(renderresponse)
+    if renderedid is None:
+        job_queue.set_stage(job, STAGE_FAILED, error="Shotstack did not return a render id")
+    return renderedid, preview_id
+
+def check_profile(request: TextRequest) -> None:
+    if request.profile is not None and request.profile not in render_profiles:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown render profile {request.profile!r}; expected one of {', '.join(render_profiles.names)}"
         )
-        
-        clips_data=loopThroughArray(response.chart_data,videourl=request.video_url)
-        renderresponse=render_video_with_shotstack(api_key='epz8h0zzhH9mtbIHAlFSNmexHP66CXAI4bwECcur',clips_data=clips_data,videourl=request.
-        video_url)
-        renderedid=extract_id_from_response(renderresponse)
+
+async def submit_preview(clips_data: list, videourl: Optional[str], profile: str) -> Optional[str]:
+    """Submits the preview half of a two-phase render; a failure only costs the preview."""
+    try:
+        response = await render_video_with_shotstack(clips_data=clips_data, videourl=videourl, profile=profile)
+    except HTTPException as e:
+        print(f"Preview render failed: {e.detail}")
+        return None
+    return extract_id_from_response(response)
+
+async def submit_renders(clips_data: list, videourl: Optional[str], request: TextRequest):
+    """Submits the requested render and, for two-phase requests, its preview; returns (render response, preview id)."""
+    final = render_video_with_shotstack(clips_data=clips_data, videourl=videourl, profile=request.profile)
+    preview_profile = render_profiles.preview_for(request.profile) if request.preview else None
+    if preview_profile is None:
+        return await final, None
+    return await asyncio.gather(final, submit_preview(clips_data, videourl, preview_profile))
+
+async def publish_preview(job: Job, preview_id: str, trace: Trace):
+    with trace.span("preview"):
+        result = await check_render_status(render_id=preview_id)
+    if result["status"] == "done":
+        job_queue.update(job, preview_url=result["video_url"])
+
+job_queue = JobQueue(runner=run_video_job)
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("startup")
+async def warm_clients():
+    # Kept on app.state so the task is not garbage-collected while it runs
+    app.state.client_warm_up = providers.start_warm_up()
+
+@app.on_event("startup")
+async def resume_pending_ingests():
+    # Ingests submitted before a restart finish in the background and land in the dedup cache
+    app.state.ingest_resumes = resume_ingests()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+    await httpclient.close_client()
+    chartimages.shutdown()
+
+# response_model=ProcessedResponse
+@app.post("/generate_video/", response_model=JobStatusResponse, status_code=202)
+async def process_text(request: TextRequest):
+    callback_url = str(request.callback_url) if request.callback_url else None
+    check_profile(request)
+    job = job_queue.submit(request=request.model_dump(mode="json"), callback_url=callback_url)
+    return status_response(job)
+
+@app.post("/generate_video/batch", response_model=BatchStatusResponse, status_code=202)
+async def process_text_batch(request: BatchRequest):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch has more than {BATCH_MAX_ITEMS} items")
+    for item in request.items:
+        check_profile(item)
+    batch_id = job_queue.submit_batch(
+        requests=[item.model_dump(mode="json") for item in request.items],
+        callback_urls=[str(item.callback_url) if item.callback_url else None for item in request.items]
+    )
+    return batch_status_response(batch_id, job_queue.get_batch(batch_id))
+
+async def stream_video_events(request: TextRequest) -> AsyncIterator[str]:
+    """
+    Server-sent events for one streamed generation.
+
+    Emits a `slide` event with the slide and its tracks as soon as the slide
+    is complete in the LLM stream, then `render` with the Shotstack render id,
+    `preview` with the preview URL for two-phase requests, and finally `done`
+    or `failed`.
+    """
+    videourl = str(request.video_url) if request.video_url else None
+    parser = SlideStreamParser(max_object_chars=SLIDE_OBJECT_MAX_CHARS)
+    cached = llm_cache.get(slide_cache_key(request.text))
+    content = []
+    timeline = Timeline()
+    trace = Trace("video_stream")
+    outcome = STAGE_FAILED
+    model = OPENAI_MODEL
+
+    async def chunks() -> AsyncIterator[str]:
+        nonlocal model
+        if cached is not None:
+            yield cached
+            return
+        # A stream cannot be replayed or hedged once it has started, but it still respects the circuit breaker
+        model_guard = llmguard.available(slide_models())
+        model = model_guard.model
         try:
-            if(renderedid !=None):
-                return check_render_status(api_key='epz8h0zzhH9mtbIHAlFSNmexHP66CXAI4bwECcur',render_id=renderedid)        
+            # It only takes a rate-limit token, without the retry loop
+            await OPENAI_CHAT.admit()
+            async for delta in stream_llm(stream_slides_from_openai, request.text, model):
+                yield delta
         except Exception as e:
-            return {
-                "status":"failed",
-                "video_url":""}
+            model_guard.record(e)
+            raise
+        except BaseException:
+            # Closed or cancelled before the stream finished, which says nothing about the model
+            model_guard.breaker.release()
+            raise
+        model_guard.record(None)
 
-            
-        return  {
-            "status":"failed",
-            "video_url":""}
+    try:
+        with trace.span("llm_stream"):
+            async for chunk in chunks():
+                content.append(chunk)
+                for slide in parser.feed(chunk):
+                    slide = validate_slide(slide, timeline.slide_count)
+                    if slide is None:
+                        continue
+                    slide = await with_chart(slide)
+                    # Stored images only: waiting for new ones would hold back the slide event
+                    slide = (await attach_images([slide], timeout=0))[0]
+                    slide_tracks = add_slide(timeline, slide, videourl=videourl)
+                    yield sse_event("slide", {"slide": slide, "tracks": slide_tracks})
+
+        if cached is None and model == OPENAI_MODEL:
+            cache_slides(request.text, "".join(content))
+        if not timeline.slide_count:
+            yield sse_event("failed", {"error": "Could not parse slides from LLM response"})
+            return
+
+        with trace.span("render_submit"):
+            renderresponse, preview_id = await submit_renders(timeline.tracks(), videourl, request)
+        renderedid = extract_id_from_response(renderresponse)
+        if renderedid is None:
+            yield sse_event("failed", {"error": "Shotstack did not return a render id"})
+            return
+        yield sse_event("render", {"render_id": renderedid})
 
+        if preview_id:
+            with trace.span("preview"):
+                preview = await check_render_status(render_id=preview_id)
+            if preview["status"] == "done":
+                yield sse_event("preview", preview)
+
+        with trace.span("polling"):
+            result = await check_render_status(render_id=renderedid)
+        if result["status"] == "done":
+            outcome = STAGE_DONE
+        yield sse_event("done" if result["status"] == "done" else "failed", result)
     except Exception as e:
-        # return ProcessedResponse(
-        #     processed_text=request.text,
-        #     error=str(e)
-        # )
-        return  {
-            "status":"failed",
-            "video_url":""}        
+        print(f"Streamed generation failed: {e}")
+        yield sse_event("failed", {"error": str(e)})
+    finally:
+        trace.finish(outcome)
+
+@app.post("/generate_video/stream")
+async def process_text_stream(request: TextRequest):
+    check_profile(request)
+    return StreamingResponse(stream_video_events(request), media_type="text/event-stream")
+
+@app.post("/shotstack/callback/{kind}")
+async def shotstack_callback(kind: str, request: Request, token: str = ""):
+    """
+    Receives Shotstack render/ingest callbacks.
+
+    The body is only used for the id: the matching poller watch is fetched
+    right away and resolves the waiting job from Shotstack's own status.
+    """
+    pollers = {KIND_RENDER: render_poller, KIND_INGEST: ingest_poller}
+    if kind not in pollers:
+        raise HTTPException(status_code=404, detail="Unknown callback kind")
+    if not valid_callback_token(token):
+        raise HTTPException(status_code=403, detail="Invalid callback token")
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Callback body must be JSON")
+    item_id = body.get("id") if isinstance(body, dict) else None
+    if not item_id:
+        raise HTTPException(status_code=400, detail="Callback has no id")
+    matched = pollers[kind].poke(str(item_id))
+    shotstack_callbacks.inc(kind=kind, result="matched" if matched else "unknown")
+    return {"received": True}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness, which upstream clients have been built so far and the LLM circuit breaker states."""
+    return {"status": "ok", "clients": providers.status(), "llm_breakers": llmguard.breaker_states()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return REGISTRY.render()
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status_response(job)
+
+@app.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str):
+    jobs = job_queue.get_batch(batch_id)
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_status_response(batch_id, jobs)
@@ -0,0 +1,84 @@
+"""
+Benchmark: drawing slide charts inline on the event loop against the
+chart worker process pool.
+
+Draws a mix of pie, bar and line charts concurrently and reports the wall
+time, per-chart draw time and the worst event-loop stall, measured by a
+ticker that should wake every 5 ms.
+
+Usage:
+    python benchmarks/bench_charts.py [--charts 48] [--format png]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chartimages  # noqa: E402
+from chartimages import chart_spec, draw_chart  # noqa: E402
+
+TICK = 0.005
+
+
+def make_items(count: int) -> List[Dict[str, Any]]:
+    kinds = ("pie", "bar", "line")
+    return [
+        {
+            "pie_chart": {f"Item {j}": (i * 7 + j * 13) % 50 + 1 for j in range(3 + i % 5)},
+            "chart_type": kinds[i % len(kinds)]
+        }
+        for i in range(count)
+    ]
+
+
+async def ticker(stop: asyncio.Event, stalls: List[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        stalls.append(time.perf_counter() - started - TICK)
+
+
+async def run(specs: List[Dict[str, Any]], mode: str) -> Dict[str, float]:
+    stop = asyncio.Event()
+    stalls: List[float] = []
+    tick = asyncio.create_task(ticker(stop, stalls))
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    if mode == "inline":
+        for spec in specs:
+            draw_chart(spec)
+            await asyncio.sleep(0)
+    else:
+        await asyncio.gather(*(loop.run_in_executor(chartimages._executor(), draw_chart, spec) for spec in specs))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    return {"seconds": elapsed, "max_stall_ms": max(stalls, default=0) * 1000, "p50_stall_ms": statistics.median(stalls or [0]) * 1000}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=48)
+    parser.add_argument("--format", choices=("png", "svg"), default="png")
+    args = parser.parse_args()
+
+    specs = [{**chart_spec(item), "format": args.format} for item in make_items(args.charts)]
+    draw_chart(specs[0])
+    # Start the workers (and their imports) before timing
+    await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(chartimages._executor(), draw_chart, spec) for spec in specs[:chartimages.CHART_WORKERS * 2]))
+
+    print(f"{args.charts} {args.format} charts, {chartimages.CHART_WORKERS} workers")
+    for mode in ("inline", "pool"):
+        result = await run(specs, mode)
+        print(f"{mode:<7} {result['seconds'] * 1000:8.1f} ms total  {result['seconds'] * 1000 / len(specs):6.1f} ms/chart  "
+              f"loop stall max {result['max_stall_ms']:7.1f} ms  p50 {result['p50_stall_ms']:5.1f} ms")
+    chartimages.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: per-slide dict literals (createImageAndVideo / createImageAndText)
+against the clip template registry used by generateVideoTracks.
+
+Reports time per timeline, and the memory retained by / peak during one
+timeline build, at 5, 50 and 500 slides.
+
+Usage:
+    python benchmarks/bench_clip_templates.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from videocreationhelper import createImageAndText, createImageAndVideo, generateVideoTracks, merge_inner_elements  # noqa: E402
+
+SLIDE_COUNTS = (5, 50, 500)
+REPEAT = 20
+
+
+def make_slides(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "slide_number": i + 1,
+            "main_text": f"Main text for slide {i + 1}",
+            "sub_text": f"Sub text for slide {i + 1}" if i % 4 else "",
+            "image_prompt": f"An illustration for slide {i + 1}"
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_timeline(slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    fulltrack = []
+    for position, item in enumerate(slides):
+        start = position * 3
+        if position == 2:
+            fulltrack.append(createImageAndVideo(item["main_text"], item["sub_text"], "https://example.com/v.mp4", start))
+        else:
+            fulltrack.append(createImageAndText(item["main_text"], item["sub_text"], item["image_prompt"], start))
+    return merge_inner_elements(fulltrack)
+
+
+def template_timeline(slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    fulltrack = []
+    for position, item in enumerate(slides):
+        image = "https://example.com/v.mp4" if position == 2 else item["image_prompt"]
+        fulltrack.append(generateVideoTracks(position, item["main_text"], item["sub_text"], image, position * 3))
+    return merge_inner_elements(fulltrack)
+
+
+def time_per_timeline(build: Callable, slides: List[Dict[str, Any]]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        build(slides)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def memory_per_timeline(build: Callable, slides: List[Dict[str, Any]]) -> Dict[str, int]:
+    tracemalloc.start()
+    try:
+        result = build(slides)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"retained": retained, "peak": peak}
+
+
+def main() -> None:
+    print(f"{'slides':>6} {'builder':>9} {'ms/timeline':>12} {'retained KB':>12} {'peak KB':>9}")
+    for count in SLIDE_COUNTS:
+        slides = make_slides(count)
+        if legacy_timeline(slides) != template_timeline(slides):
+            raise SystemExit(f"Builders disagree at {count} slides")
+        for name, build in (("legacy", legacy_timeline), ("template", template_timeline)):
+            seconds = time_per_timeline(build, slides)
+            memory = memory_per_timeline(build, slides)
+            print(
+                f"{count:>6} {name:>9} {seconds * 1000:>12.3f} "
+                f"{memory['retained'] / 1024:>12.1f} {memory['peak'] / 1024:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: LLM tail latency with and without hedging, and failing calls
+with and without a fallback model behind the circuit breaker.
+
+Calls the slide request path (app.request_slides) directly against
+benchmarks/mockupstreams.py, so start the mock first with a latency tail:
+
+    python benchmarks/mockupstreams.py --port 9000 --llm-latency 0.5 --llm-tail-rate 0.05 --llm-tail-seconds 8
+
+or, for --scenario breaker, with the primary model failing:
+
+    python benchmarks/mockupstreams.py --port 9000 --llm-latency 0.5 --llm-failure-rate 1 --llm-failing-model gpt-4o-mini
+
+Usage:
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=mock python benchmarks/bench_llm_guard.py [--calls 200] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JOB_STORE", "memory")
+
+import app  # noqa: E402
+import llmguard  # noqa: E402
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))] if ordered else 0.0
+
+
+async def run(calls: int, concurrency: int) -> Dict[str, Any]:
+    limit = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                # Unique text, so neither the LLM cache nor single-flight short-circuits the call
+                await app.request_slides(f"Quarterly revenue grew 12% ({uuid.uuid4()})")
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {
+        "seconds": time.perf_counter() - started,
+        "errors": errors,
+        **{name: percentile(latencies, q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))}
+    }
+
+
+def hedges() -> Dict[str, float]:
+    return {outcome: llmguard.llm_hedges.value(model=app.OPENAI_MODEL, outcome=outcome) for outcome in ("fired", "won", "denied")}
+
+
+def report(name: str, result: Dict[str, Any], extra: str = "") -> None:
+    print(f"{name:<12} p50 {result['p50']:6.2f} s  p95 {result['p95']:6.2f} s  p99 {result['p99']:6.2f} s  "
+          f"max {result['max']:6.2f} s  errors {result['errors']}  {extra}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=("hedging", "breaker"), default="hedging")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fallback-model", default="gpt-4o")
+    args = parser.parse_args()
+
+    if args.scenario == "hedging":
+        percentile_setting = llmguard.LLM_HEDGE_PERCENTILE
+        llmguard.LLM_HEDGE_PERCENTILE = 0
+        report("unhedged", await run(args.calls, args.concurrency))
+        llmguard.LLM_HEDGE_PERCENTILE = percentile_setting
+        # Fill the latency window so the hedge delay comes from a percentile
+        await run(llmguard.LLM_HEDGE_MIN_SAMPLES * 2, args.concurrency)
+        before = hedges()
+        result = await run(args.calls, args.concurrency)
+        after = hedges()
+        fired = after["fired"] - before["fired"]
+        report("hedged", result, f"hedges {fired:.0f} ({fired / args.calls:.1%} extra calls), won {after['won'] - before['won']:.0f}, "
+                                 f"denied {after['denied'] - before['denied']:.0f}")
+    else:
+        app.OPENAI_FALLBACK_MODEL = ""
+        report("no fallback", await run(args.calls, args.concurrency), f"breaker {llmguard.breaker_states()}")
+        app.OPENAI_FALLBACK_MODEL = args.fallback_model
+        report("fallback", await run(args.calls, args.concurrency), f"breaker {llmguard.breaker_states()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Corpus check, fuzz and micro-benchmark for slideparser.parse_slides against
+the old json.loads -> ast.literal_eval chain in convert_to_array.
+
+benchmarks/corpus/slide_outputs.json holds malformed completions of the kind
+the slide prompt produces (code fences, prose around the array, truncation,
+Python-repr quoting). For each one the script reports how many slides each
+parser recovers and how long it takes. The fuzz pass truncates and corrupts
+a clean payload at random offsets and checks that parse_slides never raises
+and only returns slides from the original list, in order.
+
+Usage:
+    python benchmarks/bench_slide_parser.py [--fuzz N]
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slideparser import parse_slides  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'slide_outputs.json')
+REPEAT = 200
+
+
+def legacy_convert(input_data: Any) -> Optional[List[Dict[str, Any]]]:
+    """The json -> ast fallback chain convert_to_array used before slideparser."""
+    if isinstance(input_data, list):
+        return input_data
+    try:
+        return json.loads(input_data)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(input_data)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def recovered(parse: Callable, text: str) -> int:
+    try:
+        slides = parse(text)
+    except Exception:
+        return -1
+    return len(slides) if isinstance(slides, list) else 0
+
+
+def time_per_parse(parse: Callable, text: str) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        try:
+            parse(text)
+        except Exception:
+            pass
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_corpus(corpus: List[Dict[str, Any]]) -> bool:
+    print(f"{'case':<24} {'expect':>6} {'legacy':>7} {'parser':>7} {'legacy us':>10} {'parser us':>10}")
+    ok = True
+    totals = {"legacy": 0, "parser": 0}
+    for case in corpus:
+        legacy = recovered(legacy_convert, case["text"])
+        parsed = recovered(parse_slides, case["text"])
+        ok = ok and parsed == case["expect"]
+        totals["legacy"] += legacy == case["expect"]
+        totals["parser"] += parsed == case["expect"]
+        print(
+            f"{case['name']:<24} {case['expect']:>6} {legacy:>7} {parsed:>7} "
+            f"{time_per_parse(legacy_convert, case['text']) * 1e6:>10.1f} "
+            f"{time_per_parse(parse_slides, case['text']) * 1e6:>10.1f}"
+        )
+    print(f"matched expectation: legacy {totals['legacy']}/{len(corpus)}, parser {totals['parser']}/{len(corpus)}")
+    return ok
+
+
+def run_fuzz(clean: str, iterations: int, seed: int = 0) -> bool:
+    rng = random.Random(seed)
+    expected = parse_slides(clean)
+    for i in range(iterations):
+        text = clean[:rng.randrange(len(clean) + 1)]
+        if i % 2:
+            position = rng.randrange(len(text) + 1)
+            text = text[:position] + rng.choice(['"', "'", "}", "]", "{", "\\", "```", "\n"]) + text[position:]
+        try:
+            slides = parse_slides(text) or []
+        except Exception as e:
+            print(f"fuzz: parse_slides raised {e!r} on {text!r}")
+            return False
+        numbers = [slide["slide_number"] for slide in slides]
+        if numbers != sorted(numbers) or any(slide not in expected for slide in slides if i % 2 == 0):
+            print(f"fuzz: unexpected slides {numbers} from {text!r}")
+            return False
+    print(f"fuzz: {iterations} truncated/corrupted payloads parsed without errors")
+    return True
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--fuzz", type=int, default=2000)
+    options = arguments.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    ok = run_corpus(corpus)
+    clean = next(case["text"] for case in corpus if case["name"] == "clean_json")
+    ok = run_fuzz(clean, options.fuzz) and ok
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Startup benchmark: how long `import app` takes in a fresh interpreter, and
+how long a new uvicorn process takes to answer its first request.
+
+Both are measured in subprocesses that inherit this environment, so export
+the same variables the app runs with (see benchmarks/mockupstreams.py).
+Point --repo at another checkout, e.g. a `git worktree` of an older commit,
+to compare before and after.
+
+Usage:
+    python benchmarks/bench_startup.py [--repo PATH] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+
+
+def import_seconds(repo: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", IMPORT_SNIPPET],
+        cwd=repo, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_request_seconds(repo: str, port: int, path: str, timeout: float) -> float:
+    """Seconds from spawning uvicorn until `path` first answers 200."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=repo, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"app exited during startup: {server.stderr.read().decode()[-2000:]}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"app did not answer {path} within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summary(values: List[float]) -> str:
+    return f"median {statistics.median(values) * 1000:8.1f} ms   min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/metrics", help="Endpoint used as the first request")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    imports = [import_seconds(args.repo) for _ in range(args.runs)]
+    first = [first_request_seconds(args.repo, args.port, args.path, args.timeout) for _ in range(args.runs)]
+    print(f"repo           {args.repo}")
+    print(f"import app     {summary(imports)}")
+    print(f"first request  {summary(first)}  ({args.path})")
+
+
+if __name__ == "__main__":
+    main()
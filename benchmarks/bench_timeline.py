@@ -0,0 +1,97 @@
+"""
+Benchmark: one track per clip (the old loopThroughArray output) against the
+packed Timeline, which keeps one shared track per role.
+
+Reports build time, track count and serialized payload size as the slide
+count grows, with varying per-slide durations.
+
+Usage:
+    python benchmarks/bench_timeline.py
+"""
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cliptemplates import clip_templates  # noqa: E402
+from timeline import Timeline, seconds  # noqa: E402
+
+SLIDE_COUNTS = (5, 50, 200, 500, 1000)
+REPEAT = 20
+VIDEO_URL = "https://example.com/v.mp4"
+
+
+def make_slides(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "slide_number": i + 1,
+            "main_text": f"Main text for slide {i + 1}",
+            "sub_text": f"Sub text for slide {i + 1}" if i % 4 else "",
+            "image_prompt": f"An illustration for slide {i + 1}",
+            "duration": (3, 4, 2.5)[i % 3]
+        }
+        for i in range(count)
+    ]
+
+
+def slide_args(position: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "slide_type": "image_and_video" if position == 2 else "image_and_text",
+        "maintext": item["main_text"],
+        "subtext": item["sub_text"],
+        "media": VIDEO_URL if position == 2 else item["image_prompt"]
+    }
+
+
+def per_clip_tracks(slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    tracks = []
+    start = 0
+    for position, item in enumerate(slides):
+        args = slide_args(position, item)
+        tracks.extend(clip_templates.build(args.pop("slide_type"), start=start, length=item["duration"], **args))
+        start = seconds(start + item["duration"])
+    return tracks
+
+
+def packed_tracks(slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    timeline = Timeline()
+    for position, item in enumerate(slides):
+        args = slide_args(position, item)
+        timeline.add(args.pop("slide_type"), item["duration"], **args)
+    return timeline.tracks()
+
+
+def clips_of(tracks: List[Dict[str, Any]]) -> List[str]:
+    return sorted(json.dumps(clip, sort_keys=True) for track in tracks for clip in track["clips"])
+
+
+def time_per_timeline(build: Callable, slides: List[Dict[str, Any]]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        build(slides)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    print(f"{'slides':>6} {'builder':>9} {'ms/timeline':>12} {'us/slide':>9} {'tracks':>7} {'payload KB':>11}")
+    for count in SLIDE_COUNTS:
+        slides = make_slides(count)
+        if clips_of(per_clip_tracks(slides)) != clips_of(packed_tracks(slides)):
+            raise SystemExit(f"Builders place different clips at {count} slides")
+        for name, build in (("per-clip", per_clip_tracks), ("packed", packed_tracks)):
+            seconds_taken = time_per_timeline(build, slides)
+            tracks = build(slides)
+            payload = len(json.dumps({"timeline": {"tracks": tracks}}, separators=(",", ":")))
+            print(
+                f"{count:>6} {name:>9} {seconds_taken * 1000:>12.3f} {seconds_taken * 1e6 / count:>9.2f} "
+                f"{len(tracks):>7} {payload / 1024:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+End-to-end load test for the running API, meant to be pointed at an app
+started against benchmarks/mockupstreams.py (see that file for the env).
+
+Drives one scenario at a fixed concurrency and reports p50/p95/p99 latency,
+throughput, errors and worker saturation sampled from /metrics:
+
+    generate_video  POST /generate_video/ then poll /jobs/{id} until it finishes;
+                    latency is end to end, accept latency is the POST alone,
+                    preview latency is until preview_url appears (--preview)
+    upload_video    POST /upload-video/ with a random video body
+    generate_chart  POST /generate_chart/
+
+Usage:
+    python benchmarks/loadtest.py --scenario generate_video --concurrency 16 --requests 200
+    python benchmarks/loadtest.py --scenario upload_video --json results/upload.json
+    python benchmarks/loadtest.py --scenario generate_video --distinct 4  # repeated inputs
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Gauges sampled from /metrics while the load runs
+SAMPLED_GAUGES = (
+    "job_workers", "job_workers_busy", "job_queue_depth", "llm_in_flight", "llm_queue_depth",
+    'outbound_queue_depth{upstream="openai"}', 'outbound_queue_depth{upstream="shotstack"}'
+)
+FINISHED = ("done", "failed")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def parse_gauges(text: str) -> Dict[str, float]:
+    gauges = {}
+    for line in text.splitlines():
+        if line.startswith("#") or " " not in line:
+            continue
+        name, value = line.rsplit(" ", 1)
+        if name in SAMPLED_GAUGES:
+            gauges[name] = float(value)
+    return gauges
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.latencies: List[float] = []
+        self.accept_latencies: List[float] = []
+        self.preview_latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.samples: List[Dict[str, float]] = []
+        self._issued = 0
+        self._video = os.urandom(args.video_kb * 1024)
+
+    def _text(self, index: int) -> str:
+        # --distinct N repeats N inputs, the way popular templates repeat in production
+        story = index % self.args.distinct if self.args.distinct else index
+        return f"Load test story {story}: {self.args.text}"
+
+    def _error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    async def generate_video(self, client: httpx.AsyncClient, index: int) -> None:
+        started = time.perf_counter()
+        body = {"text": self._text(index), "video_url": self.args.video_url, "preview": self.args.preview}
+        if self.args.profile:
+            body["profile"] = self.args.profile
+        response = await client.post("/generate_video/", json=body)
+        self.accept_latencies.append(time.perf_counter() - started)
+        if response.status_code != 202:
+            return self._error(f"submit_{response.status_code}")
+        job_id = response.json()["job_id"]
+        previewed = False
+        while True:
+            await asyncio.sleep(self.args.poll_interval)
+            status = (await client.get(f"/jobs/{job_id}")).json()
+            if status.get("preview_url") and not previewed:
+                previewed = True
+                self.preview_latencies.append(time.perf_counter() - started)
+            if status["status"] in FINISHED:
+                break
+        if status["status"] != "done":
+            return self._error("job_failed")
+        self.latencies.append(time.perf_counter() - started)
+
+    async def upload_video(self, client: httpx.AsyncClient, index: int) -> None:
+        started = time.perf_counter()
+        # A unique prefix keeps the dedup cache from short-circuiting repeat uploads
+        body = uuid.uuid4().bytes + self._video
+        response = await client.post("/upload-video/", files={"file": (f"load-{index}.mp4", body, "video/mp4")})
+        if response.status_code != 200 or not response.json().get("success"):
+            return self._error(f"upload_{response.status_code}")
+        self.latencies.append(time.perf_counter() - started)
+
+    async def generate_chart(self, client: httpx.AsyncClient, index: int) -> None:
+        started = time.perf_counter()
+        response = await client.post("/generate_chart/", json={"message": self._text(index)})
+        if response.status_code != 200:
+            return self._error(f"chart_{response.status_code}")
+        self.latencies.append(time.perf_counter() - started)
+
+    async def _user(self, client: httpx.AsyncClient, scenario, deadline: float) -> None:
+        while self._issued < self.args.requests and time.perf_counter() < deadline:
+            index = self._issued
+            self._issued += 1
+            try:
+                await asyncio.wait_for(scenario(client, index), timeout=self.args.timeout)
+            except asyncio.TimeoutError:
+                self._error("timeout")
+            except httpx.HTTPError as e:
+                self._error(type(e).__name__)
+
+    async def _sample_metrics(self, client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                response = await client.get("/metrics")
+                self.samples.append(parse_gauges(response.text))
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(self.args.sample_interval)
+
+    async def run(self) -> Dict[str, Any]:
+        scenario = getattr(self, self.args.scenario)
+        limits = httpx.Limits(max_connections=self.args.concurrency + 2)
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            sampler = asyncio.create_task(self._sample_metrics(client))
+            started = time.perf_counter()
+            deadline = started + self.args.duration if self.args.duration else float("inf")
+            await asyncio.gather(*(self._user(client, scenario, deadline) for _ in range(self.args.concurrency)))
+            elapsed = time.perf_counter() - started
+            sampler.cancel()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        def gauge(name: str) -> Dict[str, float]:
+            values = [sample[name] for sample in self.samples if name in sample]
+            return {"mean": round(sum(values) / len(values), 2) if values else 0.0, "max": max(values, default=0.0)}
+
+        busy, workers = gauge("job_workers_busy"), gauge("job_workers")
+        result = {
+            "scenario": self.args.scenario,
+            "concurrency": self.args.concurrency,
+            "requests": self._issued,
+            "ok": len(self.latencies),
+            "errors": self.errors,
+            "seconds": round(elapsed, 2),
+            "throughput_per_s": round(len(self.latencies) / elapsed, 3) if elapsed else 0.0,
+            "latency_s": {name: round(percentile(self.latencies, q), 3) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+            "gauges": {name: gauge(name) for name in SAMPLED_GAUGES},
+            "worker_saturation": round(busy["mean"] / workers["max"], 3) if workers["max"] else None
+        }
+        if self.accept_latencies:
+            result["accept_latency_s"] = {
+                name: round(percentile(self.accept_latencies, q), 3) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+            }
+        if self.preview_latencies:
+            result["preview_latency_s"] = {
+                name: round(percentile(self.preview_latencies, q), 3) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+            }
+        return result
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    latency = result["latency_s"]
+    print(f"scenario     {result['scenario']} x{result['concurrency']}")
+    print(f"requests     {result['requests']} issued, {result['ok']} ok, errors {result['errors'] or 'none'}")
+    print(f"throughput   {result['throughput_per_s']}/s over {result['seconds']} s")
+    print(f"latency      p50 {latency['p50']} s  p95 {latency['p95']} s  p99 {latency['p99']} s")
+    if "accept_latency_s" in result:
+        accept = result["accept_latency_s"]
+        print(f"accept       p50 {accept['p50']} s  p95 {accept['p95']} s  p99 {accept['p99']} s")
+    if "preview_latency_s" in result:
+        preview = result["preview_latency_s"]
+        print(f"preview      p50 {preview['p50']} s  p95 {preview['p95']} s  p99 {preview['p99']} s")
+    print(f"saturation   {result['worker_saturation']} (job workers busy / started)")
+    for name, values in result["gauges"].items():
+        print(f"  {name:<44} mean {values['mean']:<8} max {values['max']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=("generate_video", "upload_video", "generate_chart"), default="generate_video")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to issue")
+    parser.add_argument("--duration", type=float, default=0, help="Stop issuing after this many seconds (0 = no limit)")
+    parser.add_argument("--timeout", type=float, default=900, help="Per-request (end-to-end) timeout in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--text", default="Android holds 72% of the smartphone market and iOS 28%.")
+    parser.add_argument("--distinct", type=int, default=0, help="Cycle through this many distinct inputs (0 = every request is unique)")
+    parser.add_argument("--profile", help="Render profile for generate_video (default: the server's RENDER_PROFILE)")
+    parser.add_argument("--preview", action="store_true", help="Request two-phase renders and report time to the preview")
+    parser.add_argument("--video-url", default="https://example.com/background.mp4")
+    parser.add_argument("--video-kb", type=int, default=512)
+    parser.add_argument("--json", metavar="PATH", help="Also write the result as JSON, e.g. to diff against a baseline")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    result = asyncio.run(LoadTest(args).run())
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Local stand-in for every upstream the service calls: OpenAI chat
+completions, the Shotstack edit (render/status), ingest (sources) and create
+(generated assets) APIs, and the Google Cloud Storage JSON API behind
+Firebase Storage, including the OAuth token endpoint its service-account
+credentials refresh against.
+
+Each upstream has its own latency, failure rate and optional rate limit. Renders and ingests move
+through queued -> working -> done/failed over a configurable time and POST to
+their `callback` URL when one was given.
+
+Usage:
+    python benchmarks/mockupstreams.py --port 9000 --write-credentials /tmp/mock-sa.json
+
+then start the app against it:
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 \\
+    SHOTSTACK_EDIT_API_URL=http://127.0.0.1:9000/edit/stage \\
+    SHOTSTACK_API_URL=http://127.0.0.1:9000/ingest/stage \\
+    SHOTSTACK_CREATE_API_URL=http://127.0.0.1:9000/create/stage \\
+    STORAGE_EMULATOR_HOST=http://127.0.0.1:9000 \\
+    FIREBASE_CREDENTIALS_PATH=/tmp/mock-sa.json FIREBASE_BUCKET_NAME=mock-bucket \\
+    SHOTSTACK_API_KEY=mock OPENAI_API_KEY=mock \\
+    uvicorn app:app --port 8000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import google_crc32c
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class Upstream:
+    """Latency, failure and quota settings for one mocked API."""
+
+    def __init__(self, latency: float, jitter: float, failure_rate: float, rate_limit: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        # Requests per second before answering 429, as a token bucket holding one second of quota; 0 is unlimited
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+
+    async def delay(self) -> None:
+        spread = self.latency * self.jitter
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-spread, spread)))
+
+    def fails(self) -> bool:
+        return random.random() < self.failure_rate
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until the next request fits the quota when this one does not, else None (and it is counted)."""
+        if self.rate_limit <= 0:
+            return None
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+        self._updated = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate_limit
+        self._tokens -= 1
+        return None
+
+
+class Task:
+    """A render or ingest source that finishes `duration` seconds after creation."""
+
+    def __init__(self, duration: float, failed: bool, url: str, callback: Optional[str]):
+        self.created = time.monotonic()
+        self.duration = duration
+        self.failed = failed
+        self.url = url
+        self.callback = callback
+
+    def status(self, working: str, done: str) -> str:
+        elapsed = time.monotonic() - self.created
+        if elapsed < self.duration * 0.2:
+            return "queued"
+        if elapsed < self.duration:
+            return working
+        return "failed" if self.failed else done
+
+
+def make_slides(text: str, count: int = 5) -> List[Dict[str, Any]]:
+    topic = " ".join(text.split()[:6]) or "Mock topic"
+    slides = []
+    for number in range(1, count + 1):
+        slide = {
+            "slide_number": number,
+            "purpose": "Mock slide",
+            "main_text": f"{topic} ({number})",
+            "sub_text": f"Supporting line {number} for the mock story.",
+            "image_prompt": f"A flat illustration for slide {number}",
+            "pie_chart": None,
+            "chart_type": None,
+            "duration": 3
+        }
+        if number == 3:
+            slide["image_prompt"] = None
+            slide["pie_chart"] = [{"label": "A", "value": 60}, {"label": "B", "value": 40}]
+            slide["chart_type"] = "pie"
+            slide["duration"] = 5
+        slides.append(slide)
+    return slides
+
+
+def slide_content(body: Dict[str, Any]) -> str:
+    text = body.get("messages", [{}])[-1].get("content", "")
+    slides = make_slides(text)
+    if body.get("response_format", {}).get("type") == "json_schema":
+        return json.dumps({"slides": slides})
+    # The legacy prompt mode gets the list with pie_chart as a dict, like the inline example
+    for slide in slides:
+        if slide["pie_chart"]:
+            slide["pie_chart"] = {pair["label"]: pair["value"] for pair in slide["pie_chart"]}
+    return json.dumps([{key: value for key, value in slide.items() if value is not None} for slide in slides])
+
+
+def render_cost(output: Dict[str, Any]) -> float:
+    """Render time relative to 720x1280 at 25 fps, scaling with pixels per second of output but never below 0.2."""
+    size = output.get("size", {})
+    pixels = size.get("width", 720) * size.get("height", 1280) * output.get("fps", 25)
+    return max(0.2, pixels / (720 * 1280 * 25))
+
+
+def text_to_image_count(timeline: Dict[str, Any]) -> int:
+    return sum(
+        1 for track in timeline.get("tracks", []) for clip in track.get("clips", [])
+        if clip.get("asset", {}).get("type") == "text-to-image"
+    )
+
+
+# 1x1 PNG served as every generated image
+GENERATED_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Mock upstreams")
+    llm = Upstream(args.llm_latency, args.jitter, args.llm_failure_rate, args.llm_rate_limit)
+    shotstack = Upstream(args.shotstack_latency, args.jitter, args.shotstack_failure_rate, args.shotstack_rate_limit)
+    storage = Upstream(args.storage_latency, args.jitter, args.storage_failure_rate)
+    renders: Dict[str, Task] = {}
+    sources: Dict[str, Task] = {}
+    assets: Dict[str, Task] = {}
+    # Images generated, inline in renders or through the Create API
+    stats = {"images_generated": 0, "rate_limited": 0}
+    # upload id -> [bytes received, running crc32c]
+    uploads: Dict[str, List[Any]] = {}
+    http = httpx.AsyncClient(timeout=10)
+
+    def error(status: int, message: str) -> JSONResponse:
+        return JSONResponse(status_code=status, content={"error": {"message": message}})
+
+    def over_quota(upstream: Upstream) -> Optional[JSONResponse]:
+        """A 429 with Retry-After (whole seconds, as real APIs send) when `upstream` is over its rate limit."""
+        wait = upstream.retry_after()
+        if wait is None:
+            return None
+        stats["rate_limited"] += 1
+        response = error(429, "mock rate limit exceeded")
+        response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+        return response
+
+    async def fire_callback(task: Task, payload: Dict[str, Any]) -> None:
+        await asyncio.sleep(task.duration)
+        try:
+            await http.post(task.callback, json=payload)
+        except httpx.HTTPError as e:
+            print(f"callback to {task.callback} failed: {e}")
+
+    def schedule(task: Task, payload: Dict[str, Any]) -> None:
+        if task.callback:
+            asyncio.create_task(fire_callback(task, payload))
+
+    # OpenAI
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        limited = over_quota(llm)
+        if limited is not None:
+            return limited
+        if llm.fails() and args.llm_failing_model in (None, body.get("model")):
+            await llm.delay()
+            return error(500, "mock LLM failure")
+        content = slide_content(body)
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4,
+            "completion_tokens": len(content) // 4
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model", "mock")}
+
+        if not body.get("stream"):
+            await llm.delay()
+            if random.random() < args.llm_tail_rate:
+                await asyncio.sleep(args.llm_tail_seconds)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        pieces = [content[i:i + args.stream_chunk_chars] for i in range(0, len(content), args.stream_chunk_chars)]
+        include_usage = body.get("stream_options", {}).get("include_usage", False)
+
+        async def events():
+            # Spread the configured latency over the stream, a fifth of it as time to first token
+            await asyncio.sleep(llm.latency * 0.2)
+            step = llm.latency * 0.8 / max(1, len(pieces))
+            for index, piece in enumerate(pieces):
+                finish = "stop" if index == len(pieces) - 1 else None
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": finish}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(step)
+            if include_usage:
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # Shotstack edit API
+
+    @app.post("/edit/stage/render", status_code=201)
+    async def render(request: Request):
+        body = await request.json()
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        if shotstack.fails():
+            return error(500, "mock render submit failure")
+        render_id = str(uuid.uuid4())
+        output = body.get("output", {})
+        images = text_to_image_count(body.get("timeline", {}))
+        stats["images_generated"] += images
+        # Inline text-to-image clips are generated in parallel before the render starts
+        duration = args.render_seconds * render_cost(output) + (args.image_seconds if images else 0)
+        task = Task(duration, random.random() < args.render_failure_rate,
+                    f"http://mock.local/renders/{render_id}.{output.get('format', 'mp4')}", body.get("callback"))
+        renders[render_id] = task
+        schedule(task, {
+            "type": "edit", "action": "render", "id": render_id,
+            "status": "failed" if task.failed else "done", "url": task.url
+        })
+        return {"success": True, "message": "Created", "response": {"message": "Render Successfully Queued", "id": render_id}}
+
+    @app.get("/edit/stage/render/{render_id}")
+    async def render_status(render_id: str):
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        task = renders.get(render_id)
+        if task is None:
+            return error(404, "render not found")
+        status = task.status("rendering", "done")
+        return {"success": True, "response": {"id": render_id, "status": status, "url": task.url if status == "done" else None}}
+
+    # Shotstack create API (generated assets)
+
+    @app.post("/create/stage/assets", status_code=201)
+    async def create_asset(request: Request):
+        body = await request.json()
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        if shotstack.fails():
+            return error(500, "mock asset create failure")
+        asset_id = str(uuid.uuid4())
+        url = f"{str(request.base_url).rstrip('/')}/create/files/{asset_id}.png"
+        assets[asset_id] = Task(args.image_seconds, random.random() < args.render_failure_rate, url, None)
+        stats["images_generated"] += 1
+        return {"data": {"type": "asset", "id": asset_id, "attributes": {
+            "provider": "shotstack", "type": body.get("options", {}).get("type"), "status": "queued"
+        }}}
+
+    @app.get("/create/stage/assets/{asset_id}")
+    async def asset_status(asset_id: str):
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        task = assets.get(asset_id)
+        if task is None:
+            return error(404, "asset not found")
+        status = task.status("processing", "done")
+        return {"data": {"type": "asset", "id": asset_id, "attributes": {
+            "status": status, "url": task.url if status == "done" else None
+        }}}
+
+    @app.get("/create/files/{name}")
+    async def asset_file(name: str):
+        return Response(content=GENERATED_PNG, media_type="image/png")
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return {**stats, "renders": len(renders)}
+
+    # Shotstack ingest API
+
+    @app.post("/ingest/stage/sources", status_code=201)
+    async def create_source(request: Request):
+        body = await request.json()
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        if shotstack.fails():
+            return error(500, "mock ingest submit failure")
+        source_id = str(uuid.uuid4())
+        task = Task(args.ingest_seconds, random.random() < args.render_failure_rate, body.get("url", ""), body.get("callback"))
+        sources[source_id] = task
+        schedule(task, {"type": "source", "id": source_id, "status": "failed" if task.failed else "ready"})
+        return {"data": {"type": "source", "id": source_id}}
+
+    @app.get("/ingest/stage/sources/{source_id}")
+    async def source_status(source_id: str):
+        await shotstack.delay()
+        limited = over_quota(shotstack)
+        if limited is not None:
+            return limited
+        task = sources.get(source_id)
+        if task is None:
+            return error(404, "source not found")
+        return {"data": {"type": "source", "id": source_id, "attributes": {
+            "id": source_id, "status": task.status("importing", "ready"), "source": task.url
+        }}}
+
+    # Google OAuth + Cloud Storage JSON API
+
+    @app.post("/token")
+    async def token():
+        return {"access_token": "mock-token", "expires_in": 3600, "token_type": "Bearer"}
+
+    def object_resource(bucket: str, name: str, size: int, checksum: Any = None) -> Dict[str, Any]:
+        resource = {"kind": "storage#object", "bucket": bucket, "name": name, "size": str(size), "generation": "1"}
+        if checksum is not None:
+            # The client validates uploads against crc32c
+            resource["crc32c"] = base64.b64encode(checksum.digest()).decode()
+        return resource
+
+    def multipart_parts(request: Request, body: bytes) -> List[bytes]:
+        boundary = request.headers.get("content-type", "").split("boundary=")[-1].strip('"').encode()
+        parts = []
+        for part in body.split(b"--" + boundary)[1:-1]:
+            parts.append(part.split(b"\r\n\r\n", 1)[-1][:-2])
+        return parts
+
+    @app.post("/upload/storage/v1/b/{bucket}/o")
+    async def start_upload(bucket: str, request: Request, uploadType: str = "multipart", name: str = ""):
+        await storage.delay()
+        if storage.fails():
+            return error(503, "mock storage failure")
+        body = await request.body()
+        if uploadType == "resumable":
+            name = name or json.loads(body or b"{}").get("name", "object")
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = [0, google_crc32c.Checksum()]
+            location = f"{request.base_url}upload/storage/v1/b/{bucket}/o?uploadType=resumable&upload_id={upload_id}&name={name}"
+            return Response(status_code=200, headers={"Location": location})
+        metadata, media = multipart_parts(request, body)
+        checksum = google_crc32c.Checksum()
+        checksum.update(media)
+        return object_resource(bucket, json.loads(metadata).get("name", name or "object"), len(media), checksum)
+
+    @app.put("/upload/storage/v1/b/{bucket}/o")
+    async def upload_chunk(bucket: str, request: Request, upload_id: str, name: str = "object"):
+        await storage.delay()
+        body = await request.body()
+        upload = uploads.setdefault(upload_id, [0, google_crc32c.Checksum()])
+        upload[0] += len(body)
+        upload[1].update(body)
+        # "bytes 0-N/*" means more chunks follow, "bytes 0-N/TOTAL" is the last one
+        content_range = request.headers.get("content-range", "")
+        if content_range.endswith("/*"):
+            return Response(status_code=308, headers={"Range": f"bytes=0-{upload[0] - 1}"})
+        size, checksum = uploads.pop(upload_id)
+        return object_resource(bucket, name, size, checksum)
+
+    @app.get("/storage/v1/b/{bucket}/o/{name:path}/acl")
+    async def object_acl(bucket: str, name: str):
+        await storage.delay()
+        return {"kind": "storage#objectAccessControls", "items": []}
+
+    @app.patch("/storage/v1/b/{bucket}/o/{name:path}")
+    async def patch_object(bucket: str, name: str, request: Request):
+        await storage.delay()
+        body = await request.json()
+        return {**object_resource(bucket, name, 0), **body}
+
+    @app.on_event("shutdown")
+    async def close_http():
+        await http.aclose()
+
+    return app
+
+
+def write_credentials(path: str, token_uri: str) -> None:
+    """Writes a throwaway service-account file whose token_uri points at this mock."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "mock-project",
+            "private_key_id": "mock",
+            "private_key": pem,
+            "client_email": "mock@mock-project.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": token_uri
+        }, f)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency spread as a fraction of the mean")
+    parser.add_argument("--llm-latency", type=float, default=3.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-failing-model", help="Apply --llm-failure-rate to this model only, e.g. to exercise a fallback model")
+    parser.add_argument("--llm-tail-rate", type=float, default=0.0, help="Fraction of blocking completions that take --llm-tail-seconds longer")
+    parser.add_argument("--llm-tail-seconds", type=float, default=10.0)
+    parser.add_argument("--llm-rate-limit", type=float, default=0.0, help="Chat completions per second before 429s; 0 is unlimited")
+    parser.add_argument("--stream-chunk-chars", type=int, default=24)
+    parser.add_argument("--shotstack-latency", type=float, default=0.15)
+    parser.add_argument("--shotstack-failure-rate", type=float, default=0.0)
+    parser.add_argument("--shotstack-rate-limit", type=float, default=0.0, help="Shotstack requests per second, across all its APIs, before 429s; 0 is unlimited")
+    parser.add_argument("--render-seconds", type=float, default=20.0, help="Render time of a 720x1280 25 fps output; other sizes scale with pixels per second")
+    parser.add_argument("--ingest-seconds", type=float, default=8.0)
+    parser.add_argument("--image-seconds", type=float, default=6.0, help="Time to generate text-to-image assets, inline in a render or via the Create API")
+    parser.add_argument("--render-failure-rate", type=float, default=0.0)
+    parser.add_argument("--storage-latency", type=float, default=0.05)
+    parser.add_argument("--storage-failure-rate", type=float, default=0.0)
+    parser.add_argument("--write-credentials", metavar="PATH", help="Write a mock service-account file for FIREBASE_CREDENTIALS_PATH before serving")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.write_credentials:
+        write_credentials(args.write_credentials, f"http://{args.host}:{args.port}/token")
+        print(f"wrote mock service account to {args.write_credentials}")
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
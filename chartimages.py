@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from cachebackends import make_backend
+from metrics import Counter, Histogram
+from singleflight import SingleFlight
+
+# Configuration
+# 'local' draws slide chart data into an image asset, 'none' keeps the background video in that slot
+CHART_RENDERING = os.getenv('CHART_RENDERING', 'local')
+# 'png' is drawn with Pillow; 'svg' needs no extra packages but only suits consumers that accept SVG
+CHART_FORMAT = os.getenv('CHART_FORMAT', 'png')
+CHART_SIZE = int(os.getenv('CHART_SIZE', '720'))
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))
+# TrueType font for labels; Pillow's built-in font is used when unset
+CHART_FONT_PATH = os.getenv('CHART_FONT_PATH')
+CHART_MAX_ITEMS = int(os.getenv('CHART_MAX_ITEMS', '8'))
+CHART_CACHE_BACKEND = os.getenv('CHART_CACHE_BACKEND', 'memory')
+CHART_CACHE_SQLITE_PATH = os.getenv('CHART_CACHE_SQLITE_PATH', 'chart_cache.sqlite3')
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('CHART_CACHE_MAX_ENTRIES', '1000'))
+CHART_CACHE_TTL_SECONDS = float(os.getenv('CHART_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+
+CHART_KINDS = ("pie", "bar", "line")
+PALETTE = ("#2b59c3", "#f25c54", "#f7b32b", "#3bb273", "#7768ae", "#e15a97", "#4ecdc4", "#8d6a9f")
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+# Pillow draws at this multiple of the output size and downsamples, which anti-aliases edges
+SUPERSAMPLE = 2
+
+chart_images = Counter(
+    "chart_images_total", "Slide chart images by result: cached, rendered, failed or skipped (nowhere to upload).", ("result",)
+)
+chart_render_seconds = Histogram(
+    "chart_render_seconds",
+    "Time to draw one chart image in the worker pool.",
+    ("format",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def _number(value: Any) -> Optional[float]:
+    """Reads 72, 72.5, "72%" or "1,5" as a float; None when there is no finite number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        match = _NUMBER.search(str(value))
+        if match is None:
+            return None
+        number = float(match.group().replace(",", "."))
+    return number if math.isfinite(number) else None
+
+
+def chart_data(values: Dict[str, Any], max_items: int = CHART_MAX_ITEMS) -> List[Tuple[str, float]]:
+    """Label/value pairs that can be drawn, in input order; items past `max_items` are summed into "Other"."""
+    data = [(str(label), number) for label, value in values.items() if (number := _number(value)) is not None]
+    if len(data) > max_items:
+        rest = sum(value for _, value in data[max_items - 1:])
+        data = data[:max_items - 1] + [("Other", rest)]
+    return data
+
+
+def chart_spec(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """What to draw for a slide's `pie_chart` (or None when it has no usable data); also the cache key material."""
+    values = item.get('pie_chart')
+    if not isinstance(values, dict):
+        return None
+    data = chart_data(values)
+    kind = item.get('chart_type') if item.get('chart_type') in CHART_KINDS else "pie"
+    if not data or (kind == "pie" and (any(value < 0 for _, value in data) or sum(value for _, value in data) <= 0)):
+        return None
+    return {
+        "kind": kind,
+        "data": data,
+        "format": CHART_FORMAT,
+        "size": CHART_SIZE,
+        "font": CHART_FONT_PATH,
+        "palette": PALETTE
+    }
+
+
+def chart_key(spec: Dict[str, Any]) -> str:
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _label(text: str, limit: int = 18) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _value_text(value: float) -> str:
+    return f"{value:g}" if abs(value) < 1e6 else f"{value:.3g}"
+
+
+def chart_shapes(spec: Dict[str, Any]) -> List[Tuple[Any, ...]]:
+    """
+    Lays a chart out as drawing primitives in a `size` x `size` box, shared by the PNG and SVG writers:
+    ("rect", x0, y0, x1, y1, color, radius), ("wedge", cx, cy, r, start_deg, end_deg, color),
+    ("polyline", points, color, width), ("circle", cx, cy, r, color) and ("text", x, y, text, font_size, color, align).
+    Angles run clockwise from 3 o'clock; text is vertically centred on y and
+    either centred on x (align "middle") or starts at x (align "start").
+    """
+    size = spec["size"]
+    palette = spec["palette"]
+    data = spec["data"]
+    font = size * 0.036
+    shapes: List[Tuple[Any, ...]] = [("rect", 0, 0, size, size, "#ffffff", size * 0.06)]
+
+    if spec["kind"] == "pie":
+        total = sum(value for _, value in data)
+        cx, cy, r = size / 2, size * 0.40, size * 0.30
+        angle = -90.0
+        for index, (_, value) in enumerate(data):
+            sweep = 360.0 * value / total
+            color = palette[index % len(palette)]
+            shapes.append(("wedge", cx, cy, r, angle, angle + sweep, color))
+            if sweep >= 18:
+                middle = math.radians(angle + sweep / 2)
+                shapes.append(("text", cx + r * 0.62 * math.cos(middle), cy + r * 0.62 * math.sin(middle),
+                               f"{100 * value / total:.0f}%", font, "#ffffff", "middle"))
+            angle += sweep
+        # Legend: two columns of four rows under the pie
+        for index, (label, _) in enumerate(data):
+            column, row = divmod(index, 4)
+            x = size * (0.10 + 0.45 * column)
+            y = size * (0.78 + 0.055 * row)
+            color = palette[index % len(palette)]
+            shapes.append(("rect", x, y - font * 0.45, x + font * 0.9, y + font * 0.45, color, font * 0.15))
+            shapes.append(("text", x + font * 1.4, y, _label(label), font, "#000000", "start"))
+        return shapes
+
+    left, right, top, bottom = size * 0.08, size * 0.92, size * 0.14, size * 0.80
+    low = min(0.0, min(value for _, value in data))
+    high = max(0.0, max(value for _, value in data))
+    span = (high - low) or 1.0
+
+    def y_of(value: float) -> float:
+        return bottom - (value - low) / span * (bottom - top)
+
+    slot = (right - left) / len(data)
+    shapes.append(("polyline", [(left, y_of(0)), (right, y_of(0))], "#999999", max(1.0, size / 360)))
+    points = []
+    for index, (label, value) in enumerate(data):
+        x = left + slot * (index + 0.5)
+        y = y_of(value)
+        if spec["kind"] == "bar":
+            color = palette[index % len(palette)]
+            shapes.append(("rect", x - slot * 0.35, min(y, y_of(0)), x + slot * 0.35, max(y, y_of(0)), color, 0))
+        points.append((x, y))
+        if spec["kind"] == "bar":
+            label_y = min(y, y_of(0)) - font * 0.9
+        else:
+            label_y = y - font * 1.3
+        shapes.append(("text", x, label_y, _value_text(value), font, "#000000", "middle"))
+        shapes.append(("text", x, bottom + font * 1.4, _label(label, max(4, int(slot / (font * 0.55)))), font * 0.85, "#000000", "middle"))
+    if spec["kind"] == "line":
+        shapes.append(("polyline", points, palette[0], size / 120))
+        for x, y in points:
+            shapes.append(("circle", x, y, size / 80, palette[0]))
+    return shapes
+
+
+def _svg(spec: Dict[str, Any]) -> bytes:
+    size = spec["size"]
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">']
+    for shape in chart_shapes(spec):
+        kind = shape[0]
+        if kind == "rect":
+            _, x0, y0, x1, y1, color, radius = shape
+            parts.append(f'<rect x="{x0:.1f}" y="{y0:.1f}" width="{x1 - x0:.1f}" height="{y1 - y0:.1f}" rx="{radius:.1f}" fill="{color}"/>')
+        elif kind == "wedge":
+            _, cx, cy, r, start, end, color = shape
+            if end - start >= 359.999:
+                parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r:.1f}" fill="{color}"/>')
+                continue
+            x0, y0 = cx + r * math.cos(math.radians(start)), cy + r * math.sin(math.radians(start))
+            x1, y1 = cx + r * math.cos(math.radians(end)), cy + r * math.sin(math.radians(end))
+            large = 1 if end - start > 180 else 0
+            parts.append(f'<path d="M{cx:.1f},{cy:.1f} L{x0:.1f},{y0:.1f} A{r:.1f},{r:.1f} 0 {large} 1 {x1:.1f},{y1:.1f} Z" fill="{color}"/>')
+        elif kind == "polyline":
+            _, points, color, width = shape
+            coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+            parts.append(f'<polyline points="{coords}" fill="none" stroke="{color}" stroke-width="{width:.1f}"/>')
+        elif kind == "circle":
+            _, cx, cy, r, color = shape
+            parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r:.1f}" fill="{color}"/>')
+        elif kind == "text":
+            _, x, y, text, font_size, color, align = shape
+            parts.append(
+                f'<text x="{x:.1f}" y="{y:.1f}" font-family="Montserrat, sans-serif" font-size="{font_size:.1f}" '
+                f'fill="{color}" text-anchor="{align}" dominant-baseline="middle">{escape(text)}</text>'
+            )
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
+
+
+def _png(spec: Dict[str, Any]) -> bytes:
+    # Imported here so the app itself does not need Pillow unless charts are drawn as PNG
+    import io
+    from PIL import Image, ImageDraw, ImageFont
+
+    size = spec["size"] * SUPERSAMPLE
+    fonts: Dict[float, Any] = {}
+
+    def font(font_size: float) -> Any:
+        if font_size not in fonts:
+            pixels = max(8, round(font_size * SUPERSAMPLE))
+            fonts[font_size] = ImageFont.truetype(spec["font"], pixels) if spec["font"] else ImageFont.load_default(size=pixels)
+        return fonts[font_size]
+
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    s = SUPERSAMPLE
+    for shape in chart_shapes(spec):
+        kind = shape[0]
+        if kind == "rect":
+            _, x0, y0, x1, y1, color, radius = shape
+            draw.rounded_rectangle((x0 * s, y0 * s, x1 * s, y1 * s), radius=radius * s, fill=color)
+        elif kind == "wedge":
+            _, cx, cy, r, start, end, color = shape
+            draw.pieslice(((cx - r) * s, (cy - r) * s, (cx + r) * s, (cy + r) * s), start, end, fill=color)
+        elif kind == "polyline":
+            _, points, color, width = shape
+            draw.line([(x * s, y * s) for x, y in points], fill=color, width=max(1, round(width * s)), joint="curve")
+        elif kind == "circle":
+            _, cx, cy, r, color = shape
+            draw.ellipse(((cx - r) * s, (cy - r) * s, (cx + r) * s, (cy + r) * s), fill=color)
+        elif kind == "text":
+            _, x, y, text, font_size, color, align = shape
+            draw.text((x * s, y * s), text, fill=color, font=font(font_size), anchor="mm" if align == "middle" else "lm")
+    image = image.reduce(SUPERSAMPLE)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def draw_chart(spec: Dict[str, Any]) -> bytes:
+    """Draws a chart spec to image bytes in spec["format"]. CPU-bound: runs in the chart worker processes."""
+    if spec["format"] == "svg":
+        return _svg(spec)
+    if spec["format"] == "png":
+        return _png(spec)
+    raise ValueError(f"Unknown chart format: {spec['format']}")
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # 'spawn' rather than fork: the app has running threads (LLM pool, warm-up) that fork would copy mid-state
+        _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+chart_cache = make_backend(
+    CHART_CACHE_BACKEND, max_entries=CHART_CACHE_MAX_ENTRIES, sqlite_path=CHART_CACHE_SQLITE_PATH, table="charts"
+)
+chart_flights = SingleFlight("chart_image")
+
+
+async def _render_and_upload(key: str, spec: Dict[str, Any]) -> str:
+    from shotstackupload import upload_asset
+
+    started = time.perf_counter()
+    body = await asyncio.get_running_loop().run_in_executor(_executor(), draw_chart, spec)
+    chart_render_seconds.observe(time.perf_counter() - started, format=spec["format"])
+    # Content-addressed name, so a re-upload after a cache eviction overwrites the same object
+    url = await asyncio.to_thread(upload_asset, f"charts/{key}.{spec['format']}", body, CONTENT_TYPES[spec["format"]])
+    if chart_cache is not None:
+        chart_cache.set(key, url, ttl=CHART_CACHE_TTL_SECONDS)
+    chart_images.inc(result="rendered")
+    return url
+
+
+async def chart_asset_url(item: Dict[str, Any]) -> Optional[str]:
+    """
+    Public URL of the chart image for a slide's `pie_chart`, drawn and uploaded once per distinct data and style.
+
+    Returns None when charts are off, the slide has no usable data, there is
+    no Firebase bucket to upload to, or drawing or uploading fails; the slide
+    then keeps its usual media.
+    """
+    from shotstackupload import firebase_configured
+
+    if CHART_RENDERING != 'local':
+        return None
+    spec = chart_spec(item)
+    if spec is None:
+        return None
+    key = chart_key(spec)
+    url = chart_cache.get(key) if chart_cache is not None else None
+    if url is not None:
+        chart_images.inc(result="cached")
+        return url
+    if not firebase_configured():
+        # Drawing would only be thrown away when the upload fails
+        chart_images.inc(result="skipped")
+        return None
+    try:
+        return await chart_flights.do(key, _render_and_upload, key, spec)
+    except Exception as e:
+        chart_images.inc(result="failed")
+        print(f"Chart image failed: {e}")
+        return None
+
+
+async def with_chart(item: Dict[str, Any]) -> Dict[str, Any]:
+    """The slide with `chart_url` set when its chart data could be drawn."""
+    url = await chart_asset_url(item)
+    return {**item, 'chart_url': url} if url else item
+
+
+async def attach_charts(slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Draws every slide's chart concurrently; see with_chart."""
+    return list(await asyncio.gather(*(with_chart(item) for item in slides)))
@@ -0,0 +1,159 @@
+import json
+import keyword
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configuration
+CLIP_TEMPLATES_PATH = os.getenv(
+    'CLIP_TEMPLATES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'clips.json')
+)
+
+
+class ClipTemplate:
+    """
+    One Shotstack clip, compiled once into a function that builds it.
+
+    `bind` maps asset keys to slide variables (e.g. {"text": "subtext"}) and
+    `role` names the timeline track the clip is packed onto. The template is
+    turned into the source of a single dict literal with the bound fields,
+    `start` and `length` filled from parameters. Every clip built from it
+    therefore gets fresh nested dicts (offsets, transitions, fonts) and can
+    be edited in place, while strings and numbers are shared constants, and
+    building one costs the same as the hand-written literals the templates
+    replaced.
+    """
+
+    def __init__(self, name: str, clip: Dict[str, Any], bind: Dict[str, str], role: Optional[str] = None):
+        self.name = name
+        self.role = role or name
+        self.clip = clip
+        self.bind: Tuple[Tuple[str, str], ...] = tuple(bind.items())
+        self.variables = tuple(dict.fromkeys(variable for _, variable in self.bind))
+        # An expression of `start`, `length` (None keeps the template's) and the bound variables as locals
+        self.source = _clip_source(clip, self.bind)
+        self._build = _compile(f"clip {name}", self.variables, [f"return {self.source}"])
+
+    def instantiate(self, start: float, values: Dict[str, Any], length: Optional[float] = None) -> Dict[str, Any]:
+        return self._build(start, length, values)
+
+
+class SlideTemplate:
+    """Ordered clip templates making up one slide type; `optional` clips are dropped when their variable is empty."""
+
+    def __init__(self, name: str, clips: List[ClipTemplate], optional: List[str]):
+        self.name = name
+        self.clips = clips
+        self.optional = frozenset(optional)
+        # The whole slide is one compiled function too, so building it makes no per-clip calls
+        variables = tuple(dict.fromkeys(variable for clip in clips for variable in clip.variables))
+        self._place = _compile(f"slide {name}", variables, self._branches(lambda clip: f"({clip.role!r}, {clip.source})"))
+        # build(start, length=None, **values) with the variables as keyword-only parameters, so no dict is packed
+        self.build = _compile(
+            f"slide {name}", variables, self._branches(lambda clip: f"{{'clips': [{clip.source}]}}"), keywords=True
+        )
+
+    def _branches(self, item: Callable[[ClipTemplate], str], index: int = 0, kept: Tuple[ClipTemplate, ...] = (), depth: int = 0) -> List[str]:
+        """One `return [...]` per combination of optional clips present, nested in ifs on their variables."""
+        indent = "    " * depth
+        for position in range(index, len(self.clips)):
+            clip = self.clips[position]
+            if clip.name in self.optional and clip.bind:
+                condition = " and ".join(_local(variable) for variable in clip.variables)
+                return (
+                    [f"{indent}if {condition}:"]
+                    + self._branches(item, position + 1, kept + (clip,), depth + 1)
+                    + self._branches(item, position + 1, kept, depth)
+                )
+            kept += (clip,)
+        return [f"{indent}return [{', '.join(item(clip) for clip in kept)}]"]
+
+    def place(self, start: float, length: Optional[float], values: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns (role, clip) pairs for one slide starting at `start`."""
+        return self._place(start, length, values)
+
+
+def _local(variable: str) -> str:
+    """The name a variable has inside compiled builders."""
+    if not variable.isidentifier() or keyword.iskeyword(variable) or variable in ("start", "length", "values"):
+        raise ValueError(f"Clip template variables must be identifiers other than start, length and values: {variable!r}")
+    return variable
+
+
+def _clip_source(clip: Dict[str, Any], bind: Tuple[Tuple[str, str], ...]) -> str:
+    asset = {key: _literal(value) for key, value in clip["asset"].items()}
+    for asset_key, variable in bind:
+        asset[asset_key] = f'f"{{{_local(variable)}}}"'
+    fields = {key: _literal(value) for key, value in clip.items()}
+    fields["asset"] = _dict_source(asset)
+    fields["start"] = "start"
+    if "length" not in clip:
+        # Only templates without a length pay for merging it in
+        return f"{{**{_dict_source(fields)}, **({{}} if length is None else {{'length': length}})}}"
+    fields["length"] = f"({fields['length']} if length is None else length)"
+    return _dict_source(fields)
+
+
+def _dict_source(fields: Dict[str, str]) -> str:
+    return "{" + ", ".join(f"{key!r}: {source}" for key, source in fields.items()) + "}"
+
+
+def _literal(value: Any) -> str:
+    """Python source for a JSON value; only JSON types are accepted, so the source is always a plain literal."""
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise ValueError(f"Clip template keys must be strings: {value!r}")
+        return _dict_source({key: _literal(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return "[" + ", ".join(_literal(item) for item in value) + "]"
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"Clip template numbers must be finite: {value!r}")
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return repr(value)
+    raise ValueError(f"Clip templates must be JSON values: {value!r}")
+
+
+def _compile(name: str, variables: Tuple[str, ...], statements: List[str], keywords: bool = False) -> Callable[..., Any]:
+    """
+    Compiles `statements` into `build(start, length, values)`, reading each variable from `values` once,
+    or with `keywords` into `build(start, length=None, *, <variables>=None, **values)`.
+    """
+    if keywords:
+        parameters = ", ".join(["start", "length=None", "*", *(f"{_local(variable)}=None" for variable in variables), "**values"])
+        body = statements
+    else:
+        parameters = "start, length, values"
+        body = [f"{_local(variable)} = values.get({variable!r})" for variable in variables] + statements
+    source = f"def build({parameters}):\n" + "".join(f"    {line}\n" for line in body)
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<{name} template>", "exec"), {"__builtins__": {}}, namespace)
+    return namespace["build"]
+
+
+class TemplateRegistry:
+    """Slide types loaded once from a JSON spec (see templates/clips.json)."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.clips = {
+            name: ClipTemplate(name, entry["clip"], entry.get("bind", {}), entry.get("role"))
+            for name, entry in spec["clips"].items()
+        }
+        # Track roles in stacking order, top-most first
+        self.roles: List[str] = list(dict.fromkeys(template.role for template in self.clips.values()))
+        self.slides = {
+            name: SlideTemplate(name, [self.clips[clip] for clip in entry["clips"]], entry.get("optional", []))
+            for name, entry in spec["slides"].items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "TemplateRegistry":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def build(self, slide_type: str, start: float, length: Optional[float] = None, **values: Any) -> List[Dict[str, Any]]:
+        """Returns the tracks for one slide, e.g. build("image_and_text", start=3, maintext=..., subtext=..., media=...)."""
+        return self.slides[slide_type].build(start, length, **values)
+
+
+clip_templates = TemplateRegistry.from_file(CLIP_TEMPLATES_PATH)
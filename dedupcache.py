@@ -0,0 +1,45 @@
+import hashlib
+import os
+from typing import Any, BinaryIO, Dict, Optional
+
+from cachebackends import CacheBackend, make_backend
+
+# Configuration
+DEDUP_BACKEND = os.getenv('DEDUP_BACKEND', 'memory')
+DEDUP_SQLITE_PATH = os.getenv('DEDUP_SQLITE_PATH', 'dedup_cache.sqlite3')
+DEDUP_TTL_SECONDS = float(os.getenv('DEDUP_TTL_SECONDS', str(7 * 24 * 3600)))
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '10000'))
+DEDUP_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_fileobj(fileobj: BinaryIO, chunk_size: int = DEDUP_HASH_CHUNK_SIZE) -> str:
+    """Returns the SHA-256 of a file object, reading it in fixed-size chunks and rewinding it afterwards."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class DedupCache:
+    """Maps the content hash of an uploaded video to its ingested Shotstack source."""
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = DEDUP_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        return self.backend.get(digest)
+
+    def put(self, digest: str, source_id: str, video_url: str) -> None:
+        if self.backend is None:
+            return
+        self.backend.set(digest, {"source_id": source_id, "video_url": video_url}, ttl=self.ttl)
+
+
+dedup_cache = DedupCache(
+    make_backend(DEDUP_BACKEND, max_entries=DEDUP_MAX_ENTRIES, sqlite_path=DEDUP_SQLITE_PATH, table="uploads")
+)
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import Counter, Histogram
+from outbound import Route
+
+# Configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+HTTP_PER_HOST_LIMIT = int(os.getenv('HTTP_PER_HOST_LIMIT', '20'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+HTTP_WRITE_TIMEOUT = float(os.getenv('HTTP_WRITE_TIMEOUT', '30'))
+HTTP_POOL_TIMEOUT = float(os.getenv('HTTP_POOL_TIMEOUT', '10'))
+
+# HTTP/2 needs the optional `h2` package (installed by httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+outbound_requests = Counter("outbound_requests_total", "Outbound HTTP requests by host, method and status (or error).", ("host", "method", "status"))
+outbound_request_seconds = Histogram("outbound_request_seconds", "Outbound HTTP request latency by host.", ("host",))
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the app-wide AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=HTTP_CONNECT_TIMEOUT,
+                read=HTTP_READ_TIMEOUT,
+                write=HTTP_WRITE_TIMEOUT,
+                pool=HTTP_POOL_TIMEOUT
+            )
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Closes the pooled connections; call from the app's shutdown hook."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    semaphore = _host_limits.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(HTTP_PER_HOST_LIMIT)
+        _host_limits[host] = semaphore
+    return semaphore
+
+
+async def request(method: str, url: str, route: Optional[Route] = None, **kwargs: Any) -> httpx.Response:
+    """
+    Sends a request on the shared client, holding a per-host concurrency slot while it runs.
+
+    With a `route` the request also goes through that upstream's rate limit
+    and is retried on the failures the route allows.
+    """
+    if route is not None:
+        return await route.call(lambda: _send(method, url, **kwargs))
+    return await _send(method, url, **kwargs)
+
+
+async def _send(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    host = urlsplit(url).netloc
+    async with _host_limit(url):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await get_client().request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            outbound_request_seconds.observe(time.perf_counter() - started, host=host)
+            outbound_requests.inc(host=host, method=method, status=status)
+
+
+async def get(url: str, route: Optional[Route] = None, **kwargs: Any) -> httpx.Response:
+    return await request("GET", url, route=route, **kwargs)
+
+
+async def post(url: str, route: Optional[Route] = None, **kwargs: Any) -> httpx.Response:
+    return await request("POST", url, route=route, **kwargs)
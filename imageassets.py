@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+
+import httpclient
+from cachebackends import make_backend
+from llmcache import normalize_text
+from metrics import Counter
+from outbound import SHOTSTACK_POLL, SHOTSTACK_SUBMIT
+from poller import Poller, POLL_INITIAL_DELAY, POLL_MAX_DELAY
+from singleflight import SingleFlight
+from videocreationhelper import shotstack_headers, slide_type
+
+# Configuration
+# 'cache' swaps inline text-to-image clips for stored images of the same prompt, 'none' leaves them inline.
+# Off by default: the first render of a prompt pays for the inline image and the stored one, so it only
+# pays off when prompts repeat
+IMAGE_ASSETS = os.getenv('IMAGE_ASSETS', 'none')
+SHOTSTACK_CREATE_API_URL = os.getenv('SHOTSTACK_CREATE_API_URL', 'https://api.shotstack.io/create/stage')
+# How long a render waits for missing images before falling back to inline text-to-image. 0 never holds
+# a render back; generation carries on in the background either way, so the next render of the prompt hits
+IMAGE_PREFETCH_TIMEOUT = float(os.getenv('IMAGE_PREFETCH_TIMEOUT', '0'))
+IMAGE_ASSET_WIDTH = int(os.getenv('IMAGE_ASSET_WIDTH', '1024'))
+IMAGE_ASSET_HEIGHT = int(os.getenv('IMAGE_ASSET_HEIGHT', '1024'))
+IMAGE_POLL_DEADLINE = float(os.getenv('IMAGE_POLL_DEADLINE', '180'))
+IMAGE_CACHE_BACKEND = os.getenv('IMAGE_CACHE_BACKEND', 'memory')
+IMAGE_CACHE_SQLITE_PATH = os.getenv('IMAGE_CACHE_SQLITE_PATH', 'image_cache.sqlite3')
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv('IMAGE_CACHE_MAX_ENTRIES', '5000'))
+IMAGE_CACHE_TTL_SECONDS = float(os.getenv('IMAGE_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+
+image_asset_requests = Counter(
+    "image_asset_requests_total",
+    "Text-to-image prompt lookups in the image asset cache: hit or miss.",
+    ("result",)
+)
+image_asset_generations = Counter(
+    "image_asset_generations_total",
+    "Prompts generated through the Shotstack Create API and stored, by result.",
+    ("result",)
+)
+
+
+def prompt_key(prompt: str) -> str:
+    """Cache key for a prompt; case, unicode variants, whitespace and trailing punctuation do not change it."""
+    normalized = normalize_text(prompt).casefold().rstrip(" .!")
+    material = f"{normalized}|{IMAGE_ASSET_WIDTH}x{IMAGE_ASSET_HEIGHT}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def image_prompt(item: Dict[str, Any]) -> Optional[str]:
+    """The prompt of a slide that would render an inline text-to-image clip, else None."""
+    if slide_type(item) != "image_and_text":
+        return None
+    prompt = item.get('image_prompt', item.get('image'))
+    return prompt if isinstance(prompt, str) and prompt.strip() else None
+
+
+async def fetch_asset_status(asset_id: str) -> Dict[str, Any]:
+    try:
+        response = await httpclient.get(
+            f"{SHOTSTACK_CREATE_API_URL}/assets/{asset_id}", route=SHOTSTACK_POLL, headers=shotstack_headers()
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Asset status check failed: {str(e)}")
+
+
+def _asset_finished(data: Dict[str, Any]) -> bool:
+    return data['data']['attributes']['status'] in ('done', 'failed')
+
+
+asset_poller = Poller(
+    fetch=fetch_asset_status,
+    is_finished=_asset_finished,
+    initial_delay=POLL_INITIAL_DELAY,
+    max_delay=POLL_MAX_DELAY,
+    deadline=IMAGE_POLL_DEADLINE
+)
+
+image_cache = make_backend(
+    IMAGE_CACHE_BACKEND, max_entries=IMAGE_CACHE_MAX_ENTRIES, sqlite_path=IMAGE_CACHE_SQLITE_PATH, table="images"
+)
+image_flights = SingleFlight("image_asset")
+
+
+async def generate_image(key: str, prompt: str) -> str:
+    """Generates a prompt with the Create API, stores the image in the bucket and caches its public URL."""
+    from shotstackupload import upload_asset
+
+    try:
+        response = await httpclient.post(f"{SHOTSTACK_CREATE_API_URL}/assets", route=SHOTSTACK_SUBMIT, headers=shotstack_headers(), json={
+            "provider": "shotstack",
+            "options": {
+                "type": "text-to-image",
+                "prompt": prompt,
+                "width": IMAGE_ASSET_WIDTH,
+                "height": IMAGE_ASSET_HEIGHT
+            }
+        })
+        response.raise_for_status()
+        asset_id = response.json()['data']['id']
+        attributes = (await asset_poller.wait(asset_id))['data']['attributes']
+        if attributes['status'] != 'done':
+            raise ValueError(f"Shotstack could not generate asset {asset_id}")
+        # Shotstack only hosts generated assets for a while, so keep our own copy
+        image = await httpclient.get(attributes['url'])
+        image.raise_for_status()
+        extension = os.path.splitext(httpx.URL(attributes['url']).path)[1] or ".png"
+        content_type = image.headers.get("content-type", "image/png")
+        url = await asyncio.to_thread(upload_asset, f"images/{key}{extension}", image.content, content_type)
+    except Exception as e:
+        image_asset_generations.inc(result="failed")
+        print(f"Image asset for prompt {prompt[:60]!r} failed: {e}")
+        raise
+    if image_cache is not None:
+        image_cache.set(key, url, ttl=IMAGE_CACHE_TTL_SECONDS)
+    image_asset_generations.inc(result="stored")
+    return url
+
+
+async def attach_images(slides: List[Dict[str, Any]], timeout: float = IMAGE_PREFETCH_TIMEOUT) -> List[Dict[str, Any]]:
+    """
+    Sets `image_url` on slides whose text-to-image prompt has a stored image.
+
+    Cached prompts are used straight away. Missing ones are generated
+    concurrently (one generation per prompt across all requests); the ones
+    that finish within `timeout` are used too, and the rest stay inline
+    while their generation continues for later renders. With a timeout of 0
+    nothing waits.
+    """
+    if IMAGE_ASSETS != 'cache' or image_cache is None:
+        return slides
+    slides = list(slides)
+    pending: Dict[asyncio.Future, List[int]] = {}
+    flights: Dict[str, asyncio.Future] = {}
+    for index, item in enumerate(slides):
+        prompt = image_prompt(item)
+        if prompt is None:
+            continue
+        key = prompt_key(prompt)
+        url = image_cache.get(key)
+        if url is not None:
+            image_asset_requests.inc(result="hit")
+            slides[index] = {**item, 'image_url': url}
+            continue
+        image_asset_requests.inc(result="miss")
+        if key not in flights:
+            flights[key] = asyncio.ensure_future(image_flights.do(key, generate_image, key, prompt))
+            pending[flights[key]] = []
+        pending[flights[key]].append(index)
+
+    if not pending:
+        return slides
+    done, _ = await asyncio.wait(pending, timeout=timeout) if timeout > 0 else (set(), set())
+    for future in pending:
+        if future not in done:
+            # Generation keeps running inside image_flights; only stop waiting for it here
+            future.add_done_callback(_discard_result)
+            continue
+        if future.exception() is None:
+            for index in pending[future]:
+                slides[index] = {**slides[index], 'image_url': future.result()}
+    return slides
+
+
+def _discard_result(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+import httpclient
+from jobstore import JobStore, job_store
+from metrics import Counter, Gauge
+
+# Configuration
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '3600'))
+JOB_WEBHOOK_TIMEOUT = float(os.getenv('JOB_WEBHOOK_TIMEOUT', '10'))
+# How many items of one batch a worker runs at the same time
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '16'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '100'))
+
+# Job stages, in pipeline order
+STAGE_QUEUED = "queued"
+STAGE_LLM = "llm"
+STAGE_TRACKS = "tracks"
+STAGE_RENDER = "render"
+STAGE_POLLING = "polling"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+FINISHED_STAGES = (STAGE_DONE, STAGE_FAILED)
+
+job_workers = Gauge("job_workers", "Job queue workers started.")
+job_workers_busy = Gauge("job_workers_busy", "Job queue workers currently running a job or batch.")
+job_queue_depth = Gauge("job_queue_depth", "Jobs and batches waiting for a worker.")
+jobs_recovered = Counter("jobs_recovered_total", "Unfinished jobs picked up from the job store at startup, by stage.", ("stage",))
+
+
+class Job(BaseModel):
+    job_id: str
+    stage: str = STAGE_QUEUED
+    created_at: float
+    updated_at: float
+    request: Dict[str, Any] = {}
+    callback_url: Optional[str] = None
+    render_id: Optional[str] = None
+    video_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    error: Optional[str] = None
+    stage_timings: Dict[str, float] = {}
+    batch_id: Optional[str] = None
+    # Parsed LLM slides, kept so a job resumed after a restart does not call the LLM again
+    slides: Optional[List[Dict[str, Any]]] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    render_id: Optional[str] = None
+    video_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    error: Optional[str] = None
+    stage_timings: Dict[str, float] = {}
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str
+    counts: Dict[str, int] = {}
+    items: List[JobStatusResponse] = []
+
+
+JobRunner = Callable[[Job], Awaitable[None]]
+
+
+class JobQueue:
+    """
+    In-process job queue with a fixed pool of asyncio workers.
+
+    Submitting returns immediately; workers pick jobs off the queue and run
+    them through the runner, which reports progress with `set_stage`.
+    A batch is one queue entry: the worker that picks it up fans its jobs
+    out concurrently, at most `batch_concurrency` at a time, so one worker
+    keeps many renders in flight instead of one.
+    Finished jobs are kept for JOB_TTL_SECONDS so clients can read the result.
+    Every stage change is written to the job store; on start, jobs the last
+    process left unfinished are loaded back and queued again, so the runner
+    can pick up from the last stage it recorded.
+    """
+
+    def __init__(self, runner: JobRunner, workers: int = JOB_WORKERS, ttl: int = JOB_TTL_SECONDS,
+                 batch_concurrency: int = BATCH_MAX_CONCURRENCY, store: JobStore = job_store):
+        self.runner = runner
+        self.store = store
+        self.workers = workers
+        self.ttl = ttl
+        self.batch_concurrency = batch_concurrency
+        self.jobs: Dict[str, Job] = {}
+        self.batches: Dict[str, List[str]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # In-flight webhook deliveries, and the latest one of each job so the next waits for it
+        self._webhooks: Set[asyncio.Task] = set()
+        self._last_webhook: Dict[str, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        job_workers.set(self.workers)
+        self._recover()
+
+    def _recover(self) -> None:
+        """Queues the jobs a previous process left unfinished, keeping batches together."""
+        entries: Dict[str, List[str]] = {}
+        for document in self.store.unfinished(list(FINISHED_STAGES)):
+            job = Job.model_validate_json(document)
+            self.jobs[job.job_id] = job
+            jobs_recovered.inc(stage=job.stage)
+            entries.setdefault(job.batch_id or job.job_id, []).append(job.job_id)
+            if job.batch_id and job.batch_id not in self.batches:
+                self._recover_batch(job.batch_id)
+        for job_ids in entries.values():
+            self._queue.put_nowait(job_ids)
+        job_queue_depth.set(self._queue.qsize())
+        if entries:
+            print(f"Recovered {sum(len(job_ids) for job_ids in entries.values())} unfinished jobs from the job store")
+
+    def _recover_batch(self, batch_id: str) -> None:
+        """Loads every stored job of a batch, finished ones included, so its status still lists them all."""
+        job_ids = []
+        for document in self.store.batch(batch_id):
+            job = Job.model_validate_json(document)
+            self.jobs.setdefault(job.job_id, job)
+            job_ids.append(job.job_id)
+        self.batches[batch_id] = job_ids
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        job_workers.set(0)
+
+    def submit(self, request: Dict[str, Any], callback_url: Optional[str] = None) -> Job:
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        self._evict_expired()
+        job = self._new_job(request, callback_url)
+        self._queue.put_nowait([job.job_id])
+        job_queue_depth.set(self._queue.qsize())
+        return job
+
+    def submit_batch(self, requests: List[Dict[str, Any]], callback_urls: List[Optional[str]]) -> str:
+        """Queues one job per request as a single batch and returns the batch id."""
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        self._evict_expired()
+        batch_id = str(uuid.uuid4())
+        job_ids = [self._new_job(request, callback_url, batch_id).job_id for request, callback_url in zip(requests, callback_urls)]
+        self.batches[batch_id] = job_ids
+        self._queue.put_nowait(job_ids)
+        job_queue_depth.set(self._queue.qsize())
+        return batch_id
+
+    def _new_job(self, request: Dict[str, Any], callback_url: Optional[str], batch_id: Optional[str] = None) -> Job:
+        now = time.time()
+        job = Job(
+            job_id=str(uuid.uuid4()),
+            created_at=now,
+            updated_at=now,
+            request=request,
+            callback_url=callback_url,
+            batch_id=batch_id
+        )
+        self.jobs[job.job_id] = job
+        self._save(job)
+        return job
+
+    def _save(self, job: Job) -> None:
+        self.store.save(job.job_id, job.stage, job.batch_id, job.updated_at, job.model_dump_json())
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Finished before the last restart, or evicted from memory but still within the store's TTL
+            document = self.store.get(job_id)
+            job = Job.model_validate_json(document) if document else None
+        return job
+
+    def get_batch(self, batch_id: str) -> Optional[List[Job]]:
+        job_ids = self.batches.get(batch_id)
+        if job_ids is None:
+            documents = self.store.batch(batch_id)
+            return [Job.model_validate_json(document) for document in documents] if documents else None
+        return [self.jobs[job_id] for job_id in job_ids if job_id in self.jobs]
+
+    def set_stage(self, job: Job, stage: str, **fields: Any) -> None:
+        """Move a job to a new stage, record how long the previous one took and notify the webhook."""
+        now = time.time()
+        job.stage_timings[job.stage] = round(now - job.updated_at, 3)
+        job.stage = stage
+        job.updated_at = now
+        for key, value in fields.items():
+            setattr(job, key, value)
+        self._save(job)
+        self._notify(job)
+
+    def update(self, job: Job, **fields: Any) -> None:
+        """Set fields on a job without changing its stage, e.g. a preview URL, and notify the webhook."""
+        for key, value in fields.items():
+            setattr(job, key, value)
+        self._save(job)
+        self._notify(job)
+
+    def _notify(self, job: Job) -> None:
+        if not job.callback_url:
+            return
+        payload = status_response(job).model_dump()
+        previous = self._last_webhook.get(job.job_id)
+        task = asyncio.create_task(_post_webhook(job.callback_url, payload, after=previous))
+        self._webhooks.add(task)
+        self._last_webhook[job.job_id] = task
+
+        def delivered(task: asyncio.Task, job_id: str = job.job_id) -> None:
+            self._webhooks.discard(task)
+            if self._last_webhook.get(job_id) is task:
+                del self._last_webhook[job_id]
+
+        task.add_done_callback(delivered)
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.stage in FINISHED_STAGES and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        empty = [batch_id for batch_id, job_ids in self.batches.items() if not any(job_id in self.jobs for job_id in job_ids)]
+        for batch_id in empty:
+            del self.batches[batch_id]
+        self.store.delete_finished(list(FINISHED_STAGES), cutoff)
+
+    async def _worker(self) -> None:
+        while True:
+            job_ids = await self._queue.get()
+            job_queue_depth.set(self._queue.qsize())
+            job_workers_busy.inc()
+            try:
+                if len(job_ids) == 1:
+                    await self._run(job_ids[0])
+                else:
+                    limit = asyncio.Semaphore(self.batch_concurrency)
+
+                    async def run_limited(job_id: str) -> None:
+                        async with limit:
+                            await self._run(job_id)
+
+                    await asyncio.gather(*(run_limited(job_id) for job_id in job_ids))
+            finally:
+                job_workers_busy.dec()
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        try:
+            await self.runner(job)
+            if job.stage not in FINISHED_STAGES:
+                self.set_stage(job, STAGE_DONE)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.set_stage(job, STAGE_FAILED, error=str(e))
+
+
+def status_response(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.job_id,
+        status=job.stage,
+        render_id=job.render_id,
+        video_url=job.video_url,
+        preview_url=job.preview_url,
+        error=job.error,
+        stage_timings=job.stage_timings
+    )
+
+
+def batch_status_response(batch_id: str, jobs: List[Job]) -> BatchStatusResponse:
+    """Summarises a batch: queued or running until every item has finished, then done, failed or partial."""
+    counts: Dict[str, int] = {}
+    for job in jobs:
+        counts[job.stage] = counts.get(job.stage, 0) + 1
+    finished = sum(counts.get(stage, 0) for stage in FINISHED_STAGES)
+    if counts.get(STAGE_QUEUED, 0) == len(jobs):
+        status = STAGE_QUEUED
+    elif finished < len(jobs):
+        status = "running"
+    elif counts.get(STAGE_FAILED, 0) == 0:
+        status = STAGE_DONE
+    elif counts.get(STAGE_DONE, 0) == 0:
+        status = STAGE_FAILED
+    else:
+        status = "partial"
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        status=status,
+        counts=counts,
+        items=[status_response(job) for job in jobs]
+    )
+
+
+async def _post_webhook(url: str, payload: Dict[str, Any], after: Optional[asyncio.Task] = None) -> None:
+    """Posts a job update; `after` is the job's previous delivery, so a receiver sees its stages in order."""
+    if after is not None:
+        await asyncio.wait([after])
+    try:
+        await httpclient.post(url, json=payload, timeout=JOB_WEBHOOK_TIMEOUT)
+    except Exception as e:
+        print(f"Webhook delivery to {url} failed: {e}")
@@ -0,0 +1,200 @@
+import abc
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import os
+
+# Configuration
+# 'sqlite' keeps jobs and in-flight ingests across restarts, 'memory' forgets them with the process
+JOB_STORE = os.getenv('JOB_STORE', 'sqlite')
+JOB_STORE_SQLITE_PATH = os.getenv('JOB_STORE_SQLITE_PATH', 'jobs.sqlite3')
+
+
+class JobStore(abc.ABC):
+    """
+    Durable record of video jobs and Shotstack ingests that are still running.
+
+    Jobs are stored as JSON documents with their stage, so unfinished ones
+    can be resumed after a restart; ingests map an upload's content hash to
+    the Shotstack source id being waited on. The store is meant for a single
+    app process: every process sharing it would resume the same jobs.
+    """
+
+    @abc.abstractmethod
+    def save(self, job_id: str, stage: str, batch_id: Optional[str], updated_at: float, document: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    def batch(self, batch_id: str) -> List[str]:
+        """Documents of every stored job in a batch, in submission order."""
+
+    @abc.abstractmethod
+    def unfinished(self, finished_stages: List[str]) -> List[str]:
+        """Documents of jobs not in `finished_stages`, oldest first."""
+
+    @abc.abstractmethod
+    def delete_finished(self, finished_stages: List[str], before: float) -> int:
+        ...
+
+    @abc.abstractmethod
+    def save_ingest(self, digest: str, source_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def pending_ingest(self, digest: str) -> Optional[str]:
+        """Source id of an unfinished ingest of these bytes, if any."""
+
+    @abc.abstractmethod
+    def pending_ingests(self) -> Dict[str, str]:
+        """Every unfinished ingest as digest -> source id."""
+
+    @abc.abstractmethod
+    def finish_ingest(self, digest: str) -> None:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store; keeps the JobQueue code path the same when durability is off."""
+
+    def __init__(self):
+        self._jobs: Dict[str, tuple] = {}
+        self._ingests: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job_id: str, stage: str, batch_id: Optional[str], updated_at: float, document: str) -> None:
+        with self._lock:
+            created = self._jobs.get(job_id, (None, None, None, None, len(self._jobs)))[4]
+            self._jobs[job_id] = (stage, batch_id, updated_at, document, created)
+
+    def get(self, job_id: str) -> Optional[str]:
+        entry = self._jobs.get(job_id)
+        return entry[3] if entry else None
+
+    def batch(self, batch_id: str) -> List[str]:
+        with self._lock:
+            entries = sorted((entry for entry in self._jobs.values() if entry[1] == batch_id), key=lambda entry: entry[4])
+        return [entry[3] for entry in entries]
+
+    def unfinished(self, finished_stages: List[str]) -> List[str]:
+        with self._lock:
+            entries = sorted((entry for entry in self._jobs.values() if entry[0] not in finished_stages), key=lambda entry: entry[4])
+        return [entry[3] for entry in entries]
+
+    def delete_finished(self, finished_stages: List[str], before: float) -> int:
+        with self._lock:
+            expired = [job_id for job_id, entry in self._jobs.items() if entry[0] in finished_stages and entry[2] < before]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def save_ingest(self, digest: str, source_id: str) -> None:
+        self._ingests[digest] = source_id
+
+    def pending_ingest(self, digest: str) -> Optional[str]:
+        return self._ingests.get(digest)
+
+    def pending_ingests(self) -> Dict[str, str]:
+        return dict(self._ingests)
+
+    def finish_ingest(self, digest: str) -> None:
+        self._ingests.pop(digest, None)
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs and ingests in one SQLite file (WAL mode), written on every stage change."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Stage changes are small and frequent; NORMAL still survives a process crash in WAL mode
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, stage TEXT NOT NULL, batch_id TEXT, "
+                "created_seq INTEGER NOT NULL, updated_at REAL NOT NULL, document TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingests (digest TEXT PRIMARY KEY, source_id TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def save(self, job_id: str, stage: str, batch_id: Optional[str], updated_at: float, document: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, stage, batch_id, created_seq, updated_at, document) "
+                "VALUES (?, ?, ?, (SELECT COALESCE(MAX(created_seq), 0) + 1 FROM jobs), ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET stage = excluded.stage, updated_at = excluded.updated_at, "
+                "document = excluded.document",
+                (job_id, stage, batch_id, updated_at, document)
+            )
+
+    def get(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT document FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def batch(self, batch_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT document FROM jobs WHERE batch_id = ? ORDER BY created_seq", (batch_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def unfinished(self, finished_stages: List[str]) -> List[str]:
+        placeholders = ",".join("?" for _ in finished_stages)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT document FROM jobs WHERE stage NOT IN ({placeholders}) ORDER BY created_seq", tuple(finished_stages)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_finished(self, finished_stages: List[str], before: float) -> int:
+        placeholders = ",".join("?" for _ in finished_stages)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE stage IN ({placeholders}) AND updated_at < ?", (*finished_stages, before)
+            )
+        return cursor.rowcount
+
+    def save_ingest(self, digest: str, source_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingests (digest, source_id, created_at) VALUES (?, ?, ?)", (digest, source_id, time.time())
+            )
+
+    def pending_ingest(self, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT source_id FROM ingests WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def pending_ingests(self) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT digest, source_id FROM ingests ORDER BY created_at").fetchall()
+        return dict(rows)
+
+    def finish_ingest(self, digest: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ingests WHERE digest = ?", (digest,))
+
+
+def make_job_store(kind: str, sqlite_path: Optional[str] = None) -> JobStore:
+    """Builds the job store from configuration: 'sqlite' or 'memory'."""
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        if not sqlite_path:
+            raise ValueError("SQLite job store needs a file path")
+        return SQLiteJobStore(sqlite_path)
+    raise ValueError(f"Unknown job store: {kind}")
+
+
+job_store = make_job_store(JOB_STORE, sqlite_path=JOB_STORE_SQLITE_PATH)
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from typing import Optional
+
+from cachebackends import CacheBackend, MemoryLRUBackend, make_backend
+from metrics import Counter
+
+# Configuration
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', str(24 * 3600)))
+# Optional second tier that survives restarts: 'none' or 'sqlite'
+LLM_CACHE_PERSISTENT = os.getenv('LLM_CACHE_PERSISTENT', 'none')
+LLM_CACHE_SQLITE_PATH = os.getenv('LLM_CACHE_SQLITE_PATH', 'llm_cache.sqlite3')
+LLM_CACHE_PERSISTENT_MAX_ENTRIES = int(os.getenv('LLM_CACHE_PERSISTENT_MAX_ENTRIES', '100000'))
+
+llm_cache_requests = Counter(
+    "llm_cache_requests_total",
+    "LLM response cache lookups by tier and result.",
+    ("tier", "result")
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Folds unicode variants and collapses whitespace so retries of the same input share a key."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM completions.
+
+    The in-process LRU is checked first; the optional persistent tier is
+    checked on a miss and hits from it are promoted back into memory.
+    """
+
+    def __init__(self, memory: CacheBackend, persistent: Optional[CacheBackend] = None, ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.memory = memory
+        self.persistent = persistent
+        self.ttl = ttl
+
+    @staticmethod
+    def key(text: str, model: str, temperature: float, prompt: str = "") -> str:
+        """Builds the cache key from the normalized input, model, temperature and the prompt it was sent with."""
+        material = json.dumps({
+            "text": normalize_text(text),
+            "model": model,
+            "temperature": temperature,
+            "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            llm_cache_requests.inc(tier="memory", result="hit")
+            return value
+        llm_cache_requests.inc(tier="memory", result="miss")
+
+        if self.persistent is None:
+            return None
+        value = self.persistent.get(key)
+        if value is None:
+            llm_cache_requests.inc(tier="persistent", result="miss")
+            return None
+        llm_cache_requests.inc(tier="persistent", result="hit")
+        self.memory.set(key, value, ttl=self.ttl)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        self.memory.set(key, value, ttl=self.ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, value, ttl=self.ttl)
+
+
+llm_cache = LLMCache(
+    memory=MemoryLRUBackend(max_entries=LLM_CACHE_MAX_ENTRIES),
+    persistent=make_backend(
+        LLM_CACHE_PERSISTENT,
+        max_entries=LLM_CACHE_PERSISTENT_MAX_ENTRIES,
+        sqlite_path=LLM_CACHE_SQLITE_PATH,
+        table="llm_responses"
+    )
+)
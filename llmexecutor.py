@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from metrics import Counter, Gauge, Histogram
+
+# Configuration
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+# How many calls may wait for a slot before new ones are turned away
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '256'))
+LLM_ADMISSION_TIMEOUT = float(os.getenv('LLM_ADMISSION_TIMEOUT', '120'))
+
+LLM_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 90)
+
+llm_request_seconds = Histogram("llm_request_seconds", "Time spent in the LLM call itself.", buckets=LLM_BUCKETS)
+llm_admission_wait_seconds = Histogram("llm_admission_wait_seconds", "Time LLM calls waited for a concurrency slot.", buckets=LLM_BUCKETS)
+llm_in_flight = Gauge("llm_in_flight", "LLM calls currently running.")
+llm_queue_depth = Gauge("llm_queue_depth", "LLM calls waiting for a concurrency slot.")
+llm_rejected = Counter("llm_rejected_total", "LLM calls turned away by the admission controller.", ("reason",))
+llm_tokens = Counter("llm_tokens_total", "Tokens billed for LLM calls by kind (prompt/completion) and slide output mode.", ("kind", "mode"))
+
+T = TypeVar("T")
+
+
+class AdmissionController:
+    """
+    Semaphore with a bounded waiting room.
+
+    Up to `limit` callers run at once; the next `max_queue` wait in line for
+    at most `timeout` seconds, and anything beyond that is rejected straight
+    away with a 503 so bursts queue instead of piling onto the upstream.
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AdmissionController":
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            llm_rejected.inc(reason="queue_full")
+            raise HTTPException(status_code=503, detail="LLM queue is full, retry later")
+
+        self.waiting += 1
+        llm_queue_depth.set(self.waiting)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            llm_rejected.inc(reason="timeout")
+            raise HTTPException(status_code=503, detail="Timed out waiting for an LLM slot")
+        finally:
+            self.waiting -= 1
+            llm_queue_depth.set(self.waiting)
+        llm_admission_wait_seconds.observe(time.perf_counter() - started)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._semaphore.release()
+
+
+llm_admission = AdmissionController(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_ADMISSION_TIMEOUT)
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+
+async def run_llm(fn: Callable[..., T], *args: Any) -> T:
+    """Runs a blocking LLM call on the dedicated thread pool once the admission controller lets it in."""
+    async with llm_admission:
+        llm_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+        finally:
+            llm_request_seconds.observe(time.perf_counter() - started)
+            llm_in_flight.dec()
+
+
+def record_token_usage(usage: Any, mode: str) -> None:
+    """Logs and counts the prompt/completion tokens reported for one OpenAI call."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    llm_tokens.inc(prompt_tokens, kind="prompt", mode=mode)
+    llm_tokens.inc(completion_tokens, kind="completion", mode=mode)
+    print(f"llm tokens mode={mode} prompt={prompt_tokens} completion={completion_tokens}")
+
+
+_STREAM_END = object()
+
+
+async def stream_llm(fn: Callable[..., Iterable[T]], *args: Any) -> AsyncIterator[T]:
+    """
+    Runs a blocking streaming LLM call on the thread pool and yields its items on the event loop.
+
+    The call holds one admission slot until the stream is exhausted; errors
+    raised while iterating are re-raised to the consumer.
+    """
+    async with llm_admission:
+        llm_in_flight.inc()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        # Set when the consumer goes away, so the worker thread stops reading the stream
+        stop = threading.Event()
+
+        def produce() -> None:
+            try:
+                for item in fn(*args):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+        producer = loop.run_in_executor(_executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            await producer
+            llm_request_seconds.observe(time.perf_counter() - started)
+            llm_in_flight.dec()
@@ -0,0 +1,303 @@
+import asyncio
+import collections
+import math
+import os
+import time
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+from metrics import Counter, Gauge
+from outbound import RetryBudget
+
+# Configuration
+# Start a second, identical call when the first has not answered by this percentile of recent latencies; 0 turns hedging off
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0.95'))
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1'))
+# Used until LLM_HEDGE_MIN_SAMPLES calls have finished and there is a percentile to go on
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv('LLM_HEDGE_INITIAL_DELAY', '15'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_HEDGE_WINDOW = int(os.getenv('LLM_HEDGE_WINDOW', '200'))
+# Hedges may add at most this fraction of extra calls, so a slowdown of every call does not double the load
+LLM_HEDGE_RATIO = float(os.getenv('LLM_HEDGE_RATIO', '0.1'))
+LLM_HEDGE_BURST = float(os.getenv('LLM_HEDGE_BURST', '10'))
+# The breaker opens when at least this share of the calls in the window failed
+LLM_BREAKER_FAILURE_RATE = float(os.getenv('LLM_BREAKER_FAILURE_RATE', '0.5'))
+LLM_BREAKER_MIN_CALLS = int(os.getenv('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv('LLM_BREAKER_WINDOW_SECONDS', '60'))
+# How long an open breaker fails fast before letting one probe call through
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+
+# Failures where the model did not answer in time or could not be reached. Matched by class name,
+# since the OpenAI SDK raises its own APIConnectionError (and APITimeoutError) and may ship its own httpx
+CONNECTION_ERRORS = ("TransportError", "APIConnectionError", "TimeoutError")
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+llm_hedges = Counter(
+    "llm_hedges_total",
+    "LLM hedging by model and outcome: fired, denied (hedge budget spent), won or lost (whether the hedge answered first).",
+    ("model", "outcome")
+)
+llm_hedge_delay_seconds = Gauge("llm_hedge_delay_seconds", "Current wait before an LLM call is hedged, by model.", ("model",))
+llm_breaker_state = Gauge("llm_breaker_state", "LLM circuit breaker state by model: 0 closed, 1 half open, 2 open.", ("model",))
+llm_breaker_transitions = Counter("llm_breaker_transitions_total", "LLM circuit breaker state changes by model and new state.", ("model", "state"))
+llm_breaker_rejected = Counter("llm_breaker_rejected_total", "LLM calls not sent because the model's breaker was open, by model.", ("model",))
+llm_fallbacks = Counter("llm_fallbacks_total", "LLM calls answered by a fallback model, by that model.", ("model",))
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """The latencies of the last `size` finished calls."""
+
+    def __init__(self, size: int):
+        self._samples: Deque[float] = collections.deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Nearest-rank percentile; None until LLM_HEDGE_MIN_SAMPLES calls have been seen."""
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class Hedger:
+    """
+    Sends a second, identical call when the first is slower than usual.
+
+    The hedge starts once the first call has run for the configured
+    percentile of recent latencies, and whichever call succeeds first is
+    used. The slower call is left to finish rather than cancelled: its
+    request is already paid for, it still holds its LLM slot, and its
+    latency keeps the percentile honest. Hedges spend a budget, so when
+    every call slows down at once the load grows by at most LLM_HEDGE_RATIO.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latencies = LatencyWindow(LLM_HEDGE_WINDOW)
+        # Enough saved up for a burst of slow calls, e.g. every in-flight call hitting the same slow patch
+        self.budget = RetryBudget(LLM_HEDGE_RATIO, 0, cap=LLM_HEDGE_BURST)
+        self._stragglers: Set[asyncio.Future] = set()
+
+    def delay(self) -> Optional[float]:
+        if LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        observed = self.latencies.percentile(LLM_HEDGE_PERCENTILE)
+        delay = LLM_HEDGE_INITIAL_DELAY if observed is None else max(LLM_HEDGE_MIN_DELAY, observed)
+        llm_hedge_delay_seconds.set(delay, model=self.model)
+        return delay
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        self.budget.deposit()
+        attempts = [self._start(attempt)]
+        delay = self.delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                if self.budget.withdraw():
+                    llm_hedges.inc(model=self.model, outcome="fired")
+                    attempts.append(self._start(attempt))
+                else:
+                    llm_hedges.inc(model=self.model, outcome="denied")
+
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in attempts:
+                    if future not in done or future.exception() is not None:
+                        continue
+                    if len(attempts) > 1:
+                        llm_hedges.inc(model=self.model, outcome="won" if future is attempts[1] else "lost")
+                    return future.result()
+                # Prefer the first call's error when both fail
+                error = error or next(future.exception() for future in attempts if future in done)
+            raise error
+        finally:
+            for future in pending:
+                self._stragglers.add(future)
+                future.add_done_callback(self._stragglers.discard)
+
+    def _start(self, attempt: Callable[[], Awaitable[T]]) -> asyncio.Future:
+        started = time.perf_counter()
+        future = asyncio.ensure_future(attempt())
+
+        def finished(future: asyncio.Future) -> None:
+            # Retrieve the outcome so a loser's error is not logged as never retrieved
+            if not future.cancelled() and future.exception() is None:
+                self.latencies.observe(time.perf_counter() - started)
+
+        future.add_done_callback(finished)
+        return future
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a model is failing.
+
+    Closed, it counts call outcomes over a sliding window and opens once at
+    least LLM_BREAKER_MIN_CALLS calls were seen and LLM_BREAKER_FAILURE_RATE
+    of them failed. Open, it turns calls away for the cooldown, then goes
+    half open and lets a single probe through: success closes it, failure
+    opens it again.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.state = STATE_CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = collections.deque()
+        self._opened_at = 0.0
+        self._probing = False
+        llm_breaker_state.set(_STATE_VALUES[self.state], model=model)
+
+    def allow(self) -> bool:
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened_at < LLM_BREAKER_COOLDOWN_SECONDS:
+                return False
+            self._transition(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, ok: bool) -> None:
+        if self.state == STATE_OPEN:
+            # A call that started before the breaker opened
+            return
+        if self.state == STATE_HALF_OPEN:
+            self._probing = False
+            self._transition(STATE_CLOSED if ok else STATE_OPEN)
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - LLM_BREAKER_WINDOW_SECONDS:
+            self._outcomes.popleft()
+        failures = sum(1 for _, outcome in self._outcomes if not outcome)
+        if len(self._outcomes) >= LLM_BREAKER_MIN_CALLS and failures >= LLM_BREAKER_FAILURE_RATE * len(self._outcomes):
+            self._transition(STATE_OPEN)
+
+    def release(self) -> None:
+        """Ends an allowed call that says nothing about the model's health, e.g. one turned away locally."""
+        self._probing = False
+
+    def _transition(self, state: str) -> None:
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.state = state
+        llm_breaker_state.set(_STATE_VALUES[state], model=self.model)
+        llm_breaker_transitions.inc(model=self.model, state=state)
+        print(f"LLM circuit breaker for {self.model} is now {state}")
+
+
+class ModelGuard:
+    def __init__(self, model: str):
+        self.model = model
+        self.hedger = Hedger(model)
+        self.breaker = CircuitBreaker(model)
+
+    def record(self, error: Optional[BaseException]) -> None:
+        healthy = model_healthy(error)
+        if healthy is None:
+            self.breaker.release()
+        else:
+            self.breaker.record(healthy)
+
+
+_guards: Dict[str, ModelGuard] = {}
+
+
+def guard(model: str) -> ModelGuard:
+    if model not in _guards:
+        _guards[model] = ModelGuard(model)
+    return _guards[model]
+
+
+def breaker_states() -> Dict[str, str]:
+    return {model: model_guard.breaker.state for model, model_guard in _guards.items()}
+
+
+def model_healthy(error: Optional[BaseException]) -> Optional[bool]:
+    """
+    What a call's outcome says about the model: True healthy, False failing, None nothing.
+
+    Only 429s, 5xx, timeouts and connection errors count against the
+    model. Anything else, e.g. a 400 for our request, a reply we could not
+    use or an HTTPException raised locally before anything was sent, says
+    nothing about its health.
+    """
+    if error is None:
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return False if status == 429 or status >= 500 else None
+    if any(_is_connection_error(cause) for cause in (error, error.__cause__)):
+        return False
+    return None
+
+
+def _is_connection_error(error: Optional[BaseException]) -> bool:
+    return error is not None and any(cls.__name__ in CONNECTION_ERRORS for cls in type(error).__mro__)
+
+
+def _allowed(models: List[str]) -> Iterator[ModelGuard]:
+    """Yields, in order, the guards of the models whose breaker lets a call through, counting skips and fallbacks."""
+    for model in models:
+        model_guard = guard(model)
+        if not model_guard.breaker.allow():
+            llm_breaker_rejected.inc(model=model)
+            continue
+        if model != models[0]:
+            llm_fallbacks.inc(model=model)
+        yield model_guard
+
+
+def _all_open() -> HTTPException:
+    return HTTPException(status_code=503, detail="The LLM is failing and its circuit breaker is open, retry later")
+
+
+def available(models: List[str]) -> ModelGuard:
+    """The guard of the first model whose breaker lets a call through; 503 when every breaker is open."""
+    for model_guard in _allowed(models):
+        return model_guard
+    raise _all_open()
+
+
+async def call(models: List[str], attempt: Callable[[str], Awaitable[T]]) -> Tuple[T, str]:
+    """
+    Runs `attempt(model)` hedged and behind each model's circuit breaker; returns (result, model).
+
+    Models are tried in order. One whose breaker is open is skipped, and a
+    call that fails in a way that counts against the model moves on to the
+    next. Other errors, and the last model's error, are raised as they are.
+    """
+    error: Optional[Exception] = None
+    for model_guard in _allowed(models):
+        model = model_guard.model
+        try:
+            result = await model_guard.hedger.run(lambda: attempt(model))
+        except Exception as e:
+            model_guard.record(e)
+            if model_healthy(e) is not False:
+                raise
+            print(f"LLM call to {model} failed: {e}")
+            error = e
+            continue
+        except BaseException:
+            model_guard.breaker.release()
+            raise
+        model_guard.record(None)
+        return result, model
+    if error is not None:
+        raise error
+    raise _all_open()
@@ -0,0 +1,297 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from metrics import Counter, Gauge, Histogram
+
+# Configuration
+# Requests per second each upstream lets us send (0 turns the limit off), and how many may go out back to back
+OPENAI_RATE_LIMIT = float(os.getenv('OPENAI_RATE_LIMIT', '8'))
+OPENAI_RATE_BURST = int(os.getenv('OPENAI_RATE_BURST', '8'))
+# One quota covers the edit, ingest and create APIs of an API key
+SHOTSTACK_RATE_LIMIT = float(os.getenv('SHOTSTACK_RATE_LIMIT', '10'))
+SHOTSTACK_RATE_BURST = int(os.getenv('SHOTSTACK_RATE_BURST', '10'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '4'))
+OUTBOUND_BACKOFF_BASE = float(os.getenv('OUTBOUND_BACKOFF_BASE', '0.5'))
+OUTBOUND_BACKOFF_MAX = float(os.getenv('OUTBOUND_BACKOFF_MAX', '20'))
+# A Retry-After longer than this is not waited out; the caller gets the 429
+OUTBOUND_MAX_RETRY_AFTER = float(os.getenv('OUTBOUND_MAX_RETRY_AFTER', '60'))
+# Retries may add at most this fraction on top of first attempts, plus a small steady allowance
+OUTBOUND_RETRY_RATIO = float(os.getenv('OUTBOUND_RETRY_RATIO', '0.2'))
+OUTBOUND_RETRY_MIN_PER_SECOND = float(os.getenv('OUTBOUND_RETRY_MIN_PER_SECOND', '1'))
+
+# Waiters with a lower number get the next token first
+PRIORITY_SUBMIT = 0
+PRIORITY_STATUS = 1
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Connection failures where the request never reached the upstream, so even a submission is safe to resend.
+# Matched by class name: SDKs such as openai may ship their own copy of httpx
+UNSENT_ERRORS = ("ConnectError", "ConnectTimeout", "PoolTimeout")
+
+outbound_queue_depth = Gauge("outbound_queue_depth", "Outbound calls waiting for a rate-limit token, by upstream.", ("upstream",))
+outbound_throttle_wait_seconds = Histogram(
+    "outbound_throttle_wait_seconds", "Time outbound calls waited for a rate-limit token, by upstream.", ("upstream",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+)
+outbound_throttled = Counter("outbound_throttled_total", "429 responses that paused an upstream, by upstream.", ("upstream",))
+outbound_retries = Counter("outbound_retries_total", "Outbound calls sent again, by route and reason (status code or error).", ("route", "reason"))
+outbound_retries_denied = Counter(
+    "outbound_retries_denied_total",
+    "Retryable failures handed back to the caller, by route and reason: budget, attempts or retry_after.",
+    ("route", "reason")
+)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens a second, holding at most `burst`. A rate of 0 never runs dry."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available; 0 when one is available now."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self._tokens -= 1
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of first attempts.
+
+    Every first attempt deposits `ratio` of a retry and time adds
+    `per_second`, up to `cap` saved; a retry spends one. During an outage the budget runs out
+    and failures go straight back to the caller instead of multiplying the
+    load on an upstream that is already struggling.
+    """
+
+    def __init__(self, ratio: float, per_second: float, cap: Optional[float] = None):
+        self.ratio = ratio
+        self.per_second = per_second
+        self.cap = cap if cap is not None else max(1.0, per_second * 10)
+        self._balance = self.cap
+        self._updated = time.monotonic()
+
+    def deposit(self) -> None:
+        self._refill()
+        self._balance = min(self.cap, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self._balance < 1:
+            return False
+        self._balance -= 1
+        return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(self.cap, self._balance + (now - self._updated) * self.per_second)
+        self._updated = now
+
+
+class Upstream:
+    """
+    One upstream quota: a token bucket shared by every route to it.
+
+    Calls take a token before they are sent. When none is left they wait in
+    a priority queue, so a render submission queued behind a crowd of status
+    polls still gets the next token. A 429 pauses the whole upstream until its
+    Retry-After has passed rather than letting every caller find out alone.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.budget = RetryBudget(OUTBOUND_RETRY_RATIO, OUTBOUND_RETRY_MIN_PER_SECOND)
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _wait_time(self) -> float:
+        return max(self.paused_until - time.monotonic(), self.bucket.delay())
+
+    async def acquire(self, priority: int) -> None:
+        """Waits for a token; callers with a lower priority number go first."""
+        if not self._waiters and self._wait_time() <= 0:
+            self.bucket.take()
+            outbound_throttle_wait_seconds.observe(0, upstream=self.name)
+            return
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        outbound_queue_depth.set(len(self._waiters), upstream=self.name)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        finally:
+            outbound_throttle_wait_seconds.observe(time.perf_counter() - started, upstream=self.name)
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            wait = self._wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            outbound_queue_depth.set(len(self._waiters), upstream=self.name)
+            # A caller that gave up (cancelled) does not use up a token
+            if not future.done():
+                self.bucket.take()
+                future.set_result(None)
+
+    def pause(self, seconds: float) -> None:
+        """Holds every call to this upstream for `seconds`, e.g. after a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class Route:
+    """
+    An endpoint class of an upstream: its priority and which failures may be retried.
+
+    Status reads (`idempotent`) are retried on 429, 5xx and transport errors.
+    Submissions only on 429 and on connection errors where the request was
+    never sent, because a 5xx or read timeout may already have started a
+    render that a second POST would pay for again. A route with
+    `max_retries` 0 only takes the rate limit and honours 429 pauses.
+    """
+
+    def __init__(self, upstream: Upstream, name: str, priority: int, idempotent: bool, max_retries: int = OUTBOUND_MAX_RETRIES):
+        self.upstream = upstream
+        self.name = name
+        self.priority = priority
+        self.idempotent = idempotent
+        self.max_retries = max_retries
+
+    async def admit(self) -> None:
+        """Takes a token without the retry loop, for calls such as streams that cannot be replayed."""
+        await self.upstream.acquire(self.priority)
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `attempt` under the upstream's rate limit, retrying retryable failures.
+
+        `attempt` returns an httpx.Response or raises; an error carrying a
+        `response` (as the OpenAI SDK raises) is treated like that response. Once retries are exhausted or denied by the
+        budget the last response is returned, or the last error raised, as
+        if there had been no retries at all.
+        """
+        self.upstream.budget.deposit()
+        retries = 0
+        while True:
+            await self.upstream.acquire(self.priority)
+            try:
+                result = await attempt()
+                error = None
+            except Exception as e:
+                result, error = None, e
+            delay, reason = self._retry_delay(result, error, retries)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+            denied = None
+            if retries >= self.max_retries:
+                denied = "attempts"
+            elif delay > OUTBOUND_MAX_RETRY_AFTER:
+                denied = "retry_after"
+            # A 429 retry is already held back by the upstream pause, so only other failures spend the budget
+            elif reason != "429" and not self.upstream.budget.withdraw():
+                denied = "budget"
+            if denied is not None:
+                outbound_retries_denied.inc(route=self.name, reason=denied)
+                if error is not None:
+                    raise error
+                return result
+            retries += 1
+            outbound_retries.inc(route=self.name, reason=reason)
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, result: Any, error: Optional[Exception], retries: int) -> Tuple[Optional[float], str]:
+        """How long to wait before resending and why, or (None, '') when the outcome is final."""
+        response = result if error is None else getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+
+        if status == 429:
+            retry_after = _retry_after(response)
+            delay = retry_after if retry_after is not None else _backoff(retries)
+            outbound_throttled.inc(upstream=self.upstream.name)
+            self.upstream.pause(min(delay, OUTBOUND_MAX_RETRY_AFTER))
+            # The pause already holds the retry back until the upstream is open again
+            return (delay if delay > OUTBOUND_MAX_RETRY_AFTER else 0.0), "429"
+        if status is not None:
+            if self.idempotent and status in RETRYABLE_STATUSES:
+                return _backoff(retries), str(status)
+            return None, ""
+
+        if error is None:
+            return None, ""
+        # The OpenAI SDK wraps transport errors; look at the httpx error underneath
+        cause = error if _is_transport_error(error) else error.__cause__
+        if not _is_transport_error(cause):
+            return None, ""
+        if self.idempotent or type(cause).__name__ in UNSENT_ERRORS:
+            return _backoff(retries), type(cause).__name__
+        return None, ""
+
+
+def _is_transport_error(error: Optional[BaseException]) -> bool:
+    return error is not None and any(cls.__name__ == "TransportError" for cls in type(error).__mro__)
+
+
+def _backoff(retries: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(OUTBOUND_BACKOFF_MAX, OUTBOUND_BACKOFF_BASE * 2 ** retries))
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    """Seconds from a Retry-After header, given either as seconds or as an HTTP date."""
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+openai = Upstream("openai", OPENAI_RATE_LIMIT, OPENAI_RATE_BURST)
+shotstack = Upstream("shotstack", SHOTSTACK_RATE_LIMIT, SHOTSTACK_RATE_BURST)
+
+# A chat completion has no side effect beyond its cost, so failures are worth a retry
+OPENAI_CHAT = Route(openai, "openai_chat", PRIORITY_SUBMIT, idempotent=True)
+SHOTSTACK_SUBMIT = Route(shotstack, "shotstack_submit", PRIORITY_SUBMIT, idempotent=False)
+SHOTSTACK_STATUS = Route(shotstack, "shotstack_status", PRIORITY_STATUS, idempotent=True)
+# Poller fetches are not retried here: a backoff sleep would hold up every id fetched in the same
+# tick, and the poller already tries a failed id again on its own backoff
+SHOTSTACK_POLL = Route(shotstack, "shotstack_poll", PRIORITY_STATUS, idempotent=True, max_retries=0)
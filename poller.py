@@ -0,0 +1,149 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Configuration
+POLL_INITIAL_DELAY = float(os.getenv('POLL_INITIAL_DELAY', '2'))
+POLL_MAX_DELAY = float(os.getenv('POLL_MAX_DELAY', '15'))
+POLL_BACKOFF_MULTIPLIER = float(os.getenv('POLL_BACKOFF_MULTIPLIER', '1.5'))
+POLL_JITTER = float(os.getenv('POLL_JITTER', '0.2'))
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', '300'))
+
+
+class PollTimeout(Exception):
+    """Raised when a watched id does not reach a final state before its deadline."""
+
+
+class _Watch:
+    def __init__(self, future: asyncio.Future, deadline: float, delay: float):
+        self.future = future
+        self.deadline = deadline
+        self.delay = delay
+        self.next_due = time.monotonic()
+        self.last_error: Optional[Exception] = None
+
+
+class Poller:
+    """
+    Watches many ids from a single background loop.
+
+    Each call to `wait` registers an id and awaits a future; the loop fetches
+    every id that is due in one `asyncio.gather`, resolves the ones that have
+    reached a final state and reschedules the rest with exponential backoff
+    plus jitter. Waiters for the same id share one watch, so N concurrent
+    callers cost one GET per tick rather than N.
+
+    Args:
+        fetch: Coroutine returning the current status payload for an id.
+        is_finished: Returns True when a payload is final (ready/done/failed).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Dict[str, Any]]],
+        is_finished: Callable[[Dict[str, Any]], bool],
+        initial_delay: float = POLL_INITIAL_DELAY,
+        max_delay: float = POLL_MAX_DELAY,
+        multiplier: float = POLL_BACKOFF_MULTIPLIER,
+        jitter: float = POLL_JITTER,
+        deadline: float = POLL_DEADLINE,
+    ):
+        self.fetch = fetch
+        self.is_finished = is_finished
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self._watches: Dict[str, _Watch] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def wait(self, item_id: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Waits until `item_id` reaches a final state and returns its last payload."""
+        watch = self._watches.get(item_id)
+        if watch is None:
+            loop = asyncio.get_running_loop()
+            timeout = self.deadline if deadline is None else deadline
+            watch = _Watch(loop.create_future(), time.monotonic() + timeout, self.initial_delay)
+            self._watches[item_id] = watch
+            self._ensure_running()
+        return await asyncio.shield(watch.future)
+
+    def watching(self) -> int:
+        return len(self._watches)
+
+    def poke(self, item_id: str) -> bool:
+        """
+        Makes a watched id due right away, e.g. when a webhook says it changed.
+
+        The payload itself still comes from `fetch`, so an unauthenticated
+        callback can only trigger one extra GET. Returns False when the id
+        is not being watched.
+        """
+        watch = self._watches.get(item_id)
+        if watch is None:
+            return False
+        watch.next_due = time.monotonic()
+        self._ensure_running()
+        return True
+
+    def _ensure_running(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _backoff(self, delay: float) -> float:
+        spread = delay * self.jitter
+        return max(0.0, delay + random.uniform(-spread, spread))
+
+    async def _run(self) -> None:
+        while self._watches:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [item_id for item_id, watch in self._watches.items() if watch.next_due <= now]
+            if due:
+                results = await asyncio.gather(*(self.fetch(item_id) for item_id in due), return_exceptions=True)
+                for item_id, result in zip(due, results):
+                    self._handle(item_id, result)
+
+            if not self._watches:
+                break
+            next_due = min(watch.next_due for watch in self._watches.values())
+            sleep_for = max(0.0, next_due - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    def _handle(self, item_id: str, result: Any) -> None:
+        watch = self._watches[item_id]
+        if watch.future.done():
+            del self._watches[item_id]
+            return
+
+        if not isinstance(result, Exception):
+            try:
+                if self.is_finished(result):
+                    watch.future.set_result(result)
+                    del self._watches[item_id]
+                    return
+            except Exception as e:
+                result = e
+        if isinstance(result, Exception):
+            print(f"Polling {item_id} failed: {result}")
+            watch.last_error = result
+
+        now = time.monotonic()
+        if now >= watch.deadline:
+            detail = f" (last error: {watch.last_error})" if watch.last_error else ""
+            watch.future.set_exception(PollTimeout(f"Timed out waiting for {item_id}{detail}"))
+            del self._watches[item_id]
+            return
+
+        watch.next_due = min(now + self._backoff(watch.delay), watch.deadline)
+        watch.delay = min(watch.delay * self.multiplier, self.max_delay)
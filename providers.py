@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 'background' builds every client right after startup without blocking it,
+# 'none' leaves each one to its first request
+CLIENT_WARMUP = os.getenv('CLIENT_WARMUP', 'background')
+
+
+class LazyProvider(Generic[T]):
+    """
+    Builds a client on first use and caches it for the life of the process.
+
+    Construction runs at most once even when several threads ask at the
+    same time; if it raises, the error goes to the caller and the next call
+    tries again, so a missing credential only fails the endpoints that need
+    that client.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        PROVIDERS[name] = self
+
+    def get(self) -> T:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self.factory()
+        return self._value
+
+    def ready(self) -> bool:
+        return self._value is not None
+
+
+PROVIDERS: Dict[str, LazyProvider[Any]] = {}
+
+
+def require_env(name: str) -> str:
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"Missing {name} environment variable")
+    return value
+
+
+def status() -> Dict[str, bool]:
+    """Which clients have been built so far."""
+    return {name: provider.ready() for name, provider in PROVIDERS.items()}
+
+
+async def warm_up() -> None:
+    """Builds every registered client off the event loop, logging instead of raising on failure."""
+    for name, provider in PROVIDERS.items():
+        try:
+            await asyncio.to_thread(provider.get)
+        except Exception as e:
+            print(f"Client {name} is not available yet: {e}")
+
+
+def start_warm_up() -> Optional[asyncio.Task]:
+    """Starts warm_up in the background when CLIENT_WARMUP is 'background'; call from the startup hook."""
+    if CLIENT_WARMUP != 'background':
+        return None
+    return asyncio.create_task(warm_up())
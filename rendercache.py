@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from cachebackends import CacheBackend, make_backend
+from metrics import Counter
+
+# Configuration
+RENDER_CACHE_BACKEND = os.getenv('RENDER_CACHE_BACKEND', 'memory')
+RENDER_CACHE_SQLITE_PATH = os.getenv('RENDER_CACHE_SQLITE_PATH', 'render_cache.sqlite3')
+# Keep this below how long Shotstack hosts rendered files, or hits point at deleted videos
+RENDER_CACHE_TTL_SECONDS = float(os.getenv('RENDER_CACHE_TTL_SECONDS', str(12 * 3600)))
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', '1000'))
+# An in-flight render older than this is assumed abandoned and no longer joined
+RENDER_INFLIGHT_TIMEOUT = float(os.getenv('RENDER_INFLIGHT_TIMEOUT', '900'))
+
+# Fields that change how Shotstack reaches us but not what it renders
+VOLATILE_FIELDS = ("callback",)
+
+render_cache_requests = Counter(
+    "render_cache_requests_total",
+    "Render submissions by result: hit (finished render reused), coalesced (joined an in-flight render) or miss.",
+    ("result",)
+)
+
+
+def timeline_hash(payload: Dict[str, Any]) -> str:
+    """SHA-256 of the render payload in canonical JSON form, ignoring VOLATILE_FIELDS."""
+    material = {key: value for key, value in payload.items() if key not in VOLATILE_FIELDS}
+    canonical = json.dumps(material, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Reuses Shotstack renders of identical timeline payloads.
+
+    Finished renders are stored by timeline hash (and by render id, so a
+    status check for a reused render answers without polling). Submissions
+    of a payload that is already rendering wait for the first submission's
+    render id instead of starting another render; the in-flight entry is
+    released once that render finishes, fails or times out.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = RENDER_CACHE_TTL_SECONDS,
+                 inflight_timeout: float = RENDER_INFLIGHT_TIMEOUT):
+        self.backend = backend
+        self.ttl = ttl
+        self.inflight_timeout = inflight_timeout
+        self._inflight: Dict[str, Tuple[float, asyncio.Future]] = {}
+        self._keys: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        return self.backend.get(key)
+
+    def finished(self, render_id: str) -> Optional[str]:
+        """Video URL of a render that was reused from the cache, if any."""
+        if self.backend is None:
+            return None
+        return self.backend.get(f"render:{render_id}")
+
+    def inflight(self, key: str) -> Optional[asyncio.Future]:
+        """Future resolving to the render id of an unfinished render of `key`."""
+        entry = self._inflight.get(key)
+        if entry is None:
+            return None
+        started, future = entry
+        if time.monotonic() - started > self.inflight_timeout:
+            self._release_key(key)
+            return None
+        return future
+
+    def begin(self, key: str) -> asyncio.Future:
+        """Registers a submission of `key`; resolve the future with the render id or fail it."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (time.monotonic(), future)
+        return future
+
+    def submitted(self, key: str, future: asyncio.Future, render_id: str) -> None:
+        self._keys[render_id] = key
+        if not future.done():
+            future.set_result(render_id)
+
+    def abandon(self, key: str, future: asyncio.Future, error: BaseException) -> None:
+        """Fails a submission so its waiters see the same error and the next request starts afresh."""
+        if not future.done():
+            future.set_exception(error)
+            # Mark retrieved so an entry nobody joined does not log "exception never retrieved"
+            future.exception()
+        if self._inflight.get(key, (None, None))[1] is future:
+            del self._inflight[key]
+
+    def complete(self, render_id: str, video_url: Optional[str]) -> None:
+        """Records how a render ended; only successful renders are cached."""
+        key = self._keys.pop(render_id, None)
+        if key is None:
+            return
+        entry = self._inflight.get(key)
+        if entry is not None and self._render_id(entry[1]) == render_id:
+            del self._inflight[key]
+        if video_url and self.backend is not None:
+            self.backend.set(key, {"render_id": render_id, "video_url": video_url}, ttl=self.ttl)
+            self.backend.set(f"render:{render_id}", video_url, ttl=self.ttl)
+
+    def _release_key(self, key: str) -> None:
+        entry = self._inflight.pop(key, None)
+        if entry is not None:
+            self._keys.pop(self._render_id(entry[1]), None)
+
+    @staticmethod
+    def _render_id(future: asyncio.Future) -> Optional[str]:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            return future.result()
+        return None
+
+
+render_cache = RenderCache(
+    make_backend(RENDER_CACHE_BACKEND, max_entries=RENDER_CACHE_MAX_ENTRIES, sqlite_path=RENDER_CACHE_SQLITE_PATH, table="renders")
+)
@@ -0,0 +1,54 @@
+import copy
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+# Configuration
+RENDER_PROFILES_PATH = os.getenv(
+    'RENDER_PROFILES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'render_profiles.json')
+)
+# Profile used when a request does not name one
+RENDER_PROFILE = os.getenv('RENDER_PROFILE', 'final')
+
+
+class RenderProfiles:
+    """
+    Named Shotstack `output` blocks loaded once from a JSON spec (see templates/render_profiles.json).
+
+    A profile may name a cheaper `preview` profile of the same aspect ratio,
+    rendered first when a request asks for a two-phase render.
+    """
+
+    def __init__(self, spec: Dict[str, Any], default: str = RENDER_PROFILE):
+        self.profiles: Dict[str, Dict[str, Any]] = spec["profiles"]
+        for name, entry in self.profiles.items():
+            preview = entry.get("preview")
+            if preview is not None and preview not in self.profiles:
+                raise ValueError(f"Render profile {name!r} names an unknown preview profile {preview!r}")
+        if default not in self.profiles:
+            raise ValueError(f"Default render profile {default!r} is not defined")
+        self.default = default
+
+    @classmethod
+    def from_file(cls, path: str) -> "RenderProfiles":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.profiles)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.profiles
+
+    def output(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """The output block for `name` (the default profile when None); raises KeyError for unknown names."""
+        return copy.deepcopy(self.profiles[name or self.default]["output"])
+
+    def preview_for(self, name: Optional[str] = None) -> Optional[str]:
+        """The preview profile of `name`, or None when it has none (e.g. it is already a preview)."""
+        return self.profiles[name or self.default].get("preview")
+
+
+render_profiles = RenderProfiles.from_file(RENDER_PROFILES_PATH)
@@ -0,0 +1,56 @@
+import hmac
+import os
+from typing import Optional
+
+from metrics import Counter
+
+# Configuration
+# Public base URL Shotstack can reach us on; callbacks are off when unset
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', '').rstrip('/')
+# Shared secret appended to callback URLs and checked on receipt
+SHOTSTACK_CALLBACK_TOKEN = os.getenv('SHOTSTACK_CALLBACK_TOKEN', '')
+# With callbacks on, polling is only a slow fallback for lost callbacks
+CALLBACK_FALLBACK_INITIAL_DELAY = float(os.getenv('CALLBACK_FALLBACK_INITIAL_DELAY', '30'))
+CALLBACK_FALLBACK_MAX_DELAY = float(os.getenv('CALLBACK_FALLBACK_MAX_DELAY', '60'))
+
+CALLBACKS_ENABLED = bool(PUBLIC_BASE_URL)
+
+# Callback kinds, one receiver path each
+KIND_RENDER = "render"
+KIND_INGEST = "ingest"
+
+shotstack_callbacks = Counter(
+    "shotstack_callbacks_total",
+    "Shotstack callbacks received, by kind and whether they matched a watched id.",
+    ("kind", "result")
+)
+
+
+def callback_url(kind: str) -> Optional[str]:
+    """Returns the URL Shotstack should POST to for this kind, or None when callbacks are disabled."""
+    if not CALLBACKS_ENABLED:
+        return None
+    url = f"{PUBLIC_BASE_URL}/shotstack/callback/{kind}"
+    if SHOTSTACK_CALLBACK_TOKEN:
+        url += f"?token={SHOTSTACK_CALLBACK_TOKEN}"
+    return url
+
+
+def valid_callback_token(token: Optional[str]) -> bool:
+    """Whether a received callback carries SHOTSTACK_CALLBACK_TOKEN; any token passes when none is configured."""
+    if not SHOTSTACK_CALLBACK_TOKEN:
+        return True
+    if not token:
+        return False
+    # Compared as bytes: compare_digest raises TypeError for str with non-ASCII characters
+    return hmac.compare_digest(token.encode("utf-8"), SHOTSTACK_CALLBACK_TOKEN.encode("utf-8"))
+
+
+def poll_delays(initial_delay: float, max_delay: float) -> dict:
+    """Poller backoff settings: the given ones, or the slow fallback ones when callbacks are on."""
+    if not CALLBACKS_ENABLED:
+        return {"initial_delay": initial_delay, "max_delay": max_delay}
+    return {
+        "initial_delay": max(initial_delay, CALLBACK_FALLBACK_INITIAL_DELAY),
+        "max_delay": max(max_delay, CALLBACK_FALLBACK_MAX_DELAY)
+    }
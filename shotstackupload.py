@@ -1,14 +1,22 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from firebase_admin import credentials, initialize_app, storage
-import firebase_admin
-import requests
+import asyncio
+import resource
+import time
 import uuid
 import os
 import json
-import time
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from poller import Poller, PollTimeout, POLL_INITIAL_DELAY, POLL_MAX_DELAY
+import httpclient
+from outbound import SHOTSTACK_POLL, SHOTSTACK_STATUS, SHOTSTACK_SUBMIT, Route
+from shotstackcallbacks import callback_url, poll_delays, KIND_INGEST
+from dedupcache import dedup_cache, hash_fileobj
+from jobstore import job_store
+from tracing import Trace
+from providers import LazyProvider
+from singleflight import SingleFlight
 
 # Load environment variables
 load_dotenv()
@@ -18,15 +26,29 @@ BUCKET_NAME = os.getenv('FIREBASE_BUCKET_NAME')
 SHOTSTACK_API_KEY = os.getenv('SHOTSTACK_API_KEY')
 SHOTSTACK_API_URL = os.getenv('SHOTSTACK_API_URL', 'https://api.shotstack.io/ingest/stage')
 FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH')
+# 'stream' pipes the spooled temp file in resumable chunks, 'buffered' reads it into memory first
+FIREBASE_UPLOAD_MODE = os.getenv('FIREBASE_UPLOAD_MODE', 'stream')
+# Resumable uploads need a chunk size that is a multiple of 256 KB
+FIREBASE_CHUNK_SIZE = max(256, int(os.getenv('FIREBASE_CHUNK_SIZE_KB', '8192')) // 256 * 256) * 1024
+
+def firebase_configured() -> bool:
+    """Whether uploads have a bucket and credentials to go to."""
+    return all([BUCKET_NAME, FIREBASE_CREDENTIALS_PATH])
+
+def _init_firebase():
+    """Initializes the Firebase app; runs on the first upload or during startup warm-up, not at import."""
+    # firebase_admin pulls in the Cloud Storage client, so it is imported here rather than at module load
+    from firebase_admin import credentials, initialize_app
 
-# Firebase initialization
-if not all([BUCKET_NAME, FIREBASE_CREDENTIALS_PATH]):
-    raise ValueError("Missing required environment variables for Firebase configuration")
+    if not firebase_configured():
+        raise ValueError("Missing required environment variables for Firebase configuration")
 
-cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-firebaseapp = initialize_app(cred, {
-    'storageBucket': BUCKET_NAME
-})
+    cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
+    return initialize_app(cred, {
+        'storageBucket': BUCKET_NAME
+    })
+
+firebase_app = LazyProvider("firebase", _init_firebase)
 
 class UploadResponse(BaseModel):
     success: bool
@@ -34,32 +56,87 @@ class UploadResponse(BaseModel):
     video_url: Optional[str] = None
     source_id: Optional[str] = None
 
-async def upload_to_firebase(file: UploadFile) -> str:
+class UploadStats(BaseModel):
+    mode: str
+    bytes: int
+    seconds: float
+    bytes_per_second: float
+    peak_rss_mb: float
+    peak_rss_growth_mb: float
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _spooled_size(fileobj) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+def _stream_to_blob(blob, fileobj, content_type: Optional[str]) -> None:
+    """Uploads a file object in resumable chunks; only one chunk is held in memory at a time."""
+    blob.chunk_size = FIREBASE_CHUNK_SIZE
+    blob.upload_from_file(fileobj, content_type=content_type, rewind=True)
+    blob.make_public()
+
+async def upload_to_firebase(file: UploadFile, mode: Optional[str] = None, digest: Optional[str] = None) -> str:
+    mode = mode or FIREBASE_UPLOAD_MODE
     try:
-        # Generate unique filename
+        # Content-addressed name when the hash is known, otherwise a unique one
         file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}.mp4"
+        unique_filename = f"{digest or uuid.uuid4()}.mp4"
         
         # Get bucket
-        bucket = storage.bucket()
+        from firebase_admin import storage
+        bucket = storage.bucket(app=firebase_app.get())
         
         # Create blob
         blob = bucket.blob(f"videos/{unique_filename}")
-        
-        # Upload file
-        contents = await file.read()
-        blob.upload_from_string(
-            contents,
-            content_type=file.content_type
+
+        started = time.perf_counter()
+        rss_before = _peak_rss_mb()
+
+        if mode == 'stream':
+            # Pipe the UploadFile's spooled temp file straight to storage
+            size = _spooled_size(file.file)
+            await asyncio.to_thread(_stream_to_blob, blob, file.file, file.content_type)
+        else:
+            # Upload file
+            contents = await file.read()
+            size = len(contents)
+            blob.upload_from_string(
+                contents,
+                content_type=file.content_type
+            )
+            
+            # Make public and get URL
+            blob.make_public()
+
+        elapsed = time.perf_counter() - started
+        rss_after = _peak_rss_mb()
+        stats = UploadStats(
+            mode=mode,
+            bytes=size,
+            seconds=round(elapsed, 3),
+            bytes_per_second=round(size / elapsed, 1) if elapsed > 0 else 0.0,
+            peak_rss_mb=round(rss_after, 1),
+            peak_rss_growth_mb=round(rss_after - rss_before, 1)
         )
-        
-        # Make public and get URL
-        blob.make_public()
+        print(f"firebase upload stats={stats.model_dump()}")
         return blob.public_url
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firebase upload failed: {str(e)}")
 
+def upload_asset(path: str, data: bytes, content_type: str) -> str:
+    """Uploads generated bytes, e.g. a chart image, to the bucket and returns the public URL. Blocking: run it in a thread."""
+    from firebase_admin import storage
+    blob = storage.bucket(app=firebase_app.get()).blob(path)
+    blob.upload_from_string(data, content_type=content_type)
+    blob.make_public()
+    return blob.public_url
+
 async def submit_to_shotstack(video_url: str) -> dict:
     if not SHOTSTACK_API_KEY:
         raise ValueError("Missing Shotstack API key")
@@ -73,9 +150,13 @@ async def submit_to_shotstack(video_url: str) -> dict:
         payload = {
             "url": video_url,
         }
+        callback = callback_url(KIND_INGEST)
+        if callback:
+            payload["callback"] = callback
         
-        response = requests.post(
+        response = await httpclient.post(
             f"{SHOTSTACK_API_URL}/sources",
+            route=SHOTSTACK_SUBMIT,
             headers=headers,
             json=payload
         )
@@ -87,7 +168,7 @@ async def submit_to_shotstack(video_url: str) -> dict:
         raise HTTPException(status_code=500, 
                           detail=f"Shotstack API call failed: {str(e)}")
 
-async def check_shotstack_status(source_id: str) -> dict:
+async def check_shotstack_status(source_id: str, route: Route = SHOTSTACK_POLL) -> dict:
     if not SHOTSTACK_API_KEY:
         raise ValueError("Missing Shotstack API key")
 
@@ -97,8 +178,9 @@ async def check_shotstack_status(source_id: str) -> dict:
             'x-api-key': SHOTSTACK_API_KEY
         }
         
-        response = requests.get(
+        response = await httpclient.get(
             f"{SHOTSTACK_API_URL}/sources/{source_id}",
+            route=route,
             headers=headers
         )
         print(response.json())
@@ -109,47 +191,113 @@ async def check_shotstack_status(source_id: str) -> dict:
         raise HTTPException(status_code=500, 
                           detail=f"Status check failed: {str(e)}")
 
+def _ingest_finished(status_response: dict) -> bool:
+    return status_response['data']['attributes']['status'] in ('ready', 'failed')
+
+ingest_poller = Poller(
+    fetch=check_shotstack_status,
+    is_finished=_ingest_finished,
+    **poll_delays(POLL_INITIAL_DELAY, POLL_MAX_DELAY)
+)
+
+async def wait_for_ingest(digest: str, source_id: str) -> dict:
+    """
+    Waits for an ingest and settles its job store record; ready sources go to the dedup cache.
+
+    A PollTimeout leaves the record in place, so the ingest is picked up
+    again by the next upload of the same bytes or after a restart.
+    """
+    status_response = await ingest_poller.wait(source_id)
+    attributes = status_response['data']['attributes']
+    if attributes['status'] == 'ready':
+        dedup_cache.put(digest, source_id=source_id, video_url=attributes['source'])
+    job_store.finish_ingest(digest)
+    return status_response
+
+async def _resume_ingest(digest: str, source_id: str) -> None:
+    try:
+        status_response = await wait_for_ingest(digest, source_id)
+        print(f"resumed ingest source={source_id} status={status_response['data']['attributes']['status']}")
+    except PollTimeout:
+        print(f"resumed ingest source={source_id} is still processing")
+    except Exception as e:
+        # Drop the record; the next upload of these bytes ingests them again
+        job_store.finish_ingest(digest)
+        print(f"resumed ingest source={source_id} failed: {e}")
+
+def resume_ingests() -> List[asyncio.Task]:
+    """Starts waiting on the ingests a previous process submitted but never saw finish."""
+    return [
+        asyncio.create_task(_resume_ingest(digest, source_id))
+        for digest, source_id in job_store.pending_ingests().items()
+    ]
+
+ingest_flights = SingleFlight("ingest")
+
+async def submit_ingest(file: UploadFile, digest: str, trace: Trace) -> str:
+    """Uploads the bytes to Firebase, submits them to Shotstack and records the ingest; returns the source id."""
+    with trace.span("firebase"):
+        firebase_url = await upload_to_firebase(file, digest=digest)
+    print(f"firebase={firebase_url}")
+
+    with trace.span("ingest_submit"):
+        shotstack_response = await submit_to_shotstack(firebase_url)
+    source_id = shotstack_response['data']['id']
+    job_store.save_ingest(digest, source_id)
+    return source_id
+
 async def upload_video(file: UploadFile = File(...)):
     if not file.content_type.startswith('video/'):
         raise HTTPException(status_code=400, detail="File must be a video")
     
+    trace = Trace("upload")
+    outcome = "failed"
     try:
-        # Upload to Firebase
-        firebase_url = await upload_to_firebase(file)
-        print(f"firebase={firebase_url}")
-        
-        # Submit to Shotstack
-        shotstack_response = await submit_to_shotstack(firebase_url)
-        source_id = shotstack_response['data']['id']
-        
-        # Poll for status (with timeout)
-        max_attempts = 30  # 5 minutes timeout (10 second intervals)
-        attempts = 0
-        
-        while attempts < max_attempts:
-            status_response = await check_shotstack_status(source_id)
-            status = status_response['data']['attributes']['status']
-           
-            if status == 'ready':
-                video_url = status_response['data']['attributes']['source']
-                return UploadResponse(
-                    success=True,
-                    message="Video processed successfully",
-                    video_url=video_url,
-                    source_id=source_id
-                )
-            elif status == 'failed':
-                raise HTTPException(status_code=500, 
-                                  detail="Video processing failed")
-            
-            attempts += 1
-            time.sleep(10)
+        # Hash the spooled upload and reuse an earlier ingest of the same bytes
+        with trace.span("hash"):
+            digest = await asyncio.to_thread(hash_fileobj, file.file)
+        cached = dedup_cache.get(digest)
+        if cached is not None:
+            print(f"dedup hit={digest}")
+            outcome = "dedup_hit"
+            return UploadResponse(
+                success=True,
+                message="Video already processed",
+                video_url=cached['video_url'],
+                source_id=cached['source_id']
+            )
+
+        # A retry of an ingest that was submitted but never finished waits on the same source
+        source_id = job_store.pending_ingest(digest)
+        if source_id is not None:
+            print(f"resuming ingest source={source_id} for {digest}")
+        else:
+            # Concurrent uploads of the same bytes share one Firebase upload and Shotstack ingest
+            source_id = await ingest_flights.do(digest, submit_ingest, file, digest, trace)
         
-        # If we get here, processing timed out
+        # Wait for ingest to finish on the shared poller (with timeout)
+        try:
+            with trace.span("ingest_wait"):
+                status_response = await wait_for_ingest(digest, source_id)
+        except PollTimeout:
+            outcome = "pending"
+            return UploadResponse(
+                success=True,
+                message="Video uploaded but processing is still ongoing",
+                source_id=source_id
+            )
+
+        status = status_response['data']['attributes']['status']
+        if status == 'failed':
+            raise HTTPException(status_code=500, 
+                              detail="Video processing failed")
+
+        video_url = status_response['data']['attributes']['source']
+        outcome = "done"
         return UploadResponse(
-            video_url=video_url,
             success=True,
-            message="Video uploaded but processing is still ongoing",
+            message="Video processed successfully",
+            video_url=video_url,
             source_id=source_id
         )
         
@@ -158,10 +306,13 @@ async def upload_video(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, 
                           detail=f"Upload process failed: {str(e)}")
+    finally:
+        trace.finish(outcome)
 
 async def check_status(source_id: str):
     try:
-        status_response = await check_shotstack_status(source_id)
+        # A one-off check, so unlike the poller's fetches it may retry
+        status_response = await check_shotstack_status(source_id, route=SHOTSTACK_STATUS)
         status = status_response['data']['attributes']['status']
         
         if status == 'ready':
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from metrics import Counter, Gauge
+
+T = TypeVar("T")
+
+singleflight_calls = Counter(
+    "singleflight_calls_total",
+    "Coalesced calls by group and role: leader (ran the work) or follower (shared a leader's result).",
+    ("group", "role")
+)
+singleflight_in_flight = Gauge("singleflight_in_flight", "Distinct keys currently being worked on, by group.", ("group",))
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time within this process.
+
+    The first caller for a key becomes the leader and its coroutine runs as
+    its own task; callers arriving while it runs await the same task and get
+    its result or exception. The task is shielded, so a leader whose client
+    disconnects does not cancel the work its followers are waiting on. Keys
+    are forgotten as soon as the call finishes, so nothing is cached here.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            singleflight_calls.inc(group=self.group, role="leader")
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            singleflight_in_flight.inc(group=self.group)
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            singleflight_calls.inc(group=self.group, role="follower")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        singleflight_in_flight.dec(group=self.group)
+        # Retrieve the outcome so a call every waiter gave up on does not log "exception never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,199 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from metrics import Counter
+from slidestream import SlideStreamParser
+
+# Configuration
+# Larger single objects are not handed to ast.literal_eval
+SLIDE_OBJECT_MAX_CHARS = int(os.getenv('SLIDE_OBJECT_MAX_CHARS', '20000'))
+
+# orjson is optional; it is several times faster on the full-payload fast path
+try:
+    import orjson
+
+    def loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    DECODE_ERRORS = (orjson.JSONDecodeError, json.JSONDecodeError)
+except ImportError:
+    loads = json.loads
+    DECODE_ERRORS = (json.JSONDecodeError,)
+
+slide_parse_total = Counter(
+    "slide_parse_total",
+    "Slide payloads parsed from LLM output, by how they were recovered.",
+    ("result",)
+)
+
+
+class Slide(BaseModel):
+    """One slide as produced by the LLM; unknown keys are kept."""
+    slide_number: int
+    main_text: str = ""
+    sub_text: str = ""
+    purpose: Optional[str] = None
+    image_prompt: Optional[str] = None
+    pie_chart: Optional[Dict[str, Any]] = None
+    duration: Optional[Union[float, str]] = None
+    chart_type: Optional[str] = None
+
+    model_config = ConfigDict(extra="allow")
+
+
+_NULLABLE_STRING = {"type": ["string", "null"]}
+
+# Strict structured-output schema for the slide list. Strict mode needs an
+# object at the top, every property required and no free-form maps, so the
+# list is wrapped in {"slides": [...]} and pie_chart is a list of label/value
+# pairs; validate_slide turns it back into a dict. Optional fields are
+# required but nullable, and validate_slide drops the nulls.
+SLIDE_LIST_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "slides": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "slide_number": {"type": "integer"},
+                    "purpose": {"type": "string"},
+                    "main_text": {"type": "string"},
+                    "sub_text": {"type": "string"},
+                    "image_prompt": _NULLABLE_STRING,
+                    "pie_chart": {
+                        "type": ["array", "null"],
+                        "items": {
+                            "type": "object",
+                            "properties": {"label": {"type": "string"}, "value": {"type": "number"}},
+                            "required": ["label", "value"],
+                            "additionalProperties": False
+                        }
+                    },
+                    # How pie_chart's data is drawn, one of chartimages.CHART_KINDS
+                    "chart_type": {"type": ["string", "null"], "enum": ["pie", "bar", "line", None]},
+                    # Seconds the slide stays on screen
+                    "duration": {"type": ["number", "null"]}
+                },
+                "required": [
+                    "slide_number", "purpose", "main_text", "sub_text", "image_prompt", "pie_chart", "chart_type", "duration"
+                ],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["slides"],
+    "additionalProperties": False
+}
+
+
+def strip_fences(text: str) -> str:
+    """Returns the body of the first markdown code fence, or the text unchanged when there is none."""
+    start = text.find("```")
+    if start == -1:
+        return text
+    newline = text.find("\n", start)
+    body = start + 3 if newline == -1 else newline + 1
+    end = text.find("```", body)
+    return text[body:] if end == -1 else text[body:end]
+
+
+def _decode(text: str) -> Optional[List[Any]]:
+    try:
+        return _top_level_slides(loads(text))
+    except DECODE_ERRORS:
+        return None
+
+
+def validate_slide(item: Any, position: int) -> Optional[Dict[str, Any]]:
+    """
+    Checks one slide against the Slide schema.
+
+    A missing `slide_number` is filled in from the slide's position (1-based)
+    and a numeric string one is coerced to int. Null fields are dropped and a
+    structured-output `pie_chart` list becomes a label -> value dict. Returns
+    the slide dict, or None when it does not fit the schema.
+    """
+    if not isinstance(item, dict):
+        return None
+    if None in item.values():
+        item = {key: value for key, value in item.items() if value is not None}
+    if isinstance(item.get('pie_chart'), list):
+        item = {**item, 'pie_chart': _pairs_to_dict(item['pie_chart'])}
+    slide_number = item.get('slide_number')
+    try:
+        slide = Slide(**{**item, 'slide_number': position + 1 if slide_number is None else slide_number})
+    except ValidationError:
+        return None
+    return item if slide_number == slide.slide_number and type(slide_number) is int else {**item, 'slide_number': slide.slide_number}
+
+
+def _pairs_to_dict(pairs: List[Any]) -> Optional[Dict[str, Any]]:
+    if not all(isinstance(pair, dict) and 'label' in pair and 'value' in pair for pair in pairs):
+        return None
+    return {pair['label']: pair['value'] for pair in pairs}
+
+
+def _top_level_slides(value: Any) -> Optional[List[Any]]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        # Some completions wrap the list, e.g. {"slides": [...]}
+        for inner in value.values():
+            if isinstance(inner, list):
+                return inner
+    return None
+
+
+def _validate_all(items: List[Any]) -> List[Dict[str, Any]]:
+    slides = []
+    for position, item in enumerate(items):
+        slide = validate_slide(item, position)
+        if slide is not None:
+            slides.append(slide)
+    return slides
+
+
+def parse_slides(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parses an LLM slide payload into validated slide dicts.
+
+    The whole payload (code fences stripped) is decoded as JSON first. When
+    that fails, the text is scanned object by object, which recovers slides
+    from Python-repr quoting, trailing prose and arrays truncated mid-slide.
+    Slides that fail validation are dropped.
+
+    Args:
+        payload (str or list): Raw completion text, or an already parsed list.
+
+    Returns:
+        list: The valid slides, or None when none could be recovered.
+    """
+    if isinstance(payload, list):
+        slides = _validate_all(payload)
+        slide_parse_total.inc(result="list" if slides else "failed")
+        return slides or None
+    if not isinstance(payload, str):
+        slide_parse_total.inc(result="failed")
+        return None
+
+    text = strip_fences(payload).strip()
+    items = _decode(text)
+    if items is None:
+        # Prose around a well-formed array: decode just the outermost brackets
+        first, last = text.find("["), text.rfind("]")
+        if 0 <= first < last and (first > 0 or last < len(text) - 1):
+            items = _decode(text[first:last + 1])
+    if items is not None:
+        slides = _validate_all(items)
+        if slides:
+            slide_parse_total.inc(result="json")
+            return slides
+
+    parser = SlideStreamParser(max_object_chars=SLIDE_OBJECT_MAX_CHARS)
+    slides = _validate_all(parser.feed(payload))
+    slide_parse_total.inc(result="recovered" if slides else "failed")
+    return slides or None
@@ -0,0 +1,87 @@
+import ast
+import json
+from typing import Any, Dict, List, Optional
+
+
+class SlideStreamParser:
+    """
+    Incremental parser that pulls slide dicts out of a streamed LLM response.
+
+    Text is fed in arbitrary chunks. Everything before the first `[` (prose,
+    code fences, an enclosing `{"slides": ...}` object) is skipped, and each
+    object that is a direct element of that first array is emitted as soon as
+    its closing brace arrives. Nested objects such as `pie_chart` stay part of
+    their slide. Both JSON and Python-repr quoting are understood, since the
+    prompt's example is a Python literal. Objects longer than
+    `max_object_chars` are skipped rather than parsed.
+    """
+
+    def __init__(self, max_object_chars: Optional[int] = None):
+        self.max_object_chars = max_object_chars
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        self._array_depth: Optional[int] = None
+        self._quote: Optional[str] = None
+        self._escaped = False
+        self._capturing = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consumes the next chunk of text and returns any slides it completed."""
+        slides = []
+        for char in chunk:
+            if self.done:
+                break
+            if self._capturing:
+                self._buffer.append(char)
+
+            if self._quote is not None:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+                continue
+
+            if char in "\"'" and self._stack:
+                self._quote = char
+            elif char in "[{":
+                self._stack.append(char)
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = len(self._stack)
+                elif char == "{" and self._array_depth is not None and len(self._stack) == self._array_depth + 1:
+                    self._capturing = True
+                    self._buffer = [char]
+            elif char in "]}" and self._stack:
+                closing_slide = (
+                    char == "}" and self._capturing and len(self._stack) == self._array_depth + 1
+                )
+                self._stack.pop()
+                if closing_slide:
+                    self._capturing = False
+                    if self.max_object_chars is not None and len(self._buffer) > self.max_object_chars:
+                        continue
+                    slide = parse_object("".join(self._buffer))
+                    if slide is not None:
+                        slides.append(slide)
+                elif char == "]" and self._array_depth is not None and len(self._stack) < self._array_depth:
+                    self.done = True
+        return slides
+
+
+def parse_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parses one complete object as JSON, falling back to a Python literal."""
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            return None
+    return value if isinstance(value, dict) else None
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep tests from creating jobs.sqlite3 when a module pulls in the job store
+os.environ.setdefault("JOB_STORE", "memory")
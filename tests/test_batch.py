@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import app
+from cachebackends import MemoryLRUBackend
+from jobqueue import (
+    STAGE_DONE, STAGE_FAILED, STAGE_LLM, STAGE_POLLING, STAGE_QUEUED, STAGE_RENDER, Job, JobQueue, batch_status_response
+)
+from jobstore import MemoryJobStore
+from llmcache import LLMCache
+
+SLIDES = [
+    {"slide_number": 1, "purpose": "Heading", "main_text": "Android vs Apple", "sub_text": "Who leads?", "image_prompt": "phones"},
+    {"slide_number": 2, "purpose": "Setup", "main_text": "The market", "sub_text": "", "image_prompt": "a chart"},
+]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Runs the real job pipeline with the LLM, Shotstack and asset stages replaced by fakes; returns LLM calls per text and in flight."""
+    llm_calls = Counter()
+    in_flight = Counter()
+    lock = threading.Lock()
+
+    def request_slides_from_openai(text, model=app.OPENAI_MODEL):
+        with lock:
+            llm_calls[text] += 1
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        # Long enough for the other items of the batch to arrive while the call is in flight
+        time.sleep(0.05)
+        with lock:
+            in_flight["now"] -= 1
+        if text == "bad":
+            raise RuntimeError("model overloaded")
+        return json.dumps(SLIDES)
+
+    async def unchanged(slides):
+        return slides
+
+    renders = iter(range(1000))
+
+    async def submit_renders(clips_data, videourl, request):
+        return {"success": True, "response": {"id": f"r{next(renders)}"}}, None
+
+    async def check_render_status(render_id):
+        return {"status": "done", "video_url": f"https://cdn.example.com/{render_id}.mp4"}
+
+    monkeypatch.setattr(app, "request_slides_from_openai", request_slides_from_openai)
+    monkeypatch.setattr(app, "llm_cache", LLMCache(memory=MemoryLRUBackend(16)))
+    monkeypatch.setattr(app, "attach_charts", unchanged)
+    monkeypatch.setattr(app, "attach_images", unchanged)
+    monkeypatch.setattr(app, "submit_renders", submit_renders)
+    monkeypatch.setattr(app, "check_render_status", check_render_status)
+    monkeypatch.setattr(app, "job_queue", JobQueue(app.run_video_job, workers=1, store=MemoryJobStore()))
+    return llm_calls, in_flight
+
+
+def run_batch(texts):
+    async def main():
+        await app.job_queue.start()
+        batch_id = app.job_queue.submit_batch([{"text": text} for text in texts], [None] * len(texts))
+        while batch_status_response(batch_id, app.job_queue.get_batch(batch_id)).status not in ("done", "failed", "partial"):
+            await asyncio.sleep(0.01)
+        await app.job_queue.stop()
+        return app.job_queue.get_batch(batch_id)
+
+    return asyncio.run(asyncio.wait_for(main(), 5))
+
+
+def test_batch_items_with_the_same_text_share_one_llm_call(pipeline):
+    llm_calls, _ = pipeline
+    jobs = run_batch(["phones"] * 5)
+    assert llm_calls == {"phones": 1}
+    # Every job still gets the slides and its own render
+    assert all(job.stage == STAGE_DONE and job.slides == SLIDES for job in jobs)
+    assert len({job.render_id for job in jobs}) == 5
+    assert all(job.video_url == f"https://cdn.example.com/{job.render_id}.mp4" for job in jobs)
+
+
+def test_batch_items_with_different_texts_call_the_llm_concurrently(pipeline):
+    llm_calls, in_flight = pipeline
+    jobs = run_batch(["a", "b", "c", "d", "a"])
+    assert llm_calls == {"a": 1, "b": 1, "c": 1, "d": 1}
+    assert in_flight["peak"] > 1
+    assert [job.request["text"] for job in jobs] == ["a", "b", "c", "d", "a"]
+    assert all(job.stage == STAGE_DONE for job in jobs)
+
+
+def test_one_failing_item_does_not_fail_the_others(pipeline):
+    jobs = run_batch(["good", "bad", "other"])
+    assert [job.stage for job in jobs] == [STAGE_DONE, STAGE_FAILED, STAGE_DONE]
+    assert "model overloaded" in jobs[1].error
+    assert jobs[0].video_url and jobs[2].video_url
+    assert batch_status_response("b", jobs).status == "partial"
+
+
+def job(stage):
+    return Job(job_id=stage, stage=stage, created_at=0, updated_at=0)
+
+
+@pytest.mark.parametrize("stages, status", [
+    ([STAGE_QUEUED, STAGE_QUEUED], STAGE_QUEUED),
+    ([STAGE_QUEUED, STAGE_LLM], "running"),
+    ([STAGE_DONE, STAGE_POLLING], "running"),
+    ([STAGE_FAILED, STAGE_QUEUED], "running"),
+    ([STAGE_DONE, STAGE_DONE], STAGE_DONE),
+    ([STAGE_FAILED, STAGE_FAILED], STAGE_FAILED),
+    ([STAGE_DONE, STAGE_FAILED, STAGE_DONE], "partial"),
+])
+def test_batch_status_combines_the_item_stages(stages, status):
+    response = batch_status_response("b", [job(stage) for stage in stages])
+    assert response.status == status
+    assert response.counts == dict(Counter(stages))
+    assert [item.status for item in response.items] == stages
+
+
+def test_batch_status_lists_items_in_submission_order():
+    response = batch_status_response("b", [job(STAGE_RENDER), job(STAGE_DONE)])
+    assert response.batch_id == "b"
+    assert [item.job_id for item in response.items] == [STAGE_RENDER, STAGE_DONE]
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import chartimages
+import shotstackupload
+
+SLIDE = {"slide_number": 3, "main_text": "Market share", "pie_chart": {"Android": 70, "Apple": 30}}
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Replaces drawing and uploading; returns the chart keys that were rendered."""
+    keys = []
+
+    async def render_and_upload(key, spec):
+        keys.append(key)
+        return f"https://storage.example.com/charts/{key}.png"
+
+    monkeypatch.setattr(chartimages, "CHART_RENDERING", "local")
+    monkeypatch.setattr(chartimages, "chart_cache", None)
+    monkeypatch.setattr(chartimages, "_render_and_upload", render_and_upload)
+    return keys
+
+
+def test_chart_is_not_drawn_without_an_upload_bucket(monkeypatch, rendered):
+    monkeypatch.setattr(shotstackupload, "BUCKET_NAME", None)
+    assert asyncio.run(chartimages.with_chart(SLIDE)) == SLIDE
+    assert rendered == []
+
+
+def test_chart_is_drawn_and_attached_with_a_bucket(monkeypatch, rendered):
+    monkeypatch.setattr(shotstackupload, "BUCKET_NAME", "bucket")
+    monkeypatch.setattr(shotstackupload, "FIREBASE_CREDENTIALS_PATH", "credentials.json")
+    slide = asyncio.run(chartimages.with_chart(SLIDE))
+    assert rendered == [chartimages.chart_key(chartimages.chart_spec(SLIDE))]
+    assert slide["chart_url"].endswith(f"{rendered[0]}.png")
+
+
+@pytest.mark.parametrize("item", [{}, {"pie_chart": "none"}, {"pie_chart": {"a": 0}}, {"pie_chart": {"a": -1, "b": 2}}])
+def test_slides_without_drawable_data_have_no_spec(item):
+    assert chartimages.chart_spec(item) is None
@@ -0,0 +1,83 @@
+import copy
+
+import pytest
+
+from cliptemplates import ClipTemplate, TemplateRegistry, clip_templates
+from videocreationhelper import createImageAndText, createImageAndVideo, generateVideoTracks
+
+CLIP = {
+    "asset": {"type": "html", "html": "<p>{{text}}</p>", "css": "p { color: #fff; }"},
+    "start": 0,
+    "length": 3,
+    "offset": {"x": 0.1, "y": -0.2},
+    "transition": {"in": "fade", "out": "fade"},
+    "filters": ["boost"],
+}
+
+
+def test_instances_share_no_mutable_state_with_each_other_or_the_template():
+    template = ClipTemplate("text", copy.deepcopy(CLIP), {"html": "body"})
+    first = template.instantiate(0, {"body": "one"})
+    second = template.instantiate(3, {"body": "two"})
+
+    first["asset"]["css"] = "changed"
+    first["offset"]["x"] = 9
+    first["transition"]["in"] = "wipe"
+    first["filters"].append("darken")
+
+    assert second["asset"] == {"type": "html", "html": "two", "css": "p { color: #fff; }"}
+    assert second["offset"] == {"x": 0.1, "y": -0.2}
+    assert second["transition"] == {"in": "fade", "out": "fade"}
+    assert second["filters"] == ["boost"]
+    assert template.clip == CLIP
+
+
+def test_start_and_length_are_filled_in():
+    template = ClipTemplate("text", copy.deepcopy(CLIP), {"html": "body"})
+    assert template.instantiate(6, {"body": "x"})["start"] == 6
+    assert template.instantiate(6, {"body": "x"})["length"] == 3
+    assert template.instantiate(6, {"body": "x"}, length=4.5)["length"] == 4.5
+    assert "length" not in ClipTemplate("bare", {"asset": {"type": "html"}, "start": 0}, {}).instantiate(0, {})
+
+
+def test_optional_clip_is_dropped_when_its_variable_is_empty():
+    registry = TemplateRegistry({
+        "clips": {"main": {"clip": CLIP, "bind": {"html": "maintext"}}, "sub": {"clip": CLIP, "bind": {"html": "subtext"}}},
+        "slides": {"text": {"clips": ["sub", "main"], "optional": ["sub"]}},
+    })
+    assert len(registry.build("text", 0, maintext="m", subtext="s")) == 2
+    assert len(registry.build("text", 0, maintext="m", subtext="")) == 1
+    assert len(registry.build("text", 0, maintext="m")) == 1
+
+
+@pytest.mark.parametrize("variable", ["not an identifier", "start", "class"])
+def test_unusable_variable_names_are_rejected(variable):
+    with pytest.raises(ValueError):
+        ClipTemplate("text", copy.deepcopy(CLIP), {"html": variable})
+
+
+def test_non_json_values_are_rejected():
+    with pytest.raises(ValueError):
+        ClipTemplate("text", {**CLIP, "offset": {"x": float("nan")}}, {})
+    with pytest.raises(ValueError):
+        ClipTemplate("text", {**CLIP, "offset": object()}, {})
+
+
+def test_templates_build_the_same_tracks_as_the_literals():
+    assert generateVideoTracks(2, "Main", "Sub", "https://example.com/v.mp4", 6) == createImageAndVideo(
+        "Main", "Sub", "https://example.com/v.mp4", 6
+    )
+    assert generateVideoTracks(1, "Main", "Sub", "a cat", 3) == createImageAndText("Main", "Sub", "a cat", 3)
+
+
+def test_built_slides_do_not_alias_each_other():
+    first = generateVideoTracks(1, "Main", "Sub", "a cat", 3)
+    second = generateVideoTracks(1, "Main", "Sub", "a cat", 3)
+    for track in first:
+        for clip in track["clips"]:
+            clip["asset"]["type"] = "changed"
+            for field in ("offset", "transition"):
+                if field in clip:
+                    clip[field].clear()
+    assert second == createImageAndText("Main", "Sub", "a cat", 3)
+    assert clip_templates.build("image_and_text", 3, maintext="Main", subtext="Sub", media="a cat") == second
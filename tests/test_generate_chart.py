@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi.responses import HTMLResponse
+
+import app
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """Installs a stand-in chart router; `answer` is what its chat() returns."""
+    router = SimpleNamespace(calls=0, answer=None)
+
+    async def fake_chat(request):
+        router.calls += 1
+        await asyncio.sleep(0.01)
+        return router.answer
+
+    router.chat = fake_chat
+    monkeypatch.setitem(sys.modules, "generatechart", router)
+    return router
+
+
+def two_callers(message="Android vs Apple", other="  Android  vs Apple\n"):
+    async def main():
+        return await asyncio.gather(
+            app.generate_chart(app.ChatRequest(message=message)), app.generate_chart(app.ChatRequest(message=other))
+        )
+
+    return asyncio.run(main())
+
+
+def test_concurrent_callers_share_one_chart_but_get_their_own_response(chat):
+    chat.answer = HTMLResponse("<div>chart</div>", headers={"x-chart": "pie"})
+    first, second = two_callers()
+    assert chat.calls == 1
+    assert first is not second and first is not chat.answer
+    for response in (first, second):
+        assert response.body == b"<div>chart</div>"
+        assert response.status_code == 200
+        assert response.headers["x-chart"] == "pie"
+        assert response.headers["content-type"].startswith("text/html")
+    # What one caller's middleware does to its response stays with that caller
+    first.headers["x-chart"] = "bar"
+    assert second.headers["x-chart"] == "pie"
+
+
+def test_text_answer_becomes_an_html_response(chat):
+    chat.answer = "<div>chart</div>"
+    first, second = two_callers()
+    assert chat.calls == 1
+    assert first.body == second.body == b"<div>chart</div>"
+    assert first.headers["content-type"].startswith("text/html")
+
+
+def test_different_messages_generate_separately(chat):
+    chat.answer = "<div>chart</div>"
+    two_callers("Android vs Apple", "Coffee vs tea")
+    assert chat.calls == 2
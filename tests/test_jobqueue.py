@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from jobqueue import FINISHED_STAGES, STAGE_DONE, STAGE_QUEUED, STAGE_RENDER, JobQueue
+from jobstore import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+async def wait_finished(queue, job_ids, timeout=2):
+    async def finished():
+        while not all(queue.get(job_id).stage in FINISHED_STAGES for job_id in job_ids):
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(finished(), timeout)
+
+
+def crash_with(store):
+    """Runs a one-worker queue until one job is done, one is mid-render and one is still queued, then stops it."""
+    rendering = None
+
+    async def runner(job):
+        if job.request["name"] == "running":
+            queue.set_stage(job, STAGE_RENDER, render_id="r1")
+            rendering.set()
+            await asyncio.Event().wait()
+
+    queue = JobQueue(runner, workers=1, store=store)
+
+    async def main():
+        nonlocal rendering
+        rendering = asyncio.Event()
+        await queue.start()
+        finished = queue.submit({"name": "finished"})
+        await wait_finished(queue, [finished.job_id])
+        running = queue.submit({"name": "running"})
+        queued = queue.submit({"name": "queued"})
+        await asyncio.wait_for(rendering.wait(), 2)
+        # Cancelling the workers leaves the store as a killed process would
+        await queue.stop()
+        return finished.job_id, running.job_id, queued.job_id
+
+    return asyncio.run(main())
+
+
+def restart_with(store):
+    """Starts a fresh queue on the same store and returns what its runner was handed, by request name."""
+    calls = {}
+
+    async def runner(job):
+        calls[job.request["name"]] = (job.stage, job.render_id)
+
+    queue = JobQueue(runner, workers=1, store=store)
+
+    async def main():
+        await queue.start()
+        await wait_finished(queue, list(queue.jobs))
+        await queue.stop()
+
+    asyncio.run(main())
+    return queue, calls
+
+
+def test_queued_job_is_run_after_a_restart(store):
+    _, _, queued = crash_with(store)
+    queue, calls = restart_with(store)
+    assert calls["queued"] == (STAGE_QUEUED, None)
+    assert queue.get(queued).stage == STAGE_DONE
+
+
+def test_job_running_at_the_crash_resumes_from_its_last_stage(store):
+    _, running, _ = crash_with(store)
+    queue, calls = restart_with(store)
+    # The runner gets the stage and render id it recorded, so it polls the render instead of submitting again
+    assert calls["running"] == (STAGE_RENDER, "r1")
+    assert queue.get(running).stage == STAGE_DONE
+
+
+def test_finished_job_is_not_run_again(store):
+    finished, _, _ = crash_with(store)
+    queue, calls = restart_with(store)
+    assert "finished" not in calls
+    assert finished not in queue.jobs
+    assert queue.get(finished).stage == STAGE_DONE
+
+
+def test_batch_is_recovered_together(store):
+    async def blocked(job):
+        await asyncio.Event().wait()
+
+    queue = JobQueue(blocked, workers=1, store=store)
+
+    async def main():
+        await queue.start()
+        batch_id = queue.submit_batch([{"name": "a"}, {"name": "b"}], [None, None])
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return batch_id
+
+    batch_id = asyncio.run(main())
+    queue, calls = restart_with(store)
+    assert sorted(calls) == ["a", "b"]
+    assert [job.request["name"] for job in queue.get_batch(batch_id)] == ["a", "b"]
@@ -0,0 +1,222 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import llmguard
+
+
+class StatusError(Exception):
+    """An SDK error carrying the upstream response, like openai.APIStatusError."""
+
+    def __init__(self, status: int):
+        super().__init__(f"status {status}")
+        self.response = SimpleNamespace(status_code=status, headers={})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_guards(monkeypatch):
+    monkeypatch.setattr(llmguard, "_guards", {})
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_COOLDOWN_SECONDS", 30)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_PERCENTILE", 0)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (None, True),
+    (StatusError(429), False),
+    (StatusError(503), False),
+    (StatusError(400), None),
+    (APITimeoutError("timed out"), False),
+    (APIConnectionError("refused"), False),
+    (TimeoutError(), False),
+    (ValueError("missing key"), None),
+    (HTTPException(status_code=429, detail="LLM queue is full"), None),
+])
+def test_model_healthy(error, expected):
+    assert llmguard.model_healthy(error) is expected
+
+
+def test_transport_error_underneath_counts_against_model():
+    class TransportError(Exception):
+        pass
+
+    class ConnectError(TransportError):
+        pass
+
+    error = RuntimeError("wrapped")
+    error.__cause__ = ConnectError()
+    assert llmguard.model_healthy(error) is False
+
+
+def test_breaker_opens_on_failure_rate_and_fails_fast():
+    breaker = llmguard.CircuitBreaker("m")
+    for ok in (True, False, True):
+        assert breaker.allow()
+        breaker.record(ok)
+    assert breaker.state == llmguard.STATE_CLOSED
+    breaker.record(False)
+    assert breaker.state == llmguard.STATE_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_probe_through(monkeypatch):
+    breaker = llmguard.CircuitBreaker("m")
+    for _ in range(4):
+        breaker.record(False)
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_COOLDOWN_SECONDS", 0)
+    assert breaker.allow()
+    assert breaker.state == llmguard.STATE_HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == llmguard.STATE_CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_failed_probe_opens_again(monkeypatch):
+    breaker = llmguard.CircuitBreaker("m")
+    for _ in range(4):
+        breaker.record(False)
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_COOLDOWN_SECONDS", 0)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == llmguard.STATE_OPEN
+
+
+def test_released_probe_frees_the_half_open_slot(monkeypatch):
+    breaker = llmguard.CircuitBreaker("m")
+    for _ in range(4):
+        breaker.record(False)
+    monkeypatch.setattr(llmguard, "LLM_BREAKER_COOLDOWN_SECONDS", 0)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == llmguard.STATE_HALF_OPEN
+    assert breaker.allow()
+
+
+def test_outcomes_while_open_are_ignored():
+    breaker = llmguard.CircuitBreaker("m")
+    for _ in range(4):
+        breaker.record(False)
+    breaker.record(True)
+    assert breaker.state == llmguard.STATE_OPEN
+
+
+def test_call_falls_back_when_primary_fails():
+    calls = []
+
+    async def attempt(model):
+        calls.append(model)
+        if model == "primary":
+            raise StatusError(503)
+        return "slides"
+
+    assert asyncio.run(llmguard.call(["primary", "fallback"], attempt)) == ("slides", "fallback")
+    assert calls == ["primary", "fallback"]
+
+
+def test_call_raises_errors_that_say_nothing_about_the_model():
+    async def attempt(model):
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        asyncio.run(llmguard.call(["primary", "fallback"], attempt))
+    assert not llmguard.guard("primary").breaker._outcomes
+    assert "fallback" not in llmguard._guards
+
+
+def test_call_skips_open_breaker_and_503s_when_all_are_open():
+    for model in ("primary", "fallback"):
+        for _ in range(4):
+            llmguard.guard(model).breaker.record(False)
+
+    async def attempt(model):
+        return model
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(llmguard.call(["primary", "fallback"], attempt))
+    assert raised.value.status_code == 503
+    with pytest.raises(HTTPException):
+        llmguard.available(["primary", "fallback"])
+
+
+def test_available_and_call_pick_the_same_model():
+    for _ in range(4):
+        llmguard.guard("primary").breaker.record(False)
+
+    async def attempt(model):
+        return model
+
+    assert llmguard.available(["primary", "fallback"]).model == "fallback"
+    assert asyncio.run(llmguard.call(["primary", "fallback"], attempt)) == ("fallback", "fallback")
+    assert llmguard.llm_fallbacks.value(model="fallback") >= 2
+
+
+def test_hedge_answers_when_first_call_is_slow(monkeypatch):
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_PERCENTILE", 0.95)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_INITIAL_DELAY", 0.01)
+    hedger = llmguard.Hedger("m")
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1 if calls == 1 else 0)
+        return calls
+
+    async def main():
+        started = asyncio.get_running_loop().time()
+        result = await hedger.run(attempt)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(main())
+    assert result == 2
+    assert elapsed < 0.5
+
+
+def test_hedge_is_denied_once_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_PERCENTILE", 0.95)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_INITIAL_DELAY", 0.01)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_BURST", 1)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_RATIO", 0)
+    hedger = llmguard.Hedger("m")
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        await hedger.run(attempt)
+        await hedger.run(attempt)
+
+    asyncio.run(main())
+    # One hedge for the first call, none for the second
+    assert calls == 3
+
+
+def test_no_hedge_for_fast_calls(monkeypatch):
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_PERCENTILE", 0.95)
+    monkeypatch.setattr(llmguard, "LLM_HEDGE_INITIAL_DELAY", 1)
+    hedger = llmguard.Hedger("m")
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        return "ok"
+
+    assert asyncio.run(hedger.run(attempt)) == "ok"
+    assert calls == 1
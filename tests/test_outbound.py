@@ -0,0 +1,168 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import outbound
+
+
+def response(status, **headers):
+    return SimpleNamespace(status_code=status, headers=headers)
+
+
+class TransportError(Exception):
+    pass
+
+
+class ConnectError(TransportError):
+    pass
+
+
+class ReadTimeout(TransportError):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_BACKOFF_BASE", 0.001)
+
+
+def make_route(idempotent=True, max_retries=3, rate=0.0):
+    upstream = outbound.Upstream("test", rate, 1)
+    return outbound.Route(upstream, "test_route", outbound.PRIORITY_STATUS, idempotent=idempotent, max_retries=max_retries)
+
+
+def replay(outcomes):
+    """An attempt that returns (or raises) the next outcome each time it is called."""
+    outcomes = list(outcomes)
+    calls = []
+
+    async def attempt():
+        calls.append(None)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return attempt, calls
+
+
+def test_status_read_is_retried_on_5xx_until_it_succeeds():
+    route = make_route()
+    attempt, calls = replay([response(503), response(502), response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 200
+    assert len(calls) == 3
+
+
+def test_last_response_is_returned_when_attempts_run_out():
+    route = make_route(max_retries=2)
+    attempt, calls = replay([response(500)] * 3)
+    assert asyncio.run(route.call(attempt)).status_code == 500
+    assert len(calls) == 3
+
+
+def test_route_without_retries_returns_the_first_failure():
+    route = make_route(max_retries=0)
+    attempt, calls = replay([response(503), response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 503
+    assert len(calls) == 1
+
+
+def test_submission_is_not_retried_on_5xx():
+    route = make_route(idempotent=False)
+    attempt, calls = replay([response(503), response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 503
+    assert len(calls) == 1
+
+
+def test_429_pauses_the_upstream_and_is_retried_even_for_submissions():
+    route = make_route(idempotent=False)
+    attempt, calls = replay([response(429, **{"retry-after": "0.05"}), response(200)])
+
+    async def main():
+        started = asyncio.get_running_loop().time()
+        result = await route.call(attempt)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(main())
+    assert result.status_code == 200
+    assert len(calls) == 2
+    assert elapsed >= 0.04
+
+
+def test_long_retry_after_is_handed_back(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_MAX_RETRY_AFTER", 1)
+    route = make_route()
+    attempt, calls = replay([response(429, **{"retry-after": "120"}), response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 429
+    assert len(calls) == 1
+
+
+def test_unsent_connection_error_is_retried_for_submissions():
+    route = make_route(idempotent=False)
+    attempt, calls = replay([ConnectError("refused"), response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 200
+    assert len(calls) == 2
+
+
+def test_read_timeout_is_raised_for_submissions():
+    route = make_route(idempotent=False)
+    attempt, calls = replay([ReadTimeout("read"), response(200)])
+    with pytest.raises(ReadTimeout):
+        asyncio.run(route.call(attempt))
+    assert len(calls) == 1
+
+
+def test_sdk_error_wrapping_a_transport_error_is_retried():
+    error = RuntimeError("connection error")
+    error.__cause__ = ReadTimeout("read")
+    route = make_route()
+    attempt, calls = replay([error, response(200)])
+    assert asyncio.run(route.call(attempt)).status_code == 200
+
+
+def test_retries_stop_when_the_budget_is_spent():
+    route = make_route()
+    route.upstream.budget = outbound.RetryBudget(0, 0, cap=1)
+    attempt, calls = replay([response(503)] * 3)
+    assert asyncio.run(route.call(attempt)).status_code == 503
+    assert len(calls) == 2
+
+
+def test_submissions_get_the_next_token_before_status_reads():
+    upstream = outbound.Upstream("test", 100, 1)
+    order = []
+
+    async def waiter(priority, name):
+        await upstream.acquire(priority)
+        order.append(name)
+
+    async def main():
+        # Spend the only token so everyone after has to queue
+        await upstream.acquire(outbound.PRIORITY_STATUS)
+        polls = [asyncio.create_task(waiter(outbound.PRIORITY_STATUS, f"poll{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        submit = asyncio.create_task(waiter(outbound.PRIORITY_SUBMIT, "submit"))
+        await asyncio.gather(submit, *polls)
+
+    asyncio.run(main())
+    assert order[0] == "submit"
+    assert sorted(order[1:]) == ["poll0", "poll1", "poll2"]
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = outbound.TokenBucket(rate=10, burst=2)
+    bucket.take()
+    bucket.take()
+    assert 0 < bucket.delay() <= 0.1
+    assert outbound.TokenBucket(rate=0, burst=1).delay() == 0
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert outbound._retry_after(response(429, **{"retry-after": "3"})) == 3
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < outbound._retry_after(response(429, **{"retry-after": later})) <= 30
+    assert outbound._retry_after(response(429)) is None
+    assert outbound._retry_after(response(429, **{"retry-after": "soon"})) is None
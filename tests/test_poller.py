@@ -0,0 +1,115 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from poller import Poller, PollTimeout
+
+
+def make_poller(fetch, **kwargs):
+    options = {"initial_delay": 0.01, "max_delay": 0.02, "jitter": 0, "deadline": 2}
+    options.update(kwargs)
+    return Poller(fetch=fetch, is_finished=lambda payload: payload["status"] in ("done", "failed"), **options)
+
+
+def test_resolves_when_the_status_is_final():
+    fetches = Counter()
+
+    async def fetch(item_id):
+        fetches[item_id] += 1
+        return {"status": "done" if fetches[item_id] >= 3 else "rendering"}
+
+    poller = make_poller(fetch)
+    assert asyncio.run(poller.wait("a")) == {"status": "done"}
+    assert fetches["a"] == 3
+    assert poller.watching() == 0
+
+
+def test_waiters_for_the_same_id_share_one_fetch_per_tick():
+    fetches = Counter()
+
+    async def fetch(item_id):
+        fetches[item_id] += 1
+        return {"status": "done" if fetches[item_id] >= 2 else "rendering"}
+
+    async def main():
+        poller = make_poller(fetch)
+        return await asyncio.gather(*(poller.wait("a") for _ in range(10)))
+
+    assert asyncio.run(main()) == [{"status": "done"}] * 10
+    assert fetches["a"] == 2
+
+
+def test_many_ids_are_fetched_together_in_one_loop():
+    due_together = []
+
+    async def fetch(item_id):
+        due_together.append(item_id)
+        return {"status": "done"}
+
+    async def main():
+        poller = make_poller(fetch)
+        return await asyncio.gather(*(poller.wait(str(i)) for i in range(5)))
+
+    assert asyncio.run(main()) == [{"status": "done"}] * 5
+    assert sorted(due_together) == [str(i) for i in range(5)]
+
+
+def test_fetch_errors_are_retried_on_the_next_tick():
+    fetches = Counter()
+
+    async def fetch(item_id):
+        fetches[item_id] += 1
+        if fetches[item_id] == 1:
+            raise RuntimeError("503 from upstream")
+        return {"status": "failed"}
+
+    assert asyncio.run(make_poller(fetch).wait("a")) == {"status": "failed"}
+    assert fetches["a"] == 2
+
+
+def test_deadline_raises_poll_timeout_with_the_last_error():
+    async def fetch(item_id):
+        raise RuntimeError("still unreachable")
+
+    with pytest.raises(PollTimeout, match="still unreachable"):
+        asyncio.run(make_poller(fetch).wait("a", deadline=0.05))
+
+
+def test_one_failing_id_does_not_hold_back_the_others():
+    async def fetch(item_id):
+        if item_id == "bad":
+            raise RuntimeError("boom")
+        return {"status": "done"}
+
+    async def main():
+        poller = make_poller(fetch)
+        bad = asyncio.ensure_future(poller.wait("bad", deadline=0.5))
+        good = await asyncio.wait_for(poller.wait("good"), timeout=0.2)
+        with pytest.raises(PollTimeout):
+            await bad
+        return good
+
+    assert asyncio.run(main()) == {"status": "done"}
+
+
+def test_poke_makes_a_watched_id_due_right_away():
+    fetches = Counter()
+    status = {"a": "rendering"}
+
+    async def fetch(item_id):
+        fetches[item_id] += 1
+        return {"status": status[item_id]}
+
+    async def main():
+        # A long backoff, so only the poke can bring the next fetch forward
+        poller = make_poller(fetch, initial_delay=10, max_delay=10)
+        waiter = asyncio.ensure_future(poller.wait("a"))
+        await asyncio.sleep(0.05)
+        status["a"] = "done"
+        assert poller.poke("a")
+        assert not poller.poke("unknown")
+        return await asyncio.wait_for(waiter, timeout=1)
+
+    assert asyncio.run(main()) == {"status": "done"}
+    assert fetches["a"] == 2
@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import videocreationhelper
+from cachebackends import MemoryLRUBackend
+from rendercache import RenderCache, timeline_hash
+
+TRACKS = [{"clips": [{"asset": {"type": "title", "text": "Hello"}, "start": 0, "length": 3}]}]
+
+
+class FakeShotstack:
+    """Stands in for httpclient.post: each submission takes a moment, then returns the next outcome."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.submissions = 0
+
+    async def post(self, url, **kwargs):
+        self.submissions += 1
+        outcome = self.outcomes.pop(0)
+        await asyncio.sleep(0.01)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"success": True, "response": {"id": outcome}})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderCache(MemoryLRUBackend(16))
+    monkeypatch.setattr(videocreationhelper, "render_cache", cache)
+    monkeypatch.setattr(videocreationhelper, "SHOTSTACK_API_KEY", "test-key")
+    return cache
+
+
+def shotstack(monkeypatch, *outcomes):
+    fake = FakeShotstack(*outcomes)
+    monkeypatch.setattr(videocreationhelper.httpclient, "post", fake.post)
+    return fake
+
+
+def render(tracks=TRACKS, profile=None):
+    return videocreationhelper.render_video_with_shotstack(tracks, "", profile)
+
+
+def render_id(response):
+    return response["response"]["id"]
+
+
+def test_concurrent_requests_for_the_same_timeline_submit_one_render(cache, monkeypatch):
+    fake = shotstack(monkeypatch, "r1", "r2")
+
+    async def main():
+        return await asyncio.gather(render(), render(), render())
+
+    assert [render_id(response) for response in asyncio.run(main())] == ["r1"] * 3
+    assert fake.submissions == 1
+
+
+def test_completed_render_is_served_from_the_cache(cache, monkeypatch):
+    fake = shotstack(monkeypatch, "r1", "r2")
+    assert render_id(asyncio.run(render())) == "r1"
+    cache.complete("r1", "https://cdn.example.com/r1.mp4")
+
+    assert render_id(asyncio.run(render())) == "r1"
+    assert fake.submissions == 1
+    assert cache.finished("r1") == "https://cdn.example.com/r1.mp4"
+
+
+def test_failed_submission_releases_its_waiters_and_is_not_cached(cache, monkeypatch):
+    fake = shotstack(monkeypatch, httpx.ConnectError("refused"), "r2")
+
+    async def main():
+        return await asyncio.gather(render(), render(), return_exceptions=True)
+
+    first, joined = asyncio.run(main())
+    assert isinstance(first, HTTPException) and isinstance(joined, HTTPException)
+    assert first.status_code == joined.status_code == 500
+    key = timeline_hash({"timeline": {"background": "#fcff33", "tracks": TRACKS}, "output": videocreationhelper.render_profiles.output(None)})
+    assert cache.get(key) is None
+    assert cache.inflight(key) is None
+
+    # The next request starts a fresh render instead of replaying the failure
+    assert render_id(asyncio.run(render())) == "r2"
+    assert fake.submissions == 2
+
+
+def test_failed_render_is_not_cached_and_the_next_request_renders_again(cache, monkeypatch):
+    fake = shotstack(monkeypatch, "r1", "r2")
+    assert render_id(asyncio.run(render())) == "r1"
+    cache.complete("r1", None)
+
+    assert cache.finished("r1") is None
+    assert render_id(asyncio.run(render())) == "r2"
+    assert fake.submissions == 2
+
+
+def test_stale_inflight_render_is_not_joined(monkeypatch):
+    cache = RenderCache(None, inflight_timeout=0)
+
+    async def main():
+        flight = cache.begin("key")
+        cache.submitted("key", flight, "r1")
+        await asyncio.sleep(0.01)
+        return cache.inflight("key")
+
+    assert asyncio.run(main()) is None
+
+
+def test_different_inputs_render_separately(cache, monkeypatch):
+    fake = shotstack(monkeypatch, "r1", "r2", "r3")
+    other = [{"clips": [{**TRACKS[0]["clips"][0], "length": 4}]}]
+
+    async def main():
+        return await asyncio.gather(render(), render(other), render(profile="preview"))
+
+    assert sorted(render_id(response) for response in asyncio.run(main())) == ["r1", "r2", "r3"]
+    assert fake.submissions == 3
+
+
+def test_key_ignores_the_callback_but_not_the_timeline():
+    payload = {"timeline": {"tracks": TRACKS}, "output": {"format": "mp4"}}
+    assert timeline_hash(payload) == timeline_hash({**payload, "callback": "https://example.com/hook"})
+    assert timeline_hash(payload) != timeline_hash({**payload, "output": {"format": "gif"}})
+    assert timeline_hash(payload) == timeline_hash(dict(reversed(list(payload.items()))))
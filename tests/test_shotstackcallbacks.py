@@ -0,0 +1,22 @@
+import pytest
+
+import shotstackcallbacks
+from shotstackcallbacks import valid_callback_token
+
+
+@pytest.mark.parametrize("token, valid", [
+    ("s3cret-tøken", True),
+    ("s3cret-token", False),
+    ("", False),
+    (None, False),
+    ("s3cret-tøken-and-more", False),
+    ("ünïcode", False),
+])
+def test_callback_token_must_match(monkeypatch, token, valid):
+    monkeypatch.setattr(shotstackcallbacks, "SHOTSTACK_CALLBACK_TOKEN", "s3cret-tøken")
+    assert valid_callback_token(token) is valid
+
+
+def test_any_token_passes_when_none_is_configured(monkeypatch):
+    monkeypatch.setattr(shotstackcallbacks, "SHOTSTACK_CALLBACK_TOKEN", "")
+    assert valid_callback_token("") and valid_callback_token("anything")
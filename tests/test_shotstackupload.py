@@ -0,0 +1,68 @@
+import asyncio
+import io
+
+import pytest
+from starlette.datastructures import Headers, UploadFile
+
+import shotstackupload
+from cachebackends import MemoryLRUBackend
+from dedupcache import DedupCache
+from jobstore import MemoryJobStore
+
+
+@pytest.fixture
+def shotstack(monkeypatch):
+    """Fakes Firebase, the Shotstack ingest API and its poller; returns the calls each received."""
+    calls = {"firebase": 0, "ingest": 0}
+
+    async def upload_to_firebase(file, mode=None, digest=None):
+        calls["firebase"] += 1
+        await asyncio.sleep(0.02)
+        return f"https://storage.example.com/videos/{digest}.mp4"
+
+    async def submit_to_shotstack(video_url):
+        calls["ingest"] += 1
+        return {"data": {"id": f"src{calls['ingest']}"}}
+
+    async def ingest_status(source_id):
+        return {"data": {"attributes": {"status": "ready", "source": f"https://cdn.example.com/{source_id}.mp4"}}}
+
+    monkeypatch.setattr(shotstackupload, "upload_to_firebase", upload_to_firebase)
+    monkeypatch.setattr(shotstackupload, "submit_to_shotstack", submit_to_shotstack)
+    monkeypatch.setattr(shotstackupload.ingest_poller, "wait", ingest_status)
+    monkeypatch.setattr(shotstackupload, "job_store", MemoryJobStore())
+    monkeypatch.setattr(shotstackupload, "dedup_cache", DedupCache(MemoryLRUBackend(16)))
+    return calls
+
+
+def upload(data):
+    return shotstackupload.upload_video(
+        UploadFile(io.BytesIO(data), filename="clip.mp4", headers=Headers({"content-type": "video/mp4"}))
+    )
+
+
+def test_concurrent_uploads_of_the_same_bytes_ingest_once(shotstack):
+    async def main():
+        return await asyncio.gather(upload(b"same video"), upload(b"same video"), upload(b"same video"))
+
+    responses = asyncio.run(main())
+    assert shotstack == {"firebase": 1, "ingest": 1}
+    assert {response.source_id for response in responses} == {"src1"}
+    assert all(response.video_url == "https://cdn.example.com/src1.mp4" for response in responses)
+
+
+def test_later_upload_of_the_same_bytes_is_a_dedup_hit(shotstack):
+    first = asyncio.run(upload(b"same video"))
+    second = asyncio.run(upload(b"same video"))
+    assert shotstack == {"firebase": 1, "ingest": 1}
+    assert second.message == "Video already processed"
+    assert second.source_id == first.source_id
+
+
+def test_different_bytes_are_ingested_separately(shotstack):
+    async def main():
+        return await asyncio.gather(upload(b"one video"), upload(b"another video"))
+
+    responses = asyncio.run(main())
+    assert shotstack == {"firebase": 2, "ingest": 2}
+    assert len({response.source_id for response in responses}) == 2
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from slideparser import SLIDE_LIST_SCHEMA, parse_slides, strip_fences, validate_slide
+from slidestream import SlideStreamParser
+
+SLIDES = [
+    {"slide_number": 1, "purpose": "Heading", "main_text": "Android vs Apple", "sub_text": "Who leads?"},
+    {"slide_number": 2, "purpose": "Data", "main_text": "The numbers", "pie_chart": {"Android": 90, "Apple": 10}},
+]
+
+
+def test_plain_json_array():
+    assert parse_slides(json.dumps(SLIDES)) == SLIDES
+
+
+def test_already_parsed_list():
+    assert parse_slides(SLIDES) == SLIDES
+
+
+def test_code_fence_is_stripped():
+    assert parse_slides("```json\n" + json.dumps(SLIDES) + "\n```") == SLIDES
+    assert strip_fences("no fence") == "no fence"
+
+
+def test_prose_around_the_array_is_ignored():
+    assert parse_slides("Here is your script:\n" + json.dumps(SLIDES) + "\nHope it helps!") == SLIDES
+
+
+def test_wrapped_slides_object():
+    assert parse_slides(json.dumps({"slides": SLIDES})) == SLIDES
+
+
+def test_python_repr_quoting():
+    assert parse_slides(repr(SLIDES)) == SLIDES
+
+
+def test_truncated_array_keeps_the_complete_slides():
+    text = json.dumps(SLIDES)
+    assert parse_slides(text[:-20]) == SLIDES[:1]
+
+
+def test_invalid_slides_are_dropped():
+    payload = [SLIDES[0], "not a slide", {"slide_number": "three", "main_text": "x"}, SLIDES[1]]
+    assert parse_slides(payload) == SLIDES
+
+
+@pytest.mark.parametrize("payload", ["", "no slides here", "[]", "{}", None, 42, "[1, 2, 3]"])
+def test_nothing_recoverable_returns_none(payload):
+    assert parse_slides(payload) is None
+
+
+def test_missing_slide_number_comes_from_position():
+    assert validate_slide({"main_text": "x"}, 4) == {"main_text": "x", "slide_number": 5}
+
+
+def test_numeric_string_slide_number_is_coerced():
+    assert validate_slide({"slide_number": "2", "main_text": "x"}, 0) == {"slide_number": 2, "main_text": "x"}
+
+
+def test_unknown_keys_are_kept():
+    assert validate_slide({"slide_number": 1, "mood": "upbeat"}, 0) == {"slide_number": 1, "mood": "upbeat"}
+
+
+def test_structured_output_slide_is_normalized():
+    slide = {
+        "slide_number": 3, "purpose": "Data", "main_text": "m", "sub_text": "s", "image_prompt": None,
+        "pie_chart": [{"label": "A", "value": 60}, {"label": "B", "value": 40}], "chart_type": "bar", "duration": 4.5
+    }
+    assert parse_slides(json.dumps({"slides": [slide]})) == [{
+        "slide_number": 3, "purpose": "Data", "main_text": "m", "sub_text": "s",
+        "pie_chart": {"A": 60, "B": 40}, "chart_type": "bar", "duration": 4.5
+    }]
+
+
+def test_schema_requires_every_property():
+    item = SLIDE_LIST_SCHEMA["properties"]["slides"]["items"]
+    assert sorted(item["required"]) == sorted(item["properties"])
+    assert {"duration", "chart_type"} <= set(item["properties"])
+
+
+def test_stream_parser_emits_each_slide_as_it_completes():
+    text = "```json\n" + json.dumps(SLIDES) + "\n```"
+    parser = SlideStreamParser()
+    emitted = []
+    for position in range(0, len(text), 7):
+        emitted.extend(parser.feed(text[position:position + 7]))
+    assert emitted == SLIDES
+    assert parser.done
+
+
+def test_stream_parser_skips_oversized_slides():
+    oversized = {"slide_number": 2, "main_text": "x" * 500}
+    parser = SlideStreamParser(max_object_chars=200)
+    assert parser.feed(json.dumps([SLIDES[0], oversized, SLIDES[1]])) == [SLIDES[0], SLIDES[1]]
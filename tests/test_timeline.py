@@ -0,0 +1,89 @@
+import pytest
+
+import videocreationhelper
+from timeline import Timeline, seconds
+from videocreationhelper import loopThroughArray, slide_duration
+
+
+def slide(number, **fields):
+    return {"slide_number": number, "main_text": f"Main {number}", "sub_text": f"Sub {number}", "image_prompt": "art", **fields}
+
+
+def assert_packed(track):
+    """Clips of one track start where the previous one ended, from 0."""
+    position = 0
+    for clip in track["clips"]:
+        assert clip["start"] == position
+        position = seconds(position + clip["length"])
+    return position
+
+
+@pytest.mark.parametrize("durations, total", [
+    ([None], 3),
+    ([None, None, None], 9),
+    ([4, 2.5, "6s"], 12.5),
+    ([0.1, 1.1, 2.2], 4.3),
+    ([1 / 3, 1 / 3, 1 / 3, 1 / 3], 4),
+    ([100, None], 18),
+])
+def test_slides_are_packed_back_to_back(durations, total):
+    slides = [slide(number, duration=duration) for number, duration in enumerate(durations, 1)]
+    tracks = loopThroughArray(slides, videourl="https://example.com/v.mp4")
+    assert tracks
+    for track in tracks:
+        assert assert_packed(track) <= total
+    # The main text is on every slide, so its track spans the whole timeline
+    main_track = next(track for track in tracks if track["clips"][0]["asset"].get("text", "").startswith("Main"))
+    assert len(main_track["clips"]) == len(durations)
+    assert assert_packed(main_track) == total
+
+
+def test_optional_clips_keep_their_slide_position():
+    timeline = Timeline()
+    timeline.add("image_and_text", 2, maintext="a", subtext="", media="x")
+    timeline.add("image_and_text", 3, maintext="b", subtext="s", media="y")
+    starts = {role: [clip["start"] for clip in clips] for role, clips in timeline._clips.items() if clips}
+    assert starts["subtext"] == [2]
+    assert starts["maintext"] == [0, 2]
+    assert timeline.duration == 5
+    assert timeline.slide_count == 2
+
+
+def test_empty_slide_list_gives_an_empty_timeline():
+    assert loopThroughArray([], videourl="") == []
+    assert Timeline().tracks() == []
+    assert Timeline().duration == 0
+
+
+@pytest.mark.parametrize("duration, expected", [
+    (None, 3),
+    (4, 4),
+    (2.5, 2.5),
+    ("4s", 4),
+    (" 6 ", 6),
+    (0, 1),
+    (-5, 1),
+    (0.4, 1),
+    (15, 15),
+    (90, 15),
+    ("90s", 15),
+    ("soon", 3),
+    (float("nan"), 3),
+    (float("inf"), 3),
+    (1 / 3 + 1, 1.333),
+])
+def test_slide_duration_is_clamped_to_the_configured_range(duration, expected):
+    assert slide_duration({"duration": duration}) == expected
+
+
+def test_slide_duration_follows_the_configured_bounds(monkeypatch):
+    monkeypatch.setattr(videocreationhelper, "SLIDE_LENGTH", 5)
+    monkeypatch.setattr(videocreationhelper, "SLIDE_MIN_LENGTH", 2)
+    monkeypatch.setattr(videocreationhelper, "SLIDE_MAX_LENGTH", 8)
+    assert [slide_duration({"duration": value}) for value in (None, 1, 3, 10)] == [5, 2, 3, 8]
+
+
+@pytest.mark.parametrize("value, expected", [(3.0, 3), (2.5, 2.5), (0.1 + 0.2, 0.3), (1.0004, 1), (1.0006, 1.001)])
+def test_seconds_rounds_to_milliseconds(value, expected):
+    assert seconds(value) == expected
+    assert type(seconds(value)) is type(expected)
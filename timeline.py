@@ -0,0 +1,41 @@
+from typing import Any, Dict, List
+
+from cliptemplates import TemplateRegistry, clip_templates
+
+
+def seconds(value: float) -> float:
+    """Rounds a timeline position to milliseconds and keeps whole seconds as ints, as Shotstack examples do."""
+    value = round(value, 3)
+    return int(value) if value == int(value) else value
+
+
+class Timeline:
+    """
+    Long-form timeline that packs clips of the same role onto shared tracks.
+
+    Slides are appended in order, each with its own length. Every role
+    (subtext, main text, media) gets one track whose clips run back to back,
+    so a 200-slide story is 3 tracks instead of 600 single-clip ones.
+    Appending a slide is O(1) and `tracks` is O(n) in the number of clips.
+    """
+
+    def __init__(self, registry: TemplateRegistry = clip_templates):
+        self.registry = registry
+        self.duration: float = 0
+        self.slide_count = 0
+        self._clips: Dict[str, List[Dict[str, Any]]] = {role: [] for role in registry.roles}
+
+    def add(self, slide_type: str, length: float, **values: Any) -> List[Dict[str, Any]]:
+        """Appends one slide at the end of the timeline and returns its clips as per-slide tracks."""
+        start = self.duration
+        length = seconds(length)
+        placed = self.registry.slides[slide_type].place(start, length, values)
+        for role, clip in placed:
+            self._clips[role].append(clip)
+        self.duration = seconds(start + length)
+        self.slide_count += 1
+        return [{"clips": [clip]} for _, clip in placed]
+
+    def tracks(self) -> List[Dict[str, Any]]:
+        """Returns the Shotstack tracks, top-most first, skipping roles with no clips."""
+        return [{"clips": clips} for clips in self._clips.values() if clips]
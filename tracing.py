@@ -0,0 +1,62 @@
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from metrics import Counter, Gauge, Histogram
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900)
+
+pipeline_stage_seconds = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each stage of a pipeline.",
+    ("pipeline", "stage"),
+    buckets=STAGE_BUCKETS
+)
+pipeline_stage_in_flight = Gauge("pipeline_stage_in_flight", "Requests currently inside a pipeline stage.", ("pipeline", "stage"))
+pipeline_stage_errors = Counter("pipeline_stage_errors_total", "Pipeline stages that raised.", ("pipeline", "stage"))
+pipeline_seconds = Histogram(
+    "pipeline_seconds",
+    "End-to-end time of a pipeline run by outcome.",
+    ("pipeline", "outcome"),
+    buckets=STAGE_BUCKETS
+)
+
+
+class Trace:
+    """
+    Timing breakdown for one request through a pipeline.
+
+    Each `span` observes pipeline_stage_seconds and tracks the in-flight
+    gauge for its stage; `finish` records the total and logs one line with
+    every stage's time for the request id, e.g.
+    `trace video id=... outcome=done total=48.210 llm=2.301 parse=0.001 ...`.
+    """
+
+    def __init__(self, pipeline: str, trace_id: Optional[str] = None):
+        self.pipeline = pipeline
+        self.trace_id = trace_id or str(uuid.uuid4())
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        pipeline_stage_in_flight.inc(pipeline=self.pipeline, stage=stage)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            pipeline_stage_errors.inc(pipeline=self.pipeline, stage=stage)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            pipeline_stage_in_flight.dec(pipeline=self.pipeline, stage=stage)
+            pipeline_stage_seconds.observe(elapsed, pipeline=self.pipeline, stage=stage)
+            self.timings[stage] = self.timings.get(stage, 0) + elapsed
+
+    def finish(self, outcome: str) -> float:
+        total = time.perf_counter() - self.started
+        pipeline_seconds.observe(total, pipeline=self.pipeline, outcome=outcome)
+        breakdown = " ".join(f"{stage}={seconds:.3f}" for stage, seconds in self.timings.items())
+        print(f"trace {self.pipeline} id={self.trace_id} outcome={outcome} total={total:.3f} {breakdown}")
+        return total
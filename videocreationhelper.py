@@ -1,11 +1,21 @@
+import asyncio
 import json
+import math
 import time
-import requests
+import httpx
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import os
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from poller import Poller, PollTimeout, POLL_INITIAL_DELAY, POLL_MAX_DELAY
+import httpclient
+from outbound import SHOTSTACK_POLL, SHOTSTACK_SUBMIT
+from shotstackcallbacks import callback_url, poll_delays, KIND_RENDER
+from cliptemplates import clip_templates
+from timeline import Timeline, seconds
+from rendercache import render_cache, render_cache_requests, timeline_hash
+from renderprofiles import render_profiles
 
 # Load environment variables
 load_dotenv()
@@ -14,12 +24,21 @@ load_dotenv()
 SHOTSTACK_API_KEY = os.getenv('SHOTSTACK_API_KEY')
 SHOTSTACK_EDIT_API_URL = os.getenv('SHOTSTACK_EDIT_API_URL', 'https://api.shotstack.io/edit/stage')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+RENDER_POLL_DEADLINE = float(os.getenv('RENDER_POLL_DEADLINE', '900'))
 
-# Validate required environment variables
-if not SHOTSTACK_API_KEY:
-    raise ValueError("Missing SHOTSTACK_API_KEY environment variable")
-if not OPENAI_API_KEY:
-    raise ValueError("Missing OPENAI_API_KEY environment variable")
+# Seconds each slide stays on screen unless the LLM gives it a `duration`
+SLIDE_LENGTH = float(os.getenv('SLIDE_LENGTH', '3'))
+SLIDE_MIN_LENGTH = float(os.getenv('SLIDE_MIN_LENGTH', '1'))
+SLIDE_MAX_LENGTH = float(os.getenv('SLIDE_MAX_LENGTH', '15'))
+
+def shotstack_headers() -> Dict[str, str]:
+    """Edit API headers; the key is checked here rather than at import so a missing one only fails renders."""
+    if not SHOTSTACK_API_KEY:
+        raise HTTPException(status_code=500, detail="Missing SHOTSTACK_API_KEY environment variable")
+    return {
+        "Content-Type": "application/json",
+        "x-api-key": SHOTSTACK_API_KEY
+    }
 
 def createImageAndVideo(maintext: str, subtext: str, videourl: str, start: int) -> List[Dict[str, Any]]:
     trackData = [   
@@ -226,101 +245,190 @@ def createImageAndText(maintext: str, subtext: str, imagetext: str, start: int)
         trackData.pop(0)
     return trackData
 
-def generateVideoTracks(index: int, maintext: str, subtext: str, image: str, start: int) -> List[Dict[str, Any]]:
-    if index == 2:
-        return createImageAndVideo(subtext=subtext, maintext=maintext, videourl=image, start=start)
-    else:
-        return createImageAndText(imagetext=image, maintext=maintext, subtext=subtext, start=start)
+def slide_type_for(index: int) -> str:
+    return "image_and_video" if index == 2 else "image_and_text"
+
+def slide_type(item: Dict[str, Any]) -> str:
+    """
+    Slide type for a slide dict. A slide whose chart was drawn (see chartimages)
+    shows it as an image, and a text-to-image slide whose prompt has a stored
+    image (see imageassets) shows that image instead of generating it again.
+    """
+    if item.get('chart_url'):
+        return "image_and_chart"
+    default = slide_type_for(item.get('slide_number')-1)
+    if default == "image_and_text" and item.get('image_url'):
+        return "image_and_image"
+    return default
+
+def generateVideoTracks(index: int, maintext: str, subtext: str, image: str, start: float, length: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Builds one slide from the clip template registry; same output as createImageAndVideo/createImageAndText."""
+    return clip_templates.slides[slide_type_for(index)].build(start, length, maintext=maintext, subtext=subtext, media=image)
 
 def merge_inner_elements(array: List[List[Any]]) -> List[Any]:
     """Merges all the inner elements from subarrays into a single array."""
     return [element for subarray in array for element in subarray]
 
+def slide_duration(item: Dict[str, Any]) -> float:
+    """Seconds a slide stays on screen: its `duration` (e.g. 4, 2.5 or "4s") clamped to the configured range, else SLIDE_LENGTH."""
+    value = item.get('duration')
+    try:
+        length = float(str(value).strip().rstrip('s')) if value is not None else SLIDE_LENGTH
+    except ValueError:
+        length = SLIDE_LENGTH
+    if not math.isfinite(length):
+        length = SLIDE_LENGTH
+    return seconds(min(max(length, SLIDE_MIN_LENGTH), SLIDE_MAX_LENGTH))
+
+def slide_values(item: Dict[str, Any], videourl: str) -> Dict[str, Any]:
+    """Maps a slide dict as returned by the LLM to its template variables."""
+    index = item.get('slide_number')
+    image = item.get('image_prompt', item.get('image', ''))
+    
+    if item.get('chart_url'):
+        image = item['chart_url']
+    elif index == 3:
+        image = videourl
+    elif item.get('image_url'):
+        image = item['image_url']
+        
+    return {
+        "maintext": item.get('main_text', ''),
+        "subtext": item.get('sub_text', ''),
+        "media": image
+    }
+
+def add_slide(timeline: Timeline, item: Dict[str, Any], videourl: str) -> List[Dict[str, Any]]:
+    """Appends a slide dict to the timeline and returns that slide's clips as per-slide tracks."""
+    return timeline.add(slide_type(item), slide_duration(item), **slide_values(item, videourl))
+
 def loopThroughArray(data: List[Dict[str, Any]], videourl: str) -> List[Dict[str, Any]]:
-    fulltrack = []
-    start = 0
+    """Builds the packed timeline tracks for every slide, in order."""
+    timeline = Timeline()
     for item in data:
-        index = item.get('slide_number')
-        maintext = item.get('main_text', '')
-        subtext = item.get('sub_text', '')
-        image = item.get('image_prompt', item.get('image', ''))
-        
-        if index == 3:
-            image = videourl
-            
-        track = generateVideoTracks(
-            index=index-1,
-            maintext=maintext,
-            subtext=subtext,
-            image=image,
-            start=start
-        )
-        fulltrack.append(track)
-        start += 3
+        add_slide(timeline, item, videourl=videourl)
         
-    return merge_inner_elements(fulltrack)
+    return timeline.tracks()
 
-async def render_video_with_shotstack(clips_data: List[Dict[str, Any]], videourl: str) -> Dict[str, Any]:
-    """Sends a POST request to the Shotstack API to render a video."""
-    url = f"{SHOTSTACK_EDIT_API_URL}/render"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": SHOTSTACK_API_KEY
+def cached_render_response(render_id: str) -> Dict[str, Any]:
+    """A render response in Shotstack's shape for a render reused from the cache or already in flight."""
+    return {
+        "success": True,
+        "message": "Reused render",
+        "response": {"id": render_id}
     }
 
+async def render_video_with_shotstack(clips_data: List[Dict[str, Any]], videourl: str, profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Sends a POST request to the Shotstack API to render a video.
+
+    `profile` names the output block in templates/render_profiles.json
+    (e.g. "preview", "gif", "landscape"); None renders the default profile.
+
+    Identical timelines are rendered once: a finished render of the same
+    payload is returned from the render cache, and a payload that is
+    already rendering waits for that render's id instead of submitting again.
+    """
+    url = f"{SHOTSTACK_EDIT_API_URL}/render"
+    headers = shotstack_headers()
+
     payload = {
         "timeline": {
             "background": "#fcff33",
             "tracks": clips_data
         },
-        "output": {
-            "format": "mp4",
-            "fps": 25,
-            "size": {
-                "width": 720,
-                "height": 1280
-            }
-        }
+        "output": render_profiles.output(profile)
     }
+    key = timeline_hash(payload)
+    cached = render_cache.get(key)
+    if cached is not None:
+        render_cache_requests.inc(result="hit")
+        return cached_render_response(cached["render_id"])
+    inflight = render_cache.inflight(key)
+    if inflight is not None:
+        render_cache_requests.inc(result="coalesced")
+        return cached_render_response(await asyncio.shield(inflight))
+    render_cache_requests.inc(result="miss")
+
+    callback = callback_url(KIND_RENDER)
+    if callback:
+        payload["callback"] = callback
+
+    flight = render_cache.begin(key)
+    try:
+        response = await httpclient.post(url, route=SHOTSTACK_SUBMIT, headers=headers, json=payload)
+        response.raise_for_status()
+        data = response.json()
+    except httpx.HTTPError as e:
+        error = HTTPException(status_code=500, detail=f"Shotstack API error: {str(e)}")
+        render_cache.abandon(key, flight, error)
+        raise error
+    except asyncio.CancelledError:
+        render_cache.abandon(key, flight, HTTPException(status_code=500, detail="Render submission was cancelled"))
+        raise
+    except Exception as e:
+        render_cache.abandon(key, flight, e)
+        raise
+
+    render_id = data.get('response', {}).get('id') if isinstance(data, dict) else None
+    if render_id:
+        render_cache.submitted(key, flight, render_id)
+    else:
+        render_cache.abandon(key, flight, HTTPException(status_code=500, detail="Shotstack did not return a render id"))
+    return data
+
+async def fetch_render_status(render_id: str) -> Dict[str, Any]:
+    """Fetches the current render status of a video from the Shotstack API once."""
+    url = f"{SHOTSTACK_EDIT_API_URL}/render/{render_id}"
+    headers = shotstack_headers()
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = await httpclient.get(url, route=SHOTSTACK_POLL, headers=headers)
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Shotstack API error: {str(e)}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
+
+def _render_finished(data: Dict[str, Any]) -> bool:
+    return data.get('response', {}).get('status') in ('done', 'failed')
+
+render_poller = Poller(
+    fetch=fetch_render_status,
+    is_finished=_render_finished,
+    deadline=RENDER_POLL_DEADLINE,
+    **poll_delays(POLL_INITIAL_DELAY, POLL_MAX_DELAY)
+)
 
 async def check_render_status(render_id: str) -> Dict[str, str]:
-    """Polls the Shotstack API to check the render status of a video."""
-    url = f"{SHOTSTACK_EDIT_API_URL}/render/{render_id}"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": SHOTSTACK_API_KEY
-    }
+    """Waits on the shared render poller until the video is done or failed; reused renders answer from the cache."""
+    video_url = render_cache.finished(render_id)
+    if video_url:
+        return {
+            "status": "done",
+            "video_url": video_url
+        }
 
     try:
-        while True:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            status = data.get('response', {}).get('status')
-
-            if status == 'done':
-                video_url = data.get('response', {}).get('url')
-                return {
-                    "status": "done",
-                    "video_url": video_url
-                }
-            elif status == 'failed':
-                return {
-                    "status": "failed",
-                    "video_url": ""
-                }
-            
-            await asyncio.sleep(10)  # Non-blocking sleep
+        data = await render_poller.wait(render_id)
+    except PollTimeout:
+        render_cache.complete(render_id, None)
+        return {
+            "status": "timeout",
+            "video_url": ""
+        }
 
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
+    status = data.get('response', {}).get('status')
+    video_url = data.get('response', {}).get('url') if status == 'done' else None
+    render_cache.complete(render_id, video_url)
+    if status == 'done':
+        return {
+            "status": "done",
+            "video_url": video_url
+        }
+    return {
+        "status": "failed",
+        "video_url": ""
+    }
 
 # FastAPI Models
 class ChartRequest(BaseModel):